@@ -0,0 +1,28 @@
+/*
+Purpose: ETL state for incremental (append-only) loads
+Notes:
+  - One row per fact table
+  - watermark_date: data is complete up to this date (fact_transactions: last payment date
+    processed; fact_costs: last month with costs)
+  - watermark_id: last loaded transaction_id / cost_id
+  - etl_load_generation: single row, bumped by every load in the same transaction as the
+    data; result caches (src/analytics/serving.py) compare it to know their rows are stale
+*/
+
+SET search_path TO analytics;
+
+CREATE TABLE IF NOT EXISTS etl_watermarks (
+  table_name      TEXT PRIMARY KEY CHECK (table_name IN ('fact_transactions','fact_costs')),
+  watermark_date  DATE NOT NULL,
+  watermark_id    INT NOT NULL,
+  updated_at      TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE TABLE IF NOT EXISTS etl_load_generation (
+  id          BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+  generation  BIGINT NOT NULL DEFAULT 0,
+  loaded_at   TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+INSERT INTO etl_load_generation DEFAULT VALUES
+ON CONFLICT (id) DO NOTHING;
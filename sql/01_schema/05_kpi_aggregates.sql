@@ -0,0 +1,121 @@
+/*
+Purpose: Materialized month-grain KPI tables for dashboards
+Notes:
+  - agg_mrr_monthly is the source of vw_mrr; agg_churn_monthly has the same rows as vw_churn_rate
+  - agg_cohort_monthly feeds vw_cohort_retention (sql/02_etl/04_refresh_cohorts.sql)
+  - agg_distinct_sketches holds HyperLogLog sketches for distinct counts
+    (sql/02_etl/05_distinct_sketches.sql)
+  - Maintained incrementally by refresh_mrr_churn() (sql/02_etl/01_refresh_mrr_churn.sql):
+    triggers record the months touched by loads in agg_dirty_months and the refresh
+    recomputes only those months
+*/
+
+SET search_path TO analytics;
+
+CREATE TABLE IF NOT EXISTS agg_mrr_monthly (
+  month  DATE PRIMARY KEY,
+  mrr    NUMERIC NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS agg_churn_monthly (
+  month              DATE PRIMARY KEY,
+  cancellations      BIGINT NOT NULL,
+  active_at_start    BIGINT NOT NULL,
+  churn_rate         NUMERIC,
+  is_complete_month  BOOLEAN NOT NULL
+);
+
+-- Months touched by new or changed rows since the last refresh
+CREATE TABLE IF NOT EXISTS agg_dirty_months (
+  kpi    TEXT NOT NULL CONSTRAINT agg_dirty_months_kpi_check CHECK (kpi IN ('mrr','churn','cohort','sketch')),
+  month  DATE NOT NULL,
+  PRIMARY KEY (kpi, month)
+);
+
+-- Schemas created before the cohort and sketch KPIs allow fewer kinds
+ALTER TABLE agg_dirty_months DROP CONSTRAINT IF EXISTS agg_dirty_months_kpi_check;
+ALTER TABLE agg_dirty_months ADD CONSTRAINT agg_dirty_months_kpi_check CHECK (kpi IN ('mrr','churn','cohort','sketch'));
+
+-- Last refresh per KPI; max_month = last month with completed payments (caps MRR spreading)
+CREATE TABLE IF NOT EXISTS agg_refresh_state (
+  kpi           TEXT PRIMARY KEY,
+  max_month     DATE,
+  refreshed_at  TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+-- Daily active subscriptions by segment (start_date <= date and (end_date IS NULL OR end_date >= date)).
+-- Dense: every day from the first month of dim_date to its last day, for every segment.
+-- Maintained by refresh_active_subscriptions() (sql/02_etl/02_refresh_active_subscriptions.sql)
+CREATE TABLE IF NOT EXISTS agg_active_subscriptions_daily (
+  date                  DATE NOT NULL,
+  plan_id               INT NOT NULL,
+  country               TEXT NOT NULL,
+  acquisition_channel   TEXT NOT NULL,
+  active_subscriptions  INT NOT NULL,
+  PRIMARY KEY (date, plan_id, country, acquisition_channel)
+);
+
+-- Start (+1) / end (-1) events not yet applied to agg_active_subscriptions_daily
+CREATE TABLE IF NOT EXISTS agg_active_deltas (
+  date                 DATE NOT NULL,
+  plan_id              INT NOT NULL,
+  country              TEXT NOT NULL,
+  acquisition_channel  TEXT NOT NULL,
+  delta                INT NOT NULL
+);
+
+-- Monthly revenue cube by payment month. Amounts are for completed transactions;
+-- the counts cover every transaction. Maintained by triggers (sql/02_etl/03_revenue_cube.sql)
+CREATE TABLE IF NOT EXISTS agg_revenue_monthly (
+  month                   DATE NOT NULL,
+  plan_id                 INT NOT NULL,
+  country                 TEXT NOT NULL,
+  acquisition_channel     TEXT NOT NULL,
+  payment_method          TEXT NOT NULL,
+  gross_amount            NUMERIC(16,2) NOT NULL,
+  discount_amount         NUMERIC(16,2) NOT NULL,
+  net_revenue             NUMERIC(16,2) NOT NULL,
+  transactions            BIGINT NOT NULL,
+  completed_transactions  BIGINT NOT NULL,
+  failed_transactions     BIGINT NOT NULL,
+  PRIMARY KEY (month, plan_id, country, acquisition_channel, payment_method)
+);
+
+-- Monthly cost rollup by cost_type (same maintenance as agg_revenue_monthly)
+CREATE TABLE IF NOT EXISTS agg_costs_monthly (
+  month         DATE NOT NULL,
+  cost_type     TEXT NOT NULL,
+  amount        NUMERIC(16,2) NOT NULL,
+  cost_records  BIGINT NOT NULL,
+  PRIMARY KEY (month, cost_type)
+);
+
+-- Signup cohorts (signup month x acquisition channel x country) by activity month.
+-- active_customers = customers with a completed billing period covering the month (capped at the
+-- last month with completed payments); net_revenue = completed payments in the month.
+-- Only (cohort, month) cells with activity. Maintained by refresh_cohorts() (sql/02_etl/04_refresh_cohorts.sql)
+CREATE TABLE IF NOT EXISTS agg_cohort_monthly (
+  cohort_month         DATE NOT NULL,
+  acquisition_channel  TEXT NOT NULL,
+  country              TEXT NOT NULL,
+  month                DATE NOT NULL,
+  active_customers     INT NOT NULL,
+  net_revenue          NUMERIC(16,2) NOT NULL,
+  PRIMARY KEY (cohort_month, acquisition_channel, country, month)
+);
+
+CREATE INDEX IF NOT EXISTS idx_agg_cohort_monthly_month ON agg_cohort_monthly (month);
+
+-- HyperLogLog sketches of the subscription_id / customer_id of completed transactions, by payment
+-- month, plan and segment: 2048 registers (about 2.3% standard error) stored bit-sliced, 32 levels of
+-- 2048 bits, so that BIT_OR merges sketches over any months and segments.
+-- Maintained by refresh_distinct_sketches() (sql/02_etl/05_distinct_sketches.sql)
+CREATE TABLE IF NOT EXISTS agg_distinct_sketches (
+  month                DATE NOT NULL,
+  plan_id              INT NOT NULL,
+  country              TEXT NOT NULL,
+  acquisition_channel  TEXT NOT NULL,
+  subscriptions        BIT(65536) NOT NULL,
+  customers            BIT(65536) NOT NULL,
+  PRIMARY KEY (month, plan_id, country, acquisition_channel)
+);
@@ -0,0 +1,117 @@
+/*
+Purpose: Create dimension and fact tables for subscription analytics (partitioned variant)
+Usage:
+  python -m src.etl.load_postgres --partitioned  -- on a database without the analytics schema
+Notes:
+  - Same columns as ../02_create_tables.sql; views, KPI queries and ETL work unchanged
+  - fact_transactions: monthly RANGE partitions on payment_date
+  - fact_costs: yearly RANGE partitions on date (a few rows per month)
+  - Partitioned primary keys must include the partition key: (transaction_id, payment_date)
+    and (cost_id, date); the ids are still generated unique by the loaders
+  - Partitions follow the dim_date range: CALL analytics.ensure_fact_partitions() after
+    loading dim_date (the loaders do it). Rows outside it land in the DEFAULT partitions
+*/
+
+SET search_path TO analytics;
+
+-- Dim Date
+CREATE TABLE dim_date (
+  date        DATE PRIMARY KEY,
+  year        INT NOT NULL,
+  month       INT NOT NULL,
+  quarter     INT NOT NULL,
+  month_name  TEXT NOT NULL
+);
+
+-- Dim Plans
+CREATE TABLE dim_plans (
+  plan_id               INT PRIMARY KEY,
+  plan_name             TEXT NOT NULL,
+  tier                  TEXT NOT NULL CHECK (tier IN ('basic','pro','premium')),
+  price                 NUMERIC(12,2) NOT NULL CHECK (price > 0),
+  cost_per_subscription NUMERIC(12,2) NOT NULL CHECK (cost_per_subscription >= 0),
+  active_flag           BOOLEAN NOT NULL
+);
+
+-- Dim Customers
+CREATE TABLE dim_customers (
+  customer_id          INT PRIMARY KEY,
+  signup_date          DATE NOT NULL,
+  country              TEXT NOT NULL,
+  acquisition_channel  TEXT NOT NULL CHECK (acquisition_channel IN ('organic','paid','referral','other'))
+);
+
+-- Dim Subscriptions
+CREATE TABLE dim_subscriptions (
+  subscription_id      INT PRIMARY KEY,
+  customer_id          INT NOT NULL REFERENCES dim_customers(customer_id),
+  plan_id              INT NOT NULL REFERENCES dim_plans(plan_id),
+  start_date           DATE NOT NULL,
+  end_date             DATE,
+  status               TEXT NOT NULL CHECK (status IN ('active','canceled')),
+  billing_cycle        TEXT NOT NULL CHECK (billing_cycle IN ('monthly','yearly')),
+  cancellation_reason  TEXT CHECK (cancellation_reason IN ('price','competitor','features','other'))
+);
+
+-- Fact Transactions
+CREATE TABLE fact_transactions (
+  transaction_id        INT NOT NULL,
+  payment_date          DATE NOT NULL,
+  customer_id           INT NOT NULL REFERENCES dim_customers(customer_id),
+  subscription_id       INT NOT NULL REFERENCES dim_subscriptions(subscription_id),
+  plan_id               INT NOT NULL REFERENCES dim_plans(plan_id),
+  gross_amount          NUMERIC(12,2) NOT NULL,
+  discount_amount       NUMERIC(12,2) NOT NULL,
+  net_revenue           NUMERIC(12,2) NOT NULL,
+  payment_method        TEXT NOT NULL CHECK (payment_method IN ('card','transfer','wallet')),
+  transaction_status    TEXT NOT NULL CHECK (transaction_status IN ('completed','failed')),
+  billing_period_start  DATE NOT NULL,
+  billing_period_end    DATE NOT NULL,
+  PRIMARY KEY (transaction_id, payment_date)
+) PARTITION BY RANGE (payment_date);
+
+CREATE TABLE fact_transactions_default PARTITION OF fact_transactions DEFAULT;
+
+-- Fact Costs
+CREATE TABLE fact_costs (
+  cost_id           INT NOT NULL,
+  date              DATE NOT NULL,
+  cost_type         TEXT NOT NULL CHECK (cost_type IN ('payment_fees','marketing','infra','support')),
+  amount            NUMERIC(14,2) NOT NULL,
+  fixed_or_variable TEXT NOT NULL CHECK (fixed_or_variable IN ('fixed','variable')),
+  PRIMARY KEY (cost_id, date)
+) PARTITION BY RANGE (date);
+
+CREATE TABLE fact_costs_default PARTITION OF fact_costs DEFAULT;
+
+-- Partitions: fact_transactions_YYYY_MM / fact_costs_YYYY for every month / year of dim_date
+CREATE OR REPLACE PROCEDURE ensure_fact_partitions()
+LANGUAGE plpgsql
+SET search_path TO analytics
+AS $$
+DECLARE
+  v_from DATE;
+BEGIN
+  FOR v_from IN
+    SELECT g::date
+    FROM (SELECT MIN(date) AS first_date, MAX(date) AS last_date FROM dim_date) d,
+         generate_series(DATE_TRUNC('month', d.first_date), d.last_date, INTERVAL '1 month') g
+  LOOP
+    EXECUTE format(
+      'CREATE TABLE IF NOT EXISTS %I PARTITION OF fact_transactions FOR VALUES FROM (%L) TO (%L)',
+      'fact_transactions_' || to_char(v_from, 'YYYY_MM'), v_from, (v_from + INTERVAL '1 month')::date
+    );
+  END LOOP;
+
+  FOR v_from IN
+    SELECT g::date
+    FROM (SELECT MIN(date) AS first_date, MAX(date) AS last_date FROM dim_date) d,
+         generate_series(DATE_TRUNC('year', d.first_date), d.last_date, INTERVAL '1 year') g
+  LOOP
+    EXECUTE format(
+      'CREATE TABLE IF NOT EXISTS %I PARTITION OF fact_costs FOR VALUES FROM (%L) TO (%L)',
+      'fact_costs_' || to_char(v_from, 'YYYY'), v_from, (v_from + INTERVAL '1 year')::date
+    );
+  END LOOP;
+END;
+$$;
@@ -0,0 +1,19 @@
+/*
+Purpose: Performance indexes for analytics queries (partitioned variant)
+Notes:
+  - Indexes on the partitioned parents are created on every partition, present and future
+  - ix_transactions_completed: the views filter transaction_status = 'completed' and group
+    by month / plan; with the month implied by payment_date (DATE_TRUNC on a date is not
+    immutable, so it cannot be an index expression) they are answered by index-only scans
+  - BRIN: a few pages per partition, enough to skip the partitions that pruning cannot
+    (billing_period_start for the MRR refresh, date ranges on fact_costs)
+*/
+
+SET search_path TO analytics;
+
+CREATE INDEX ix_transactions_completed ON fact_transactions(payment_date, plan_id)
+  INCLUDE (net_revenue) WHERE transaction_status = 'completed';
+CREATE INDEX ix_transactions_payment_date_brin ON fact_transactions USING brin (payment_date);
+CREATE INDEX ix_transactions_billing_period_start_brin ON fact_transactions USING brin (billing_period_start);
+CREATE INDEX ix_subscriptions_customer ON dim_subscriptions(customer_id);
+CREATE INDEX ix_costs_date_brin ON fact_costs USING brin (date);
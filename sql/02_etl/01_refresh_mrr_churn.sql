@@ -0,0 +1,299 @@
+/*
+Purpose: Incremental refresh of agg_mrr_monthly and agg_churn_monthly
+Usage:
+  CALL analytics.refresh_mrr_churn();      -- recompute only the months touched since the last refresh
+  CALL analytics.refresh_mrr_churn(TRUE);  -- full rebuild (after a bulk load)
+Change tracking:
+  - fact_transactions: every month covered by an inserted/updated/deleted billing period (MRR)
+  - dim_subscriptions: every month from start_date to end_date (or the last dim_date month
+    if still active) of inserted/updated/deleted subscriptions (churn)
+  - dim_date: new months (churn)
+  - A change in the last month with completed payments re-spreads every period crossing it,
+    so the months of the last year around the old and new caps are recomputed as well
+  - Active subscriptions at month start are read from agg_active_subscriptions_daily
+    (sql/02_etl/02_refresh_active_subscriptions.sql), refreshed first
+Assumptions:
+  - Billing cycles are monthly or yearly: no billing period is longer than one year
+*/
+
+SET search_path TO analytics;
+
+-- -----------------------------
+-- Change tracking
+-- -----------------------------
+CREATE OR REPLACE FUNCTION trg_transactions_dirty_months()
+RETURNS trigger
+LANGUAGE plpgsql
+SET search_path TO analytics
+AS $$
+BEGIN
+  IF TG_OP IN ('INSERT', 'UPDATE') THEN
+    INSERT INTO agg_dirty_months (kpi, month)
+    SELECT DISTINCT 'mrr', gs::date
+    FROM (
+      SELECT DISTINCT
+        DATE_TRUNC('month', billing_period_start) AS first_month,
+        DATE_TRUNC('month', billing_period_end) AS last_month
+      FROM new_rows
+    ) p
+    CROSS JOIN LATERAL GENERATE_SERIES(p.first_month, p.last_month, INTERVAL '1 month') gs
+    ON CONFLICT DO NOTHING;
+  END IF;
+
+  IF TG_OP IN ('UPDATE', 'DELETE') THEN
+    INSERT INTO agg_dirty_months (kpi, month)
+    SELECT DISTINCT 'mrr', gs::date
+    FROM (
+      SELECT DISTINCT
+        DATE_TRUNC('month', billing_period_start) AS first_month,
+        DATE_TRUNC('month', billing_period_end) AS last_month
+      FROM old_rows
+    ) p
+    CROSS JOIN LATERAL GENERATE_SERIES(p.first_month, p.last_month, INTERVAL '1 month') gs
+    ON CONFLICT DO NOTHING;
+  END IF;
+
+  RETURN NULL;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION trg_subscriptions_dirty_months()
+RETURNS trigger
+LANGUAGE plpgsql
+SET search_path TO analytics
+AS $$
+DECLARE
+  v_last_month DATE := (SELECT DATE_TRUNC('month', MAX(date))::date FROM dim_date);
+BEGIN
+  IF TG_OP IN ('INSERT', 'UPDATE') THEN
+    INSERT INTO agg_dirty_months (kpi, month)
+    SELECT DISTINCT 'churn', gs::date
+    FROM (
+      SELECT DISTINCT
+        DATE_TRUNC('month', start_date) AS first_month,
+        COALESCE(DATE_TRUNC('month', end_date), v_last_month) AS last_month
+      FROM new_rows
+    ) s
+    CROSS JOIN LATERAL GENERATE_SERIES(s.first_month, s.last_month, INTERVAL '1 month') gs
+    ON CONFLICT DO NOTHING;
+  END IF;
+
+  IF TG_OP IN ('UPDATE', 'DELETE') THEN
+    INSERT INTO agg_dirty_months (kpi, month)
+    SELECT DISTINCT 'churn', gs::date
+    FROM (
+      SELECT DISTINCT
+        DATE_TRUNC('month', start_date) AS first_month,
+        COALESCE(DATE_TRUNC('month', end_date), v_last_month) AS last_month
+      FROM old_rows
+    ) s
+    CROSS JOIN LATERAL GENERATE_SERIES(s.first_month, s.last_month, INTERVAL '1 month') gs
+    ON CONFLICT DO NOTHING;
+  END IF;
+
+  RETURN NULL;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION trg_date_dirty_months()
+RETURNS trigger
+LANGUAGE plpgsql
+SET search_path TO analytics
+AS $$
+BEGIN
+  INSERT INTO agg_dirty_months (kpi, month)
+  SELECT DISTINCT 'churn', DATE_TRUNC('month', date)::date
+  FROM new_rows
+  ON CONFLICT DO NOTHING;
+
+  RETURN NULL;
+END;
+$$;
+
+-- Transition tables need one trigger per event
+DROP TRIGGER IF EXISTS transactions_dirty_months_ins ON fact_transactions;
+DROP TRIGGER IF EXISTS transactions_dirty_months_upd ON fact_transactions;
+DROP TRIGGER IF EXISTS transactions_dirty_months_del ON fact_transactions;
+CREATE TRIGGER transactions_dirty_months_ins AFTER INSERT ON fact_transactions
+  REFERENCING NEW TABLE AS new_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION trg_transactions_dirty_months();
+CREATE TRIGGER transactions_dirty_months_upd AFTER UPDATE ON fact_transactions
+  REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION trg_transactions_dirty_months();
+CREATE TRIGGER transactions_dirty_months_del AFTER DELETE ON fact_transactions
+  REFERENCING OLD TABLE AS old_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION trg_transactions_dirty_months();
+
+DROP TRIGGER IF EXISTS subscriptions_dirty_months_ins ON dim_subscriptions;
+DROP TRIGGER IF EXISTS subscriptions_dirty_months_upd ON dim_subscriptions;
+DROP TRIGGER IF EXISTS subscriptions_dirty_months_del ON dim_subscriptions;
+CREATE TRIGGER subscriptions_dirty_months_ins AFTER INSERT ON dim_subscriptions
+  REFERENCING NEW TABLE AS new_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION trg_subscriptions_dirty_months();
+CREATE TRIGGER subscriptions_dirty_months_upd AFTER UPDATE ON dim_subscriptions
+  REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION trg_subscriptions_dirty_months();
+CREATE TRIGGER subscriptions_dirty_months_del AFTER DELETE ON dim_subscriptions
+  REFERENCING OLD TABLE AS old_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION trg_subscriptions_dirty_months();
+
+DROP TRIGGER IF EXISTS date_dirty_months_ins ON dim_date;
+CREATE TRIGGER date_dirty_months_ins AFTER INSERT ON dim_date
+  REFERENCING NEW TABLE AS new_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION trg_date_dirty_months();
+
+-- -----------------------------
+-- Refresh
+-- -----------------------------
+CREATE OR REPLACE PROCEDURE refresh_mrr_churn(full_refresh BOOLEAN DEFAULT FALSE)
+LANGUAGE plpgsql
+SET search_path TO analytics
+AS $$
+DECLARE
+  v_max_month  DATE;
+  v_old_max    DATE;
+  v_months     DATE[];
+BEGIN
+  SELECT DATE_TRUNC('month', MAX(payment_date))::date INTO v_max_month
+  FROM fact_transactions
+  WHERE transaction_status = 'completed';
+
+  IF full_refresh THEN
+    TRUNCATE agg_mrr_monthly, agg_churn_monthly;
+    -- los meses pendientes de otros KPIs (cohort) se conservan
+    DELETE FROM agg_dirty_months WHERE kpi IN ('mrr', 'churn');
+
+    INSERT INTO agg_dirty_months (kpi, month)
+    SELECT 'mrr', gs::date
+    FROM GENERATE_SERIES(
+      (SELECT DATE_TRUNC('month', MIN(billing_period_start)) FROM fact_transactions),
+      v_max_month,
+      INTERVAL '1 month'
+    ) gs
+    UNION
+    SELECT 'churn', DATE_TRUNC('month', date)::date
+    FROM dim_date;
+  ELSE
+    SELECT max_month INTO v_old_max FROM agg_refresh_state WHERE kpi = 'mrr';
+
+    -- el cap de meses cambió: los períodos que cruzan el cap anterior o el nuevo se reparten distinto
+    IF v_old_max IS DISTINCT FROM v_max_month AND COALESCE(v_old_max, v_max_month) IS NOT NULL THEN
+      INSERT INTO agg_dirty_months (kpi, month)
+      SELECT 'mrr', gs::date
+      FROM GENERATE_SERIES(
+        LEAST(v_old_max, v_max_month) - INTERVAL '1 year',
+        GREATEST(v_old_max, v_max_month),
+        INTERVAL '1 month'
+      ) gs
+      ON CONFLICT DO NOTHING;
+    END IF;
+  END IF;
+
+  -- MRR (la fuente de vw_mrr): el net_revenue de cada período repartido en sus meses,
+  -- restringido a los meses dirty
+  SELECT ARRAY_AGG(month ORDER BY month) INTO v_months
+  FROM agg_dirty_months
+  WHERE kpi = 'mrr';
+
+  IF v_months IS NOT NULL THEN
+    DELETE FROM agg_dirty_months WHERE kpi = 'mrr';
+    DELETE FROM agg_mrr_monthly WHERE month = ANY (v_months);
+
+    INSERT INTO agg_mrr_monthly (month, mrr)
+    WITH dirty AS (
+      SELECT UNNEST(v_months) AS month
+    ),
+    periods AS (
+      SELECT
+        t.net_revenue,
+        DATE_TRUNC('month', t.billing_period_start)::date AS first_month,
+        LEAST(DATE_TRUNC('month', t.billing_period_end)::date, v_max_month) AS last_month
+      FROM fact_transactions t
+      WHERE t.transaction_status = 'completed'
+        AND t.billing_period_start >= v_months[1] - INTERVAL '1 year'
+        AND t.billing_period_start < v_months[CARDINALITY(v_months)] + INTERVAL '1 month'
+        AND t.billing_period_end >= v_months[1]
+    ),
+    expanded AS (
+      SELECT
+        gs::date AS month,
+        p.net_revenue,
+        ((EXTRACT(YEAR FROM p.last_month) - EXTRACT(YEAR FROM p.first_month)) * 12
+          + EXTRACT(MONTH FROM p.last_month) - EXTRACT(MONTH FROM p.first_month) + 1)::int AS months_in_period
+      FROM periods p
+      CROSS JOIN LATERAL GENERATE_SERIES(p.first_month, p.last_month, INTERVAL '1 month') gs
+    )
+    SELECT
+      e.month,
+      ROUND(SUM(e.net_revenue / NULLIF(e.months_in_period, 0))::numeric, 2) AS mrr
+    FROM expanded e
+    JOIN dirty d USING (month)
+    GROUP BY e.month;
+  END IF;
+
+  INSERT INTO agg_refresh_state (kpi, max_month, refreshed_at)
+  VALUES ('mrr', v_max_month, now())
+  ON CONFLICT (kpi) DO UPDATE
+  SET max_month = EXCLUDED.max_month, refreshed_at = EXCLUDED.refreshed_at;
+
+  -- Churn: misma lógica que vw_churn_rate, restringida a los meses dirty presentes en dim_date;
+  -- los activos al inicio de mes salen de la serie diaria
+  CALL refresh_active_subscriptions(full_refresh);
+
+  SELECT ARRAY_AGG(d.month ORDER BY d.month) INTO v_months
+  FROM agg_dirty_months d
+  WHERE d.kpi = 'churn'
+    AND EXISTS (
+      SELECT 1 FROM dim_date dd
+      WHERE dd.date >= d.month AND dd.date < d.month + INTERVAL '1 month'
+    );
+
+  DELETE FROM agg_churn_monthly
+  WHERE month IN (SELECT month FROM agg_dirty_months WHERE kpi = 'churn');
+  DELETE FROM agg_dirty_months WHERE kpi = 'churn';
+
+  IF v_months IS NOT NULL THEN
+    INSERT INTO agg_churn_monthly (month, cancellations, active_at_start, churn_rate, is_complete_month)
+    WITH months AS (
+      SELECT UNNEST(v_months) AS month
+    ),
+    active_at_start AS (
+      SELECT
+        m.month,
+        SUM(a.active_subscriptions) AS active_at_start
+      FROM months m
+      JOIN agg_active_subscriptions_daily a ON a.date = m.month
+      GROUP BY 1
+      HAVING SUM(a.active_subscriptions) > 0
+    ),
+    cancellations AS (
+      SELECT
+        DATE_TRUNC('month', end_date)::date AS month,
+        COUNT(*) AS cancellations
+      FROM dim_subscriptions
+      WHERE status = 'canceled'
+        AND end_date >= v_months[1]
+        AND end_date < v_months[CARDINALITY(v_months)] + INTERVAL '1 month'
+      GROUP BY 1
+    )
+    SELECT
+      a.month,
+      COALESCE(c.cancellations, 0) AS cancellations,
+      a.active_at_start,
+      ROUND(COALESCE(c.cancellations, 0)::numeric / NULLIF(a.active_at_start, 0), 4) AS churn_rate,
+      FALSE AS is_complete_month
+    FROM active_at_start a
+    LEFT JOIN cancellations c USING (month);
+  END IF;
+
+  UPDATE agg_churn_monthly a
+  SET is_complete_month = (a.month < m.max_month)
+  FROM (SELECT MAX(month) AS max_month FROM agg_churn_monthly) m
+  WHERE a.is_complete_month IS DISTINCT FROM (a.month < m.max_month);
+
+  INSERT INTO agg_refresh_state (kpi, max_month, refreshed_at)
+  VALUES ('churn', (SELECT MAX(month) FROM agg_churn_monthly), now())
+  ON CONFLICT (kpi) DO UPDATE
+  SET max_month = EXCLUDED.max_month, refreshed_at = EXCLUDED.refreshed_at;
+END;
+$$;
@@ -0,0 +1,233 @@
+/*
+Purpose: Daily active-subscription series by plan, country and acquisition channel
+Usage:
+  CALL analytics.refresh_active_subscriptions();      -- apply the pending start/end events
+  CALL analytics.refresh_active_subscriptions(TRUE);  -- full rebuild
+  (refresh_mrr_churn() calls it before recomputing churn)
+Method:
+  - Each subscription is a +1 event on start_date and a -1 event on end_date + 1
+    (active on its end_date, as in vw_churn_rate)
+  - Triggers on dim_subscriptions queue the events of inserted/updated/deleted rows in
+    agg_active_deltas (an update = remove the old row + add the new one)
+  - The refresh adds the running sum of the pending events to every later day of the
+    affected segments: cost depends on the changed days, not on the subscription count
+  - Events after the last dim_date day stay pending until the series reaches them
+Assumptions:
+  - dim_customers is append-only (country / channel of a customer never change)
+*/
+
+SET search_path TO analytics;
+
+-- -----------------------------
+-- Change tracking
+-- -----------------------------
+CREATE OR REPLACE FUNCTION trg_subscriptions_active_deltas()
+RETURNS trigger
+LANGUAGE plpgsql
+SET search_path TO analytics
+AS $$
+BEGIN
+  -- transition tables: sólo existen las del evento del trigger
+  IF TG_OP = 'INSERT' THEN
+    INSERT INTO agg_active_deltas (date, plan_id, country, acquisition_channel, delta)
+    SELECT e.date, s.plan_id, c.country, c.acquisition_channel, SUM(s.sign * e.delta)
+    FROM (
+      SELECT 1 AS sign, customer_id, plan_id, start_date, end_date FROM new_rows
+    ) s
+    JOIN dim_customers c USING (customer_id)
+    CROSS JOIN LATERAL (
+      VALUES
+        (s.start_date, 1),
+        (CASE WHEN s.end_date IS NOT NULL THEN GREATEST(s.end_date + 1, s.start_date) END, -1)
+    ) e(date, delta)
+    WHERE e.date IS NOT NULL
+    GROUP BY 1, 2, 3, 4
+    HAVING SUM(s.sign * e.delta) <> 0;
+  ELSIF TG_OP = 'DELETE' THEN
+    INSERT INTO agg_active_deltas (date, plan_id, country, acquisition_channel, delta)
+    SELECT e.date, s.plan_id, c.country, c.acquisition_channel, SUM(s.sign * e.delta)
+    FROM (
+      SELECT -1 AS sign, customer_id, plan_id, start_date, end_date FROM old_rows
+    ) s
+    JOIN dim_customers c USING (customer_id)
+    CROSS JOIN LATERAL (
+      VALUES
+        (s.start_date, 1),
+        (CASE WHEN s.end_date IS NOT NULL THEN GREATEST(s.end_date + 1, s.start_date) END, -1)
+    ) e(date, delta)
+    WHERE e.date IS NOT NULL
+    GROUP BY 1, 2, 3, 4
+    HAVING SUM(s.sign * e.delta) <> 0;
+  ELSE
+    -- UPDATE: fila vieja (-) y nueva (+) en un solo INSERT, así los eventos que no
+    -- cambian (ej: start_date de una cancelación) se anulan
+    INSERT INTO agg_active_deltas (date, plan_id, country, acquisition_channel, delta)
+    SELECT e.date, s.plan_id, c.country, c.acquisition_channel, SUM(s.sign * e.delta)
+    FROM (
+      SELECT 1 AS sign, customer_id, plan_id, start_date, end_date FROM new_rows
+      UNION ALL
+      SELECT -1, customer_id, plan_id, start_date, end_date FROM old_rows
+    ) s
+    JOIN dim_customers c USING (customer_id)
+    CROSS JOIN LATERAL (
+      VALUES
+        (s.start_date, 1),
+        (CASE WHEN s.end_date IS NOT NULL THEN GREATEST(s.end_date + 1, s.start_date) END, -1)
+    ) e(date, delta)
+    WHERE e.date IS NOT NULL
+    GROUP BY 1, 2, 3, 4
+    HAVING SUM(s.sign * e.delta) <> 0;
+  END IF;
+
+  RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS subscriptions_active_deltas_ins ON dim_subscriptions;
+DROP TRIGGER IF EXISTS subscriptions_active_deltas_upd ON dim_subscriptions;
+DROP TRIGGER IF EXISTS subscriptions_active_deltas_del ON dim_subscriptions;
+CREATE TRIGGER subscriptions_active_deltas_ins AFTER INSERT ON dim_subscriptions
+  REFERENCING NEW TABLE AS new_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION trg_subscriptions_active_deltas();
+CREATE TRIGGER subscriptions_active_deltas_upd AFTER UPDATE ON dim_subscriptions
+  REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION trg_subscriptions_active_deltas();
+CREATE TRIGGER subscriptions_active_deltas_del AFTER DELETE ON dim_subscriptions
+  REFERENCING OLD TABLE AS old_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION trg_subscriptions_active_deltas();
+
+-- -----------------------------
+-- Refresh
+-- -----------------------------
+CREATE OR REPLACE PROCEDURE refresh_active_subscriptions(full_refresh BOOLEAN DEFAULT FALSE)
+LANGUAGE plpgsql
+SET search_path TO analytics
+AS $$
+DECLARE
+  v_first   DATE;
+  v_last    DATE;
+  v_loaded  DATE;
+BEGIN
+  SELECT DATE_TRUNC('month', MIN(date))::date, MAX(date) INTO v_first, v_last FROM dim_date;
+  SELECT MAX(date) INTO v_loaded FROM agg_active_subscriptions_daily;
+
+  -- la serie arranca en el primer mes de dim_date; si dim_date creció hacia atrás, se reconstruye
+  IF NOT full_refresh AND v_loaded IS NOT NULL THEN
+    full_refresh := (SELECT MIN(date) FROM agg_active_subscriptions_daily) <> v_first;
+  END IF;
+
+  IF full_refresh OR v_loaded IS NULL THEN
+    TRUNCATE agg_active_subscriptions_daily, agg_active_deltas;
+
+    INSERT INTO agg_active_deltas (date, plan_id, country, acquisition_channel, delta)
+    SELECT e.date, s.plan_id, c.country, c.acquisition_channel, SUM(e.delta)
+    FROM dim_subscriptions s
+    JOIN dim_customers c USING (customer_id)
+    CROSS JOIN LATERAL (
+      VALUES
+        (s.start_date, 1),
+        (CASE WHEN s.end_date IS NOT NULL THEN GREATEST(s.end_date + 1, s.start_date) END, -1)
+    ) e(date, delta)
+    WHERE e.date IS NOT NULL
+    GROUP BY 1, 2, 3, 4
+    HAVING SUM(e.delta) <> 0;
+
+    IF v_first IS NULL THEN
+      RETURN;
+    END IF;
+
+    -- serie completa: cumsum de los eventos por segmento sobre todos los días
+    -- (eventos + una fila en cero por día y segmento, sin joins: no depende de estimaciones)
+    INSERT INTO agg_active_subscriptions_daily (date, plan_id, country, acquisition_channel, active_subscriptions)
+    WITH events AS (
+      SELECT GREATEST(date, v_first) AS date, plan_id, country, acquisition_channel, delta
+      FROM agg_active_deltas
+      WHERE date <= v_last
+    ),
+    segments AS (
+      SELECT DISTINCT plan_id, country, acquisition_channel
+      FROM events
+    )
+    SELECT
+      date,
+      plan_id,
+      country,
+      acquisition_channel,
+      SUM(SUM(delta)) OVER (PARTITION BY plan_id, country, acquisition_channel ORDER BY date)
+    FROM (
+      SELECT date, plan_id, country, acquisition_channel, delta
+      FROM events
+      UNION ALL
+      SELECT d::date, sg.plan_id, sg.country, sg.acquisition_channel, 0
+      FROM GENERATE_SERIES(v_first, v_last, INTERVAL '1 day') d
+      CROSS JOIN segments sg
+    ) x
+    GROUP BY date, plan_id, country, acquisition_channel;
+
+    DELETE FROM agg_active_deltas WHERE date <= v_last;
+    RETURN;
+  END IF;
+
+  -- segmentos nuevos: ceros en los días ya cargados
+  INSERT INTO agg_active_subscriptions_daily (date, plan_id, country, acquisition_channel, active_subscriptions)
+  SELECT d::date, n.plan_id, n.country, n.acquisition_channel, 0
+  FROM (
+    SELECT DISTINCT plan_id, country, acquisition_channel FROM agg_active_deltas
+    EXCEPT
+    SELECT plan_id, country, acquisition_channel FROM agg_active_subscriptions_daily WHERE date = v_loaded
+  ) n
+  CROSS JOIN GENERATE_SERIES(v_first, v_loaded, INTERVAL '1 day') d;
+
+  -- días nuevos: arrastran el valor del último día cargado
+  INSERT INTO agg_active_subscriptions_daily (date, plan_id, country, acquisition_channel, active_subscriptions)
+  SELECT d::date, a.plan_id, a.country, a.acquisition_channel, a.active_subscriptions
+  FROM agg_active_subscriptions_daily a
+  CROSS JOIN GENERATE_SERIES(v_loaded + 1, v_last, INTERVAL '1 day') d
+  WHERE a.date = v_loaded;
+
+  -- eventos pendientes: cada segmento suma su cumsum desde el primer día con eventos
+  UPDATE agg_active_subscriptions_daily a
+  SET active_subscriptions = a.active_subscriptions + c.delta
+  FROM (
+    WITH events AS (
+      SELECT GREATEST(date, v_first) AS date, plan_id, country, acquisition_channel, SUM(delta) AS delta
+      FROM agg_active_deltas
+      WHERE date <= v_last
+      GROUP BY 1, 2, 3, 4
+      HAVING SUM(delta) <> 0
+    ),
+    first_event AS (
+      SELECT plan_id, country, acquisition_channel, MIN(date) AS date
+      FROM events
+      GROUP BY 1, 2, 3
+    )
+    SELECT
+      date,
+      plan_id,
+      country,
+      acquisition_channel,
+      SUM(SUM(delta)) OVER (PARTITION BY plan_id, country, acquisition_channel ORDER BY date) AS delta
+    FROM (
+      SELECT date, plan_id, country, acquisition_channel, delta
+      FROM events
+      UNION ALL
+      SELECT s.date, s.plan_id, s.country, s.acquisition_channel, 0
+      FROM agg_active_subscriptions_daily s
+      JOIN first_event f
+        ON f.plan_id = s.plan_id
+       AND f.country = s.country
+       AND f.acquisition_channel = s.acquisition_channel
+       AND s.date >= f.date
+      WHERE s.date >= (SELECT MIN(date) FROM events)
+    ) x
+    GROUP BY date, plan_id, country, acquisition_channel
+  ) c
+  WHERE a.date = c.date
+    AND a.plan_id = c.plan_id
+    AND a.country = c.country
+    AND a.acquisition_channel = c.acquisition_channel
+    AND c.delta <> 0;
+
+  DELETE FROM agg_active_deltas WHERE date <= v_last;
+END;
+$$;
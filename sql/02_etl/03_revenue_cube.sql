@@ -0,0 +1,167 @@
+/*
+Purpose: Maintenance of the monthly revenue cube (agg_revenue_monthly) and cost rollup (agg_costs_monthly)
+Usage:
+  CALL analytics.rebuild_revenue_cube();  -- full rebuild (after a bulk load)
+Method:
+  - All measures are additive: statement-level triggers on fact_transactions / fact_costs
+    aggregate the inserted (+) and deleted (-) rows of each statement (an update = both)
+    and upsert them into the cube, so it is always current without a refresh step
+  - Cells left without rows are deleted
+  - The bulk load disables the triggers and rebuilds both tables once
+Assumptions:
+  - dim_customers is append-only (country / channel of a customer never change)
+*/
+
+SET search_path TO analytics;
+
+-- -----------------------------
+-- Change tracking
+-- -----------------------------
+CREATE OR REPLACE FUNCTION trg_transactions_revenue_cube()
+RETURNS trigger
+LANGUAGE plpgsql
+SET search_path TO analytics
+AS $$
+DECLARE
+  -- transition tables: sólo existen las del evento del trigger
+  v_rows TEXT := CASE TG_OP
+    WHEN 'INSERT' THEN 'SELECT 1 AS sign, * FROM new_rows'
+    WHEN 'DELETE' THEN 'SELECT -1 AS sign, * FROM old_rows'
+    ELSE 'SELECT 1 AS sign, * FROM new_rows UNION ALL SELECT -1, * FROM old_rows'
+  END;
+BEGIN
+  EXECUTE format($sql$
+    INSERT INTO agg_revenue_monthly AS a (
+      month, plan_id, country, acquisition_channel, payment_method,
+      gross_amount, discount_amount, net_revenue,
+      transactions, completed_transactions, failed_transactions
+    )
+    SELECT
+      DATE_TRUNC('month', t.payment_date)::date,
+      t.plan_id,
+      c.country,
+      c.acquisition_channel,
+      t.payment_method,
+      COALESCE(SUM(t.sign * t.gross_amount) FILTER (WHERE t.transaction_status = 'completed'), 0),
+      COALESCE(SUM(t.sign * t.discount_amount) FILTER (WHERE t.transaction_status = 'completed'), 0),
+      COALESCE(SUM(t.sign * t.net_revenue) FILTER (WHERE t.transaction_status = 'completed'), 0),
+      SUM(t.sign),
+      COALESCE(SUM(t.sign) FILTER (WHERE t.transaction_status = 'completed'), 0),
+      COALESCE(SUM(t.sign) FILTER (WHERE t.transaction_status = 'failed'), 0)
+    FROM (%s) t
+    JOIN dim_customers c USING (customer_id)
+    GROUP BY 1, 2, 3, 4, 5
+    ON CONFLICT (month, plan_id, country, acquisition_channel, payment_method) DO UPDATE
+    SET gross_amount = a.gross_amount + EXCLUDED.gross_amount,
+        discount_amount = a.discount_amount + EXCLUDED.discount_amount,
+        net_revenue = a.net_revenue + EXCLUDED.net_revenue,
+        transactions = a.transactions + EXCLUDED.transactions,
+        completed_transactions = a.completed_transactions + EXCLUDED.completed_transactions,
+        failed_transactions = a.failed_transactions + EXCLUDED.failed_transactions
+  $sql$, v_rows);
+
+  IF TG_OP <> 'INSERT' THEN
+    DELETE FROM agg_revenue_monthly WHERE transactions = 0;
+  END IF;
+
+  RETURN NULL;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION trg_costs_revenue_cube()
+RETURNS trigger
+LANGUAGE plpgsql
+SET search_path TO analytics
+AS $$
+DECLARE
+  v_rows TEXT := CASE TG_OP
+    WHEN 'INSERT' THEN 'SELECT 1 AS sign, * FROM new_rows'
+    WHEN 'DELETE' THEN 'SELECT -1 AS sign, * FROM old_rows'
+    ELSE 'SELECT 1 AS sign, * FROM new_rows UNION ALL SELECT -1, * FROM old_rows'
+  END;
+BEGIN
+  EXECUTE format($sql$
+    INSERT INTO agg_costs_monthly AS a (month, cost_type, amount, cost_records)
+    SELECT
+      DATE_TRUNC('month', k.date)::date,
+      k.cost_type,
+      SUM(k.sign * k.amount),
+      SUM(k.sign)
+    FROM (%s) k
+    GROUP BY 1, 2
+    ON CONFLICT (month, cost_type) DO UPDATE
+    SET amount = a.amount + EXCLUDED.amount,
+        cost_records = a.cost_records + EXCLUDED.cost_records
+  $sql$, v_rows);
+
+  IF TG_OP <> 'INSERT' THEN
+    DELETE FROM agg_costs_monthly WHERE cost_records = 0;
+  END IF;
+
+  RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS transactions_revenue_cube_ins ON fact_transactions;
+DROP TRIGGER IF EXISTS transactions_revenue_cube_upd ON fact_transactions;
+DROP TRIGGER IF EXISTS transactions_revenue_cube_del ON fact_transactions;
+CREATE TRIGGER transactions_revenue_cube_ins AFTER INSERT ON fact_transactions
+  REFERENCING NEW TABLE AS new_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION trg_transactions_revenue_cube();
+CREATE TRIGGER transactions_revenue_cube_upd AFTER UPDATE ON fact_transactions
+  REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION trg_transactions_revenue_cube();
+CREATE TRIGGER transactions_revenue_cube_del AFTER DELETE ON fact_transactions
+  REFERENCING OLD TABLE AS old_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION trg_transactions_revenue_cube();
+
+DROP TRIGGER IF EXISTS costs_revenue_cube_ins ON fact_costs;
+DROP TRIGGER IF EXISTS costs_revenue_cube_upd ON fact_costs;
+DROP TRIGGER IF EXISTS costs_revenue_cube_del ON fact_costs;
+CREATE TRIGGER costs_revenue_cube_ins AFTER INSERT ON fact_costs
+  REFERENCING NEW TABLE AS new_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION trg_costs_revenue_cube();
+CREATE TRIGGER costs_revenue_cube_upd AFTER UPDATE ON fact_costs
+  REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION trg_costs_revenue_cube();
+CREATE TRIGGER costs_revenue_cube_del AFTER DELETE ON fact_costs
+  REFERENCING OLD TABLE AS old_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION trg_costs_revenue_cube();
+
+-- -----------------------------
+-- Full rebuild
+-- -----------------------------
+CREATE OR REPLACE PROCEDURE rebuild_revenue_cube()
+LANGUAGE plpgsql
+SET search_path TO analytics
+AS $$
+BEGIN
+  TRUNCATE agg_revenue_monthly, agg_costs_monthly;
+
+  INSERT INTO agg_revenue_monthly (
+    month, plan_id, country, acquisition_channel, payment_method,
+    gross_amount, discount_amount, net_revenue,
+    transactions, completed_transactions, failed_transactions
+  )
+  SELECT
+    DATE_TRUNC('month', t.payment_date)::date,
+    t.plan_id,
+    c.country,
+    c.acquisition_channel,
+    t.payment_method,
+    COALESCE(SUM(t.gross_amount) FILTER (WHERE t.transaction_status = 'completed'), 0),
+    COALESCE(SUM(t.discount_amount) FILTER (WHERE t.transaction_status = 'completed'), 0),
+    COALESCE(SUM(t.net_revenue) FILTER (WHERE t.transaction_status = 'completed'), 0),
+    COUNT(*),
+    COUNT(*) FILTER (WHERE t.transaction_status = 'completed'),
+    COUNT(*) FILTER (WHERE t.transaction_status = 'failed')
+  FROM fact_transactions t
+  JOIN dim_customers c USING (customer_id)
+  GROUP BY 1, 2, 3, 4, 5;
+
+  INSERT INTO agg_costs_monthly (month, cost_type, amount, cost_records)
+  SELECT DATE_TRUNC('month', date)::date, cost_type, SUM(amount), COUNT(*)
+  FROM fact_costs
+  GROUP BY 1, 2;
+END;
+$$;
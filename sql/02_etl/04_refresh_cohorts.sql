@@ -0,0 +1,169 @@
+/*
+Purpose: Incremental refresh of agg_cohort_monthly (signup cohorts: retention and revenue by month)
+Usage:
+  CALL analytics.refresh_cohorts();      -- recompute only the months touched since the last refresh
+  CALL analytics.refresh_cohorts(TRUE);  -- full rebuild (after a bulk load)
+Method:
+  - A month is computed from the billing periods that can cover it (started at most one year
+    before) and the payments made in it, never from a cohort x months x transactions join:
+    the cost is linear in the transactions of the dirty months
+  - Triggers on fact_transactions record the months covered by each changed billing period
+    and its payment month in agg_dirty_months (kpi = 'cohort')
+  - Coverage is capped at the last month with completed payments (as in vw_mrr); when that
+    month moves, the months between the old and new cap are recomputed as well
+Assumptions:
+  - Billing cycles are monthly or yearly: no billing period is longer than one year
+  - dim_customers is append-only (signup_date / country / channel of a customer never change)
+*/
+
+SET search_path TO analytics;
+
+-- -----------------------------
+-- Change tracking
+-- -----------------------------
+CREATE OR REPLACE FUNCTION trg_transactions_dirty_cohorts()
+RETURNS trigger
+LANGUAGE plpgsql
+SET search_path TO analytics
+AS $$
+DECLARE
+  v_rows TEXT := CASE TG_OP
+    WHEN 'INSERT' THEN 'SELECT * FROM new_rows'
+    WHEN 'DELETE' THEN 'SELECT * FROM old_rows'
+    ELSE 'SELECT * FROM new_rows UNION ALL SELECT * FROM old_rows'
+  END;
+BEGIN
+  EXECUTE format($sql$
+    INSERT INTO agg_dirty_months (kpi, month)
+    SELECT DISTINCT 'cohort', m::date
+    FROM (
+      SELECT DISTINCT
+        DATE_TRUNC('month', billing_period_start) AS first_month,
+        DATE_TRUNC('month', billing_period_end) AS last_month,
+        DATE_TRUNC('month', payment_date) AS payment_month
+      FROM (%s) t
+    ) p
+    CROSS JOIN LATERAL (
+      SELECT gs FROM GENERATE_SERIES(p.first_month, p.last_month, INTERVAL '1 month') gs
+      UNION
+      SELECT p.payment_month
+    ) months(m)
+    ON CONFLICT DO NOTHING
+  $sql$, v_rows);
+
+  RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS transactions_dirty_cohorts_ins ON fact_transactions;
+DROP TRIGGER IF EXISTS transactions_dirty_cohorts_upd ON fact_transactions;
+DROP TRIGGER IF EXISTS transactions_dirty_cohorts_del ON fact_transactions;
+CREATE TRIGGER transactions_dirty_cohorts_ins AFTER INSERT ON fact_transactions
+  REFERENCING NEW TABLE AS new_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION trg_transactions_dirty_cohorts();
+CREATE TRIGGER transactions_dirty_cohorts_upd AFTER UPDATE ON fact_transactions
+  REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION trg_transactions_dirty_cohorts();
+CREATE TRIGGER transactions_dirty_cohorts_del AFTER DELETE ON fact_transactions
+  REFERENCING OLD TABLE AS old_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION trg_transactions_dirty_cohorts();
+
+-- -----------------------------
+-- Refresh
+-- -----------------------------
+CREATE OR REPLACE PROCEDURE refresh_cohorts(full_refresh BOOLEAN DEFAULT FALSE)
+LANGUAGE plpgsql
+SET search_path TO analytics
+AS $$
+DECLARE
+  v_max_month  DATE;
+  v_old_max    DATE;
+  v_months     DATE[];
+BEGIN
+  SELECT DATE_TRUNC('month', MAX(payment_date))::date INTO v_max_month
+  FROM fact_transactions
+  WHERE transaction_status = 'completed';
+
+  IF full_refresh THEN
+    TRUNCATE agg_cohort_monthly;
+    DELETE FROM agg_dirty_months WHERE kpi = 'cohort';
+
+    INSERT INTO agg_dirty_months (kpi, month)
+    SELECT 'cohort', gs::date
+    FROM GENERATE_SERIES(
+      (SELECT DATE_TRUNC('month', MIN(LEAST(billing_period_start, payment_date))) FROM fact_transactions),
+      v_max_month,
+      INTERVAL '1 month'
+    ) gs;
+  ELSE
+    SELECT max_month INTO v_old_max FROM agg_refresh_state WHERE kpi = 'cohort';
+
+    -- el cap de cobertura se movió: los meses entre el cap anterior y el nuevo cambian
+    IF v_old_max IS DISTINCT FROM v_max_month AND COALESCE(v_old_max, v_max_month) IS NOT NULL THEN
+      INSERT INTO agg_dirty_months (kpi, month)
+      SELECT 'cohort', gs::date
+      FROM GENERATE_SERIES(
+        LEAST(v_old_max, v_max_month),
+        GREATEST(v_old_max, v_max_month),
+        INTERVAL '1 month'
+      ) gs
+      ON CONFLICT DO NOTHING;
+    END IF;
+  END IF;
+
+  SELECT ARRAY_AGG(month ORDER BY month) INTO v_months
+  FROM agg_dirty_months
+  WHERE kpi = 'cohort';
+
+  IF v_months IS NOT NULL THEN
+    DELETE FROM agg_dirty_months WHERE kpi = 'cohort';
+    DELETE FROM agg_cohort_monthly WHERE month = ANY (v_months);
+
+    INSERT INTO agg_cohort_monthly (cohort_month, acquisition_channel, country, month, active_customers, net_revenue)
+    WITH dirty AS (
+      SELECT UNNEST(v_months) AS month
+    ),
+    covered AS (
+      -- (customer, mes) con algún período completado que lo cubre, una vez por par
+      SELECT DISTINCT t.customer_id, gs::date AS month
+      FROM fact_transactions t
+      CROSS JOIN LATERAL GENERATE_SERIES(
+        DATE_TRUNC('month', t.billing_period_start),
+        LEAST(DATE_TRUNC('month', t.billing_period_end)::date, v_max_month),
+        INTERVAL '1 month'
+      ) gs
+      WHERE t.transaction_status = 'completed'
+        AND t.billing_period_start >= v_months[1] - INTERVAL '1 year'
+        AND t.billing_period_start < v_months[CARDINALITY(v_months)] + INTERVAL '1 month'
+        AND t.billing_period_end >= v_months[1]
+    ),
+    activity AS (
+      SELECT c.customer_id, c.month, 1 AS active, 0::numeric AS net_revenue
+      FROM covered c
+      JOIN dirty d USING (month)
+      UNION ALL
+      SELECT t.customer_id, DATE_TRUNC('month', t.payment_date)::date, 0, t.net_revenue
+      FROM fact_transactions t
+      WHERE t.transaction_status = 'completed'
+        AND t.payment_date >= v_months[1]
+        AND t.payment_date < v_months[CARDINALITY(v_months)] + INTERVAL '1 month'
+        AND DATE_TRUNC('month', t.payment_date)::date = ANY (v_months)
+    )
+    SELECT
+      DATE_TRUNC('month', c.signup_date)::date,
+      c.acquisition_channel,
+      c.country,
+      a.month,
+      SUM(a.active),
+      SUM(a.net_revenue)
+    FROM activity a
+    JOIN dim_customers c USING (customer_id)
+    GROUP BY 1, 2, 3, 4;
+  END IF;
+
+  INSERT INTO agg_refresh_state (kpi, max_month, refreshed_at)
+  VALUES ('cohort', v_max_month, now())
+  ON CONFLICT (kpi) DO UPDATE
+  SET max_month = EXCLUDED.max_month, refreshed_at = EXCLUDED.refreshed_at;
+END;
+$$;
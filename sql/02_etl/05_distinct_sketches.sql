@@ -0,0 +1,279 @@
+/*
+Purpose: HyperLogLog sketches for distinct subscription / customer counts (agg_distinct_sketches)
+Usage:
+  CALL analytics.refresh_distinct_sketches();      -- rebuild only the months touched since the last refresh
+  CALL analytics.refresh_distinct_sketches(TRUE);  -- full rebuild (after a bulk load)
+  SELECT analytics.distinct_count('subscription', DATE '2024-01-01', DATE '2024-06-01', ARRAY[1, 2]);
+  SELECT analytics.distinct_count('customer', countries => ARRAY['AR'], exact => TRUE);
+  SELECT plan_id, analytics.hll_estimate(BIT_OR(customers)) FROM analytics.agg_distinct_sketches GROUP BY 1;
+Method:
+  - COUNT(DISTINCT ...) does not roll up: the distinct subscriptions of a quarter are not the sum
+    of its months. A sketch per (payment month, plan, country, acquisition channel) does: the
+    union of any set of cells is the register-wise max of their sketches
+  - hash = hashint4extended(id, 0); register = its low 11 bits; rho = leading zeros of the other
+    53 bits + 1, capped at 32 (reaching it takes billions of ids). Each of the 2048 registers
+    keeps the max rho seen (0 = empty)
+  - Bit-sliced storage: BIT(65536) = 32 levels of 2048 bits; bit r of level L is set when
+    register r >= L. The register-wise max is then a bitwise OR, so BIT_OR merges any number
+    of sketches in C, and BIT_COUNT of each level gives how many registers reach it
+  - Estimate: alpha * m^2 / SUM(2^-register), with linear counting for small cardinalities;
+    the standard error is about 1.04 / sqrt(2048) = 2.3%
+  - Sketches cannot subtract rows: triggers on fact_transactions record the payment months of
+    changed completed transactions in agg_dirty_months (kpi = 'sketch') and the refresh rebuilds
+    those months from their transactions
+  - distinct_count(..., exact => TRUE) runs the same filters as COUNT(DISTINCT) on fact_transactions,
+    to verify the estimates
+  - src/analytics/sketches.py builds the same sketches and estimates from the generated files
+Assumptions:
+  - dim_customers is append-only (country / channel of a customer never change)
+*/
+
+SET search_path TO analytics;
+
+-- -----------------------------
+-- HyperLogLog
+-- -----------------------------
+CREATE OR REPLACE FUNCTION hll_hash(id INT)
+RETURNS BIGINT
+LANGUAGE sql IMMUTABLE PARALLEL SAFE
+AS $$ SELECT hashint4extended(id, 0) $$;
+
+CREATE OR REPLACE FUNCTION hll_register(h BIGINT)
+RETURNS INT
+LANGUAGE sql IMMUTABLE PARALLEL SAFE
+AS $$ SELECT (h & 2047)::int $$;
+
+CREATE OR REPLACE FUNCTION hll_rho(h BIGINT)
+RETURNS INT
+LANGUAGE sql IMMUTABLE PARALLEL SAFE
+AS $$
+  SELECT LEAST(
+    CASE
+      WHEN (h >> 11) & 9007199254740991 = 0 THEN 54
+      ELSE POSITION(B'1' IN ((h >> 11) & 9007199254740991)::bit(64)) - 11
+    END,
+    32
+  )
+$$;
+
+-- Cardinality of a (merged) sketch; NULL sketch (no cells) = 0
+CREATE OR REPLACE FUNCTION hll_estimate(sketch BIT)
+RETURNS BIGINT
+LANGUAGE sql IMMUTABLE PARALLEL SAFE
+AS $$
+  SELECT COALESCE(
+    CASE
+      WHEN e.raw <= 2.5 * 2048 AND e.zeros > 0 THEN ROUND(2048 * LN(2048.0::float8 / e.zeros))
+      ELSE ROUND(e.raw)
+    END::bigint,
+    0
+  )
+  FROM (
+    SELECT
+      0.7213::float8 / (1 + 1.079::float8 / 2048) * 2048 * 2048 / (h.harmonic_sum + h.zeros) AS raw,
+      h.zeros
+    FROM (
+      -- registers exactly at level L = n(L) - n(L + 1); the empty ones add 2^0 each
+      SELECT
+        SUM((n - next_n) * POWER(2::float8, -level)) AS harmonic_sum,
+        2048 - MAX(n) FILTER (WHERE level = 1) AS zeros
+      FROM (
+        SELECT level, n, LEAD(n, 1, 0) OVER (ORDER BY level) AS next_n
+        FROM (
+          SELECT level, BIT_COUNT(SUBSTRING(sketch FROM (level - 1) * 2048 + 1 FOR 2048)) AS n
+          FROM GENERATE_SERIES(1, 32) level
+        ) counts
+      ) levels
+    ) h
+  ) e
+$$;
+
+-- -----------------------------
+-- Change tracking
+-- -----------------------------
+CREATE OR REPLACE FUNCTION trg_transactions_dirty_sketches()
+RETURNS trigger
+LANGUAGE plpgsql
+SET search_path TO analytics
+AS $$
+DECLARE
+  v_rows TEXT := CASE TG_OP
+    WHEN 'INSERT' THEN 'SELECT * FROM new_rows'
+    WHEN 'DELETE' THEN 'SELECT * FROM old_rows'
+    ELSE 'SELECT * FROM new_rows UNION ALL SELECT * FROM old_rows'
+  END;
+BEGIN
+  EXECUTE format($sql$
+    INSERT INTO agg_dirty_months (kpi, month)
+    SELECT DISTINCT 'sketch', DATE_TRUNC('month', payment_date)::date
+    FROM (%s) t
+    WHERE transaction_status = 'completed'
+    ON CONFLICT DO NOTHING
+  $sql$, v_rows);
+
+  RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS transactions_dirty_sketches_ins ON fact_transactions;
+DROP TRIGGER IF EXISTS transactions_dirty_sketches_upd ON fact_transactions;
+DROP TRIGGER IF EXISTS transactions_dirty_sketches_del ON fact_transactions;
+CREATE TRIGGER transactions_dirty_sketches_ins AFTER INSERT ON fact_transactions
+  REFERENCING NEW TABLE AS new_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION trg_transactions_dirty_sketches();
+CREATE TRIGGER transactions_dirty_sketches_upd AFTER UPDATE ON fact_transactions
+  REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION trg_transactions_dirty_sketches();
+CREATE TRIGGER transactions_dirty_sketches_del AFTER DELETE ON fact_transactions
+  REFERENCING OLD TABLE AS old_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION trg_transactions_dirty_sketches();
+
+-- -----------------------------
+-- Refresh
+-- -----------------------------
+CREATE OR REPLACE PROCEDURE refresh_distinct_sketches(full_refresh BOOLEAN DEFAULT FALSE)
+LANGUAGE plpgsql
+SET search_path TO analytics
+-- la agregación por (celda, registro) tiene ~1 grupo cada 2 filas: que no vaya a disco
+SET work_mem TO '256MB'
+AS $$
+DECLARE
+  v_months  DATE[];
+BEGIN
+  IF full_refresh THEN
+    TRUNCATE agg_distinct_sketches;
+    DELETE FROM agg_dirty_months WHERE kpi = 'sketch';
+
+    INSERT INTO agg_dirty_months (kpi, month)
+    SELECT 'sketch', gs::date
+    FROM GENERATE_SERIES(
+      (SELECT DATE_TRUNC('month', MIN(payment_date)) FROM fact_transactions WHERE transaction_status = 'completed'),
+      (SELECT DATE_TRUNC('month', MAX(payment_date)) FROM fact_transactions WHERE transaction_status = 'completed'),
+      INTERVAL '1 month'
+    ) gs;
+  END IF;
+
+  SELECT ARRAY_AGG(month ORDER BY month) INTO v_months
+  FROM agg_dirty_months
+  WHERE kpi = 'sketch';
+
+  IF v_months IS NULL THEN
+    RETURN;
+  END IF;
+
+  DELETE FROM agg_dirty_months WHERE kpi = 'sketch';
+  DELETE FROM agg_distinct_sketches WHERE month = ANY (v_months);
+
+  INSERT INTO agg_distinct_sketches (month, plan_id, country, acquisition_channel, subscriptions, customers)
+  WITH paid AS (
+    SELECT
+      DATE_TRUNC('month', t.payment_date)::date AS month,
+      t.plan_id,
+      c.country,
+      c.acquisition_channel,
+      t.subscription_id,
+      t.customer_id
+    FROM fact_transactions t
+    JOIN dim_customers c USING (customer_id)
+    WHERE t.transaction_status = 'completed'
+      AND t.payment_date >= v_months[1]
+      AND t.payment_date < v_months[CARDINALITY(v_months)] + INTERVAL '1 month'
+      AND DATE_TRUNC('month', t.payment_date)::date = ANY (v_months)
+  ),
+  registers AS (
+    -- max rho por registro, para cada celda y tipo de id
+    SELECT month, plan_id, country, acquisition_channel, 'subscription' AS kind,
+      hll_register(hll_hash(subscription_id)) AS register, MAX(hll_rho(hll_hash(subscription_id))) AS rho
+    FROM paid
+    GROUP BY 1, 2, 3, 4, 5, 6
+    UNION ALL
+    SELECT month, plan_id, country, acquisition_channel, 'customer',
+      hll_register(hll_hash(customer_id)), MAX(hll_rho(hll_hash(customer_id)))
+    FROM paid
+    GROUP BY 1, 2, 3, 4, 5, 6
+  ),
+  rhos AS (
+    -- un carácter por registro: 'A' + rho ('A' = vacío), con los registros vacíos intermedios y finales
+    SELECT
+      month, plan_id, country, acquisition_channel, kind,
+      RPAD(STRING_AGG(REPEAT('A', register - previous - 1) || CHR(65 + rho), '' ORDER BY register), 2048, 'A') AS rhos
+    FROM (
+      SELECT
+        r.*,
+        LAG(register, 1, -1) OVER (PARTITION BY month, plan_id, country, acquisition_channel, kind ORDER BY register) AS previous
+      FROM registers r
+    ) r
+    GROUP BY 1, 2, 3, 4, 5
+  ),
+  sketches AS (
+    -- nivel L: '1' en los registros con rho >= L
+    SELECT
+      month, plan_id, country, acquisition_channel, kind,
+      (
+        -- 'A'..'a' = rho 0..32
+        SELECT STRING_AGG(TRANSLATE(rhos, 'ABCDEFGHIJKLMNOPQRSTUVWXYZ[\]^_`a', REPEAT('0', level) || REPEAT('1', 33 - level)), '' ORDER BY level)
+        FROM GENERATE_SERIES(1, 32) level
+      )::bit(65536) AS sketch
+    FROM rhos
+  )
+  SELECT
+    month, plan_id, country, acquisition_channel,
+    BIT_OR(sketch) FILTER (WHERE kind = 'subscription'),
+    BIT_OR(sketch) FILTER (WHERE kind = 'customer')
+  FROM sketches
+  GROUP BY 1, 2, 3, 4;
+END;
+$$;
+
+-- -----------------------------
+-- Distinct counts
+-- -----------------------------
+-- Distinct subscriptions or customers with completed payments in [month_from, month_to] (months),
+-- for the given plans / countries / channels (NULL = all). Estimated from the sketches, or exact.
+CREATE OR REPLACE FUNCTION distinct_count(
+  id_kind     TEXT DEFAULT 'subscription',
+  month_from  DATE DEFAULT NULL,
+  month_to    DATE DEFAULT NULL,
+  plan_ids    INT[] DEFAULT NULL,
+  countries   TEXT[] DEFAULT NULL,
+  channels    TEXT[] DEFAULT NULL,
+  exact       BOOLEAN DEFAULT FALSE
+)
+RETURNS BIGINT
+LANGUAGE plpgsql STABLE
+SET search_path TO analytics
+AS $$
+DECLARE
+  v_from   DATE := DATE_TRUNC('month', month_from)::date;
+  v_to     DATE := DATE_TRUNC('month', month_to)::date;
+  v_count  BIGINT;
+BEGIN
+  IF id_kind NOT IN ('subscription', 'customer') THEN
+    RAISE EXCEPTION 'id_kind must be subscription or customer, got %', id_kind;
+  END IF;
+
+  IF exact THEN
+    SELECT COUNT(DISTINCT CASE WHEN id_kind = 'subscription' THEN t.subscription_id ELSE t.customer_id END)
+    INTO v_count
+    FROM fact_transactions t
+    JOIN dim_customers c USING (customer_id)
+    WHERE t.transaction_status = 'completed'
+      AND (v_from IS NULL OR t.payment_date >= v_from)
+      AND (v_to IS NULL OR t.payment_date < v_to + INTERVAL '1 month')
+      AND (plan_ids IS NULL OR t.plan_id = ANY (plan_ids))
+      AND (countries IS NULL OR c.country = ANY (countries))
+      AND (channels IS NULL OR c.acquisition_channel = ANY (channels));
+  ELSE
+    SELECT hll_estimate(BIT_OR(CASE WHEN id_kind = 'subscription' THEN s.subscriptions ELSE s.customers END))
+    INTO v_count
+    FROM agg_distinct_sketches s
+    WHERE (v_from IS NULL OR s.month >= v_from)
+      AND (v_to IS NULL OR s.month <= v_to)
+      AND (plan_ids IS NULL OR s.plan_id = ANY (plan_ids))
+      AND (countries IS NULL OR s.country = ANY (countries))
+      AND (channels IS NULL OR s.acquisition_channel = ANY (channels));
+  END IF;
+
+  RETURN v_count;
+END;
+$$;
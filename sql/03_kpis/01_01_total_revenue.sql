@@ -5,6 +5,7 @@ Definition: Sum of all completed transactions
 Filters: transaction_status = 'completed'
 Assumptions: Only completed transactions generate real revenue
 Output grain: Single row aggregate
+Source: agg_revenue_monthly (amounts of completed transactions)
 */
 SET search_path TO analytics;
 
@@ -12,5 +13,4 @@ SELECT
   SUM(gross_amount)    AS gross_revenue,
   SUM(discount_amount) AS total_discounts,
   SUM(net_revenue)     AS net_revenue
-FROM fact_transactions
-WHERE transaction_status = 'completed';
\ No newline at end of file
+FROM agg_revenue_monthly;
\ No newline at end of file
@@ -5,13 +5,14 @@ Definition: Net revenue aggregated by month
 Filters: transaction_status = 'completed'
 Assumptions: Payment date determines revenue recognition
 Output grain: One row per month
+Source: agg_revenue_monthly
 */
 SET search_path TO analytics;
 
 SELECT
-  DATE_TRUNC('month', payment_date)::date AS month,
+  month,
   SUM(net_revenue) AS monthly_net_revenue
-FROM fact_transactions
-WHERE transaction_status = 'completed'
+FROM agg_revenue_monthly
 GROUP BY 1
+HAVING SUM(completed_transactions) > 0
 ORDER BY 1;
\ No newline at end of file
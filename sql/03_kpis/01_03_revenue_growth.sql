@@ -8,16 +8,17 @@ Revenue basis: net_revenue from completed transactions
 Filters: transaction_status = 'completed'
 Assumptions: Month-over-month and year-over-year comparison
 Output grain: One row per month
+Source: agg_revenue_monthly
 */
 SET search_path TO analytics;
 
 WITH monthly_revenue AS (
   SELECT
-    DATE_TRUNC('month', payment_date)::date AS month,
+    month,
     SUM(net_revenue) AS revenue
-  FROM fact_transactions
-  WHERE transaction_status = 'completed'
+  FROM agg_revenue_monthly
   GROUP BY 1
+  HAVING SUM(completed_transactions) > 0
 )
 SELECT
   month,
@@ -22,12 +22,11 @@ months AS (
 active_at_start AS (
   SELECT
     m.month_start AS month,
-    COUNT(*) AS active_at_start
+    SUM(a.active_subscriptions) AS active_at_start
   FROM months m
-  JOIN dim_subscriptions s
-    ON s.start_date <= m.month_start
-   AND (s.end_date IS NULL OR s.end_date >= m.month_start)
+  JOIN agg_active_subscriptions_daily a ON a.date = m.month_start
   GROUP BY 1
+  HAVING SUM(a.active_subscriptions) > 0
 ),
 cancellations AS (
   SELECT
@@ -5,12 +5,13 @@ Definition: Sum of all costs by month
 Filters: None
 Assumptions: Cost date represents when cost was incurred
 Output grain: One row per month
+Source: agg_costs_monthly
 */
 SET search_path TO analytics;
 
 SELECT
-  date AS month,
+  month,
   SUM(amount) AS total_costs
-FROM fact_costs
-GROUP BY date
-ORDER BY date;
\ No newline at end of file
+FROM agg_costs_monthly
+GROUP BY month
+ORDER BY month;
\ No newline at end of file
@@ -5,23 +5,24 @@ Definition: (net_revenue - total_costs) / net_revenue
 Filters: transaction_status = 'completed'
 Assumptions: Revenue and costs matched by month
 Output grain: One row per month
+Source: agg_revenue_monthly, agg_costs_monthly
 */
 SET search_path TO analytics;
 
 WITH revenue AS (
   SELECT
-    DATE_TRUNC('month', payment_date)::date AS month,
+    month,
     SUM(net_revenue) AS net_revenue
-  FROM fact_transactions
-  WHERE transaction_status = 'completed'
+  FROM agg_revenue_monthly
   GROUP BY 1
+  HAVING SUM(completed_transactions) > 0
 ),
 costs AS (
   SELECT
-    date AS month,
+    month,
     SUM(amount) AS total_costs
-  FROM fact_costs
-  GROUP BY date
+  FROM agg_costs_monthly
+  GROUP BY 1
 )
 SELECT
   r.month,
@@ -1,15 +1,15 @@
 /*
 View: vw_monthly_revenue
 Grain: month
-Source: completed transactions only
+Source: completed transactions only (agg_revenue_monthly)
 */
 SET search_path TO analytics;
 
 CREATE OR REPLACE VIEW vw_monthly_revenue AS
 SELECT
-  DATE_TRUNC('month', payment_date)::date AS month,
+  month,
   SUM(net_revenue) AS net_revenue
-FROM fact_transactions
-WHERE transaction_status = 'completed'
+FROM agg_revenue_monthly
 GROUP BY 1
+HAVING SUM(completed_transactions) > 0
 ORDER BY 1;
@@ -1,35 +1,19 @@
+/*
+View: vw_mrr
+Definition: net_revenue of each completed transaction spread evenly over the months of its
+  billing period (capped at the last month with completed payments)
+Grain: month
+Source: agg_mrr_monthly
+Notes:
+  - The rows are precomputed by refresh_mrr_churn() (sql/02_etl/01_refresh_mrr_churn.sql),
+    which holds the MRR logic; both loaders run it, so the view is only as current as the
+    last refresh (after a manual load: CALL analytics.refresh_mrr_churn(TRUE))
+*/
+SET search_path TO analytics;
+
 CREATE OR REPLACE VIEW vw_mrr AS
-WITH bounds AS (
-  SELECT DATE_TRUNC('month', MAX(payment_date))::date AS max_month
-  FROM fact_transactions
-  WHERE transaction_status = 'completed'
-),
-expanded AS (
-  SELECT
-    t.transaction_id,
-    gs::date AS month,
-    t.net_revenue
-  FROM fact_transactions t
-  CROSS JOIN bounds b
-  CROSS JOIN LATERAL
-    GENERATE_SERIES(
-      DATE_TRUNC('month', t.billing_period_start),
-      LEAST(DATE_TRUNC('month', t.billing_period_end), b.max_month),
-      INTERVAL '1 month'
-    ) gs
-  WHERE t.transaction_status = 'completed'
-),
-months_per_tx AS (
-  SELECT
-    transaction_id,
-    COUNT(*) AS months_in_period
-  FROM expanded
-  GROUP BY transaction_id
-)
 SELECT
-  e.month,
-  ROUND(SUM(e.net_revenue / NULLIF(m.months_in_period, 0))::numeric, 2) AS mrr
-FROM expanded e
-JOIN months_per_tx m USING (transaction_id)
-GROUP BY e.month
-ORDER BY e.month;
+  month,
+  mrr
+FROM agg_mrr_monthly
+ORDER BY month;
@@ -4,6 +4,8 @@ Definition: cancellations_in_month / active_subscriptions_at_month_start
 Grain: month
 Notes:
   - Adds is_complete_month flag based on last available month in the dataset
+  - Active subscriptions at month start are read from agg_active_subscriptions_daily
+    (O(months) instead of a months x subscriptions range join); refreshed on load
 */
 
 SET search_path TO analytics;
@@ -16,12 +18,11 @@ WITH months AS (
 active_at_start AS (
   SELECT
     m.month,
-    COUNT(*) AS active_at_start
+    SUM(a.active_subscriptions) AS active_at_start
   FROM months m
-  JOIN dim_subscriptions s
-    ON s.start_date <= m.month
-   AND (s.end_date IS NULL OR s.end_date >= m.month)
+  JOIN agg_active_subscriptions_daily a ON a.date = m.month
   GROUP BY 1
+  HAVING SUM(a.active_subscriptions) > 0
 ),
 cancellations AS (
   SELECT
@@ -1,14 +1,14 @@
 /*
 View: vw_monthly_costs
 Grain: month, cost_type
+Source: agg_costs_monthly
 */
 SET search_path TO analytics;
 
 CREATE OR REPLACE VIEW vw_monthly_costs AS
 SELECT
-  date AS month,
+  month,
   cost_type,
-  SUM(amount) AS amount
-FROM fact_costs
-GROUP BY 1, 2
+  amount
+FROM agg_costs_monthly
 ORDER BY 1, 2;
@@ -2,23 +2,24 @@
 View: vw_monthly_margin
 Grain: month
 Definition: net_revenue - total_costs
+Source: agg_revenue_monthly, agg_costs_monthly
 */
 SET search_path TO analytics;
 
 CREATE OR REPLACE VIEW vw_monthly_margin AS
 WITH revenue AS (
   SELECT
-    DATE_TRUNC('month', payment_date)::date AS month,
+    month,
     SUM(net_revenue) AS net_revenue
-  FROM fact_transactions
-  WHERE transaction_status = 'completed'
+  FROM agg_revenue_monthly
   GROUP BY 1
+  HAVING SUM(completed_transactions) > 0
 ),
 costs AS (
   SELECT
-    date AS month,
+    month,
     SUM(amount) AS total_costs
-  FROM fact_costs
+  FROM agg_costs_monthly
   GROUP BY 1
 )
 SELECT
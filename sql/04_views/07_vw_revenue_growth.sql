@@ -2,17 +2,18 @@
 View: vw_revenue_growth
 Grain: month
 Metrics: MoM% and YoY% revenue growth
+Source: agg_revenue_monthly
 */
 SET search_path TO analytics;
 
 CREATE OR REPLACE VIEW vw_revenue_growth AS
 WITH monthly_revenue AS (
   SELECT
-    DATE_TRUNC('month', payment_date)::date AS month,
+    month,
     SUM(net_revenue) AS revenue
-  FROM fact_transactions
-  WHERE transaction_status = 'completed'
+  FROM agg_revenue_monthly
   GROUP BY 1
+  HAVING SUM(completed_transactions) > 0
 )
 SELECT
   month,
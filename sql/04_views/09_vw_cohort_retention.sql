@@ -0,0 +1,42 @@
+/*
+View: vw_cohort_retention
+Definition:
+  - cohort = signup month x acquisition_channel x country (dim_customers)
+  - retention = active_customers / cohort_size; active = a completed billing period covers the month
+  - ltv = cumulative net revenue of the cohort up to the month / cohort_size
+Grain: cohort x month (only months with activity)
+Notes:
+  - Reads agg_cohort_monthly (refreshed on load, sql/02_etl/04_refresh_cohorts.sql) instead of
+    joining every cohort and month to fact_transactions
+  - months_since_signup can be negative: subscriptions are not tied to the signup date
+*/
+
+SET search_path TO analytics;
+
+CREATE OR REPLACE VIEW vw_cohort_retention AS
+WITH cohort_sizes AS (
+  SELECT
+    DATE_TRUNC('month', signup_date)::date AS cohort_month,
+    acquisition_channel,
+    country,
+    COUNT(*) AS cohort_size
+  FROM dim_customers
+  GROUP BY 1, 2, 3
+)
+SELECT
+  a.cohort_month,
+  a.acquisition_channel,
+  a.country,
+  a.month,
+  ((EXTRACT(YEAR FROM a.month) - EXTRACT(YEAR FROM a.cohort_month)) * 12
+    + EXTRACT(MONTH FROM a.month) - EXTRACT(MONTH FROM a.cohort_month))::int AS months_since_signup,
+  s.cohort_size,
+  a.active_customers,
+  ROUND(a.active_customers::numeric / s.cohort_size, 4) AS retention,
+  a.net_revenue,
+  SUM(a.net_revenue) OVER w AS cumulative_net_revenue,
+  ROUND(SUM(a.net_revenue) OVER w / s.cohort_size, 2) AS ltv
+FROM agg_cohort_monthly a
+JOIN cohort_sizes s USING (cohort_month, acquisition_channel, country)
+WINDOW w AS (PARTITION BY a.cohort_month, a.acquisition_channel, a.country ORDER BY a.month)
+ORDER BY a.cohort_month, a.acquisition_channel, a.country, a.month;
@@ -0,0 +1,42 @@
+/*
+View: vw_plan_performance_approx
+Grain: plan
+Source: completed transactions only
+Notes:
+  - Same columns as vw_plan_performance, without scanning fact_transactions:
+    subscriptions is estimated from the HyperLogLog sketches in agg_distinct_sketches
+    (about 2.3% standard error, sql/02_etl/05_distinct_sketches.sql); revenue comes from
+    the revenue cube (agg_revenue_monthly)
+  - vw_plan_performance keeps the exact COUNT(DISTINCT) for verification
+*/
+SET search_path TO analytics;
+
+CREATE OR REPLACE VIEW vw_plan_performance_approx AS
+WITH subscriptions AS (
+  -- sketch de cada plan: BIT_OR de todos sus meses y segmentos
+  SELECT
+    plan_id,
+    hll_estimate(BIT_OR(subscriptions)) AS subscriptions
+  FROM agg_distinct_sketches
+  GROUP BY 1
+),
+revenue AS (
+  SELECT
+    plan_id,
+    SUM(net_revenue) AS net_revenue,
+    SUM(completed_transactions) AS completed_transactions
+  FROM agg_revenue_monthly
+  GROUP BY 1
+  HAVING SUM(completed_transactions) > 0
+)
+SELECT
+  p.plan_id,
+  p.plan_name,
+  p.tier,
+  s.subscriptions,
+  r.net_revenue,
+  ROUND(r.net_revenue / r.completed_transactions, 2) AS avg_revenue_per_tx
+FROM revenue r
+JOIN subscriptions s USING (plan_id)
+JOIN dim_plans p USING (plan_id)
+ORDER BY net_revenue DESC;
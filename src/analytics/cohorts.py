@@ -0,0 +1,238 @@
+"""
+Motor de cohortes en proceso: retención, revenue y LTV por cohorte de signup
+(mes de signup x acquisition_channel x country), con las mismas filas que
+vw_cohort_retention (sql/04_views/09_vw_cohort_retention.sql).
+
+- Activo en un mes = algún período de facturación completado del customer cubre el mes
+  (cortado en el último mes con pagos completados, como vw_mrr); revenue = net revenue
+  de los pagos completados del mes.
+- Una sola pasada ordenada por (customer, inicio del período): cada período aporta sólo
+  los meses posteriores a lo ya cubierto por los anteriores del mismo customer (+1 al
+  inicio, -1 al final), así cada (customer, mes) cuenta una vez sin expandir períodos.
+  El estado por customer (último mes cubierto) queda en el engine.
+- Incremental: add_transactions acepta bloques en orden cronológico (cargas por ventana)
+  o de customers disjuntos (shards del generador); el resultado es el mismo que con
+  todas las transacciones juntas. Los acumuladores son chicos: una celda por
+  (cohorte, mes) con cambios.
+
+Uso (desde la raíz del repo):
+    python -m src.analytics.cohorts --data-dir data/raw --out data/cohorts.csv
+"""
+from __future__ import annotations
+
+import argparse
+import os
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.analytics.kpis import _cents, _months, _round_ratio
+from src.data_generation import calendar, generate_data as gd
+
+
+# Columnas que usa el engine, por tabla generada
+COHORT_COLUMNS = {
+    "customers": ["customer_id", "signup_date", "acquisition_channel", "country"],
+    "transactions": [
+        "customer_id", "payment_date", "transaction_status", "net_revenue",
+        "billing_period_start", "billing_period_end"
+    ],
+}
+
+# claves enteras: cohorte = mes de signup << SEGMENT_BITS | segmento; celda = cohorte << MONTH_BITS | mes
+SEGMENT_BITS = 16
+MONTH_BITS = 20
+_MONTH_MASK = (1 << MONTH_BITS) - 1
+
+
+def _accumulate(total: pd.Series, keys: np.ndarray, values: np.ndarray) -> pd.Series:
+    """total + SUM(values) por key (Series int64 indexada por key)."""
+    if len(keys) == 0:
+        return total
+    batch = pd.Series(values, dtype=np.int64).groupby(keys, sort=False).sum()
+    return total.add(batch, fill_value=0).astype(np.int64)
+
+
+class CohortEngine:
+    """
+    Acumula customers (tamaño de cada cohorte) y transacciones (cobertura y revenue por
+    cohorte y mes); table() arma la tabla de cohortes con lo acumulado hasta el momento.
+    Los customers de cada transacción tienen que haberse agregado antes con add_customers.
+    """
+
+    def __init__(self) -> None:
+        self.segments: Dict[Tuple[str, str], int] = {}
+        # por customer_id: clave de cohorte (-1 = desconocido) y último mes cubierto (-1 = ninguno)
+        self.cohort = np.full(0, -1, dtype=np.int64)
+        self.covered_through = np.full(0, -1, dtype=np.int64)
+        self.sizes = pd.Series(dtype=np.int64)
+        # celda -> +1/-1 de cobertura, centavos y cantidad de pagos completados
+        self.active_delta = pd.Series(dtype=np.int64)
+        self.revenue = pd.Series(dtype=np.int64)
+        self.payments = pd.Series(dtype=np.int64)
+        self.max_month: Optional[int] = None
+
+    def _grow(self, n: int) -> None:
+        if n > len(self.cohort):
+            extra = max(n, 2 * len(self.cohort)) - len(self.cohort)
+            self.cohort = np.r_[self.cohort, np.full(extra, -1, dtype=np.int64)]
+            self.covered_through = np.r_[self.covered_through, np.full(extra, -1, dtype=np.int64)]
+
+    def add_customers(self, customers: pd.DataFrame) -> None:
+        ids = customers["customer_id"].to_numpy().astype(np.int64)
+        if not len(ids):
+            return
+        channel = customers["acquisition_channel"].astype(str).to_numpy()
+        country = customers["country"].astype(str).to_numpy()
+        segment, pairs = pd.MultiIndex.from_arrays([channel, country]).factorize()
+        codes = np.array([self.segments.setdefault(p, len(self.segments)) for p in pairs], dtype=np.int64)
+        assert len(self.segments) <= 1 << SEGMENT_BITS, "too many acquisition_channel x country segments"
+
+        key = calendar.month_index(customers["signup_date"]) << SEGMENT_BITS | codes[segment]
+        self._grow(int(ids.max()) + 1)
+        assert (self.cohort[ids] < 0).all(), "customers added twice"
+        self.cohort[ids] = key
+        self.sizes = _accumulate(self.sizes, key, np.ones(len(key), dtype=np.int64))
+
+    def add_transactions(self, transactions: pd.DataFrame) -> None:
+        mask = (transactions["transaction_status"] == "completed").to_numpy()
+
+        def column(name: str) -> np.ndarray:
+            return transactions[name].to_numpy()[mask]
+
+        customer = column("customer_id").astype(np.int64)
+        if not len(customer):
+            return
+        paid = calendar.month_index(column("payment_date"))
+        first = calendar.month_index(column("billing_period_start"))
+        last = calendar.month_index(column("billing_period_end"))
+        assert customer.max() < len(self.cohort) and (self.cohort[customer] >= 0).all(), \
+            "transactions of customers not added with add_customers"
+        assert first.min() >= 0 and last.max() < _MONTH_MASK, "months out of range"
+
+        cohort = self.cohort[customer]
+        self.revenue = _accumulate(self.revenue, cohort << MONTH_BITS | paid, _cents(column("net_revenue")))
+        self.payments = _accumulate(self.payments, cohort << MONTH_BITS | paid, np.ones(len(paid), dtype=np.int64))
+        month = int(paid.max())
+        self.max_month = month if self.max_month is None else max(self.max_month, month)
+
+        # pasada ordenada por (customer, inicio): cubierto hasta = máximo de los finales anteriores
+        order = np.lexsort((first, customer))
+        customer, first, last = customer[order], first[order], last[order]
+        new_customer = np.r_[True, customer[1:] != customer[:-1]]
+        carried = self.covered_through[customer]
+        # máximo acumulado por customer: el desplazamiento por rank lo hace monótono entre customers
+        shift = (np.cumsum(new_customer) - 1) * (1 << (MONTH_BITS + 1))
+        running = np.maximum.accumulate(np.maximum(last, carried) + shift) - shift
+        covered = np.where(new_customer, carried, np.r_[-1, running[:-1]])
+
+        start = np.maximum(first, covered + 1)
+        keep = start <= last
+        cell = self.cohort[customer[keep]] << MONTH_BITS
+        ones = np.ones(int(keep.sum()), dtype=np.int64)
+        self.active_delta = _accumulate(
+            self.active_delta,
+            np.r_[cell | start[keep], cell | (last[keep] + 1)],
+            np.r_[ones, -ones]
+        )
+        last_row = np.r_[new_customer[1:], True]
+        self.covered_through[customer[last_row]] = running[last_row]
+
+    def _active_cells(self) -> pd.Series:
+        """Clientes activos por celda (sólo > 0, hasta max_month), desde los +1/-1 acumulados."""
+        delta = self.active_delta[self.active_delta != 0].sort_index()
+        keys = delta.index.to_numpy(dtype=np.int64)
+        if not len(keys) or self.max_month is None:
+            return pd.Series(dtype=np.int64)
+        # los +1/-1 de cada cohorte suman 0: la suma acumulada global vuelve a 0 entre cohortes
+        count = np.cumsum(delta.to_numpy())
+        month = keys & _MONTH_MASK
+        same_cohort = np.r_[(keys[1:] >> MONTH_BITS) == (keys[:-1] >> MONTH_BITS), False]
+        next_month = np.r_[month[1:], 0]
+        # cada clave abre un tramo constante hasta la siguiente de la misma cohorte
+        run = np.where(same_cohort & (count > 0), np.minimum(next_month, self.max_month + 1) - month, 0)
+        run = np.maximum(run, 0)
+        offset = np.arange(run.sum()) - np.repeat(np.cumsum(run) - run, run)
+        return pd.Series(np.repeat(count, run), index=np.repeat(keys, run) + offset)
+
+    def table(self) -> pd.DataFrame:
+        """Tabla de cohortes: mismas columnas y filas que vw_cohort_retention."""
+        active = self._active_cells()
+        keys = active.index.union(self.payments.index).to_numpy(dtype=np.int64)
+        names = np.array(list(self.segments), dtype=object).reshape(-1, 2)
+        # orden de la vista (cohort_month, acquisition_channel, country, month) con claves enteras:
+        # el segmento se reemplaza por su posición en el orden de los nombres
+        segment_rank = np.empty(len(names), dtype=np.int64)
+        segment_rank[np.lexsort((names[:, 1], names[:, 0]))] = np.arange(len(names))
+        segment = (keys >> MONTH_BITS) & ((1 << SEGMENT_BITS) - 1)
+        cohort_month = keys >> (MONTH_BITS + SEGMENT_BITS)
+        month = keys & _MONTH_MASK
+        order = np.lexsort((month, segment_rank[segment], cohort_month))
+        keys, segment, cohort_month, month = keys[order], segment[order], cohort_month[order], month[order]
+
+        cohort = keys >> MONTH_BITS
+        active_customers = active.reindex(keys, fill_value=0).to_numpy()
+        cents = self.revenue.reindex(keys, fill_value=0).to_numpy()
+        size = self.sizes.reindex(cohort).to_numpy()
+        # LTV: revenue acumulado dentro de cada cohorte (filas contiguas)
+        cumulative = pd.Series(cents).groupby(cohort, sort=False).cumsum().to_numpy()
+
+        return pd.DataFrame({
+            "cohort_month": _months(cohort_month),
+            "acquisition_channel": names[segment, 0],
+            "country": names[segment, 1],
+            "month": _months(month),
+            "months_since_signup": month - cohort_month,
+            "cohort_size": size,
+            "active_customers": active_customers,
+            "retention": _round_ratio(active_customers, size, 4),
+            "net_revenue": cents / 100,
+            "cumulative_net_revenue": cumulative / 100,
+            "ltv": _round_ratio(cumulative, size * 100, 2),
+        })
+
+
+def compute_cohorts(customers: pd.DataFrame, transactions: pd.DataFrame) -> pd.DataFrame:
+    """vw_cohort_retention sobre DataFrames del generador o leídos de archivos."""
+    engine = CohortEngine()
+    engine.add_customers(customers)
+    engine.add_transactions(transactions)
+    return engine.table()
+
+
+def load_tables(data_dir: str) -> Dict[str, pd.DataFrame]:
+    return {name: gd.read_table(gd.find_table(data_dir, name), columns) for name, columns in COHORT_COLUMNS.items()}
+
+
+def write_cohorts(df: pd.DataFrame, path: str) -> None:
+    """Escribe la tabla de cohortes en csv, parquet o feather según la extensión."""
+    output_format = os.path.splitext(path)[1].lstrip(".")
+    assert output_format in gd.OUTPUT_FORMATS, f"--out must end in one of {', '.join(gd.OUTPUT_FORMATS)}"
+    if output_format == "csv":
+        gd.write_csv(df, path)
+    elif output_format == "parquet":
+        df.to_parquet(path, index=False, compression="zstd")
+    else:
+        df.to_feather(path, compression="zstd")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Cohort retention, revenue and LTV from generated files, without PostgreSQL.")
+    parser.add_argument("--data-dir", default=gd.Config().out_dir,
+                        help="directory with the generated files (default: data/raw)")
+    parser.add_argument("--out", default=None, help="write the cohort table to this .csv/.parquet/.feather file")
+    args = parser.parse_args(argv)
+
+    tables = load_tables(args.data_dir)
+    cohorts = compute_cohorts(tables["customers"], tables["transactions"])
+    if args.out:
+        write_cohorts(cohorts, args.out)
+        print(f"{len(cohorts):,} rows: {args.out}")
+        return
+    with pd.option_context("display.width", 160, "display.max_columns", 20):
+        print(cohorts.to_string(index=False, max_rows=24))
+
+
+if __name__ == "__main__":
+    main()
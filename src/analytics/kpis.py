@@ -0,0 +1,407 @@
+"""
+Motor de KPIs en proceso sobre datos columnares (DataFrames del generador o archivos
+csv/parquet/feather de data/raw/), sin pasar por PostgreSQL.
+
+Replica las vistas de sql/04_views y las de sql/03_kpis (vw_monthly_costs_by_type,
+vw_payment_fees_ratio) con los mismos resultados:
+
+- Los montos se agregan en centavos enteros (NUMERIC(12,2) en la base), así que las
+  sumas son exactas; los ROUND se hacen con aritmética entera, half away from zero
+  como ROUND(numeric) de Postgres.
+- MRR: en lugar de expandir cada transacción mes a mes, agrupa por
+  (mes inicial, meses del período) con bincount y reparte cada grupo con un array de
+  diferencias; el reparto es exacto (denominador común de los largos de período).
+- Churn: activos al inicio de mes = searchsorted sobre start_date y end_date ordenados.
+
+Uso (desde la raíz del repo):
+    python -m src.analytics.kpis --data-dir data/raw
+"""
+from __future__ import annotations
+
+import argparse
+import math
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import is_integer_dtype
+
+from src.data_generation import calendar, generate_data as gd
+
+
+# Columnas que usa cada KPI, por tabla generada
+TABLE_COLUMNS = {
+    "date_dim": ["date"],
+    "plans": ["plan_id", "plan_name", "tier"],
+    "subscriptions": ["start_date", "end_date", "status", "cancellation_reason"],
+    "transactions": [
+        "subscription_id", "plan_id", "payment_date", "transaction_status",
+        "gross_amount", "discount_amount", "net_revenue",
+        "billing_period_start", "billing_period_end"
+    ],
+    "costs": ["date", "cost_type", "amount"],
+}
+
+# Tamaño máximo (bytes) del bitmap plan x subscription_id para COUNT(DISTINCT ...)
+DISTINCT_BITMAP_MAX = 1 << 28
+
+
+# -----------------------------
+# Helpers
+# -----------------------------
+def load_tables(data_dir: str, names: Optional[List[str]] = None) -> Dict[str, pd.DataFrame]:
+    """Lee de data_dir sólo las tablas y columnas que necesitan los KPIs."""
+    names = list(TABLE_COLUMNS) if names is None else names
+    return {name: gd.read_table(gd.find_table(data_dir, name), TABLE_COLUMNS[name]) for name in names}
+
+
+def _cents(values) -> np.ndarray:
+    """Montos en centavos int64; los DataFrames del generador ya los traen en centavos enteros."""
+    values = np.asarray(values)
+    if is_integer_dtype(values.dtype):
+        return values.astype(np.int64)
+    return np.rint(values.astype(np.float64) * 100).astype(np.int64)
+
+
+def _months(index: np.ndarray) -> pd.Series:
+    """Índices de mes (calendar.month_index) como fechas del primer día del mes."""
+    return pd.Series(calendar.month_days(index).astype("datetime64[s]"))
+
+
+def _round_ratio(num, den, decimals: int) -> np.ndarray:
+    """
+    ROUND(num / den, decimals) de Postgres (half away from zero) con enteros exactos;
+    NaN si den == 0 (NULLIF). num y den son enteros (o arrays de enteros) chicos: por mes o plan.
+    """
+    out = []
+    for n, d in zip(np.atleast_1d(num).tolist(), np.atleast_1d(den).tolist()):
+        n, d = int(n), int(d)
+        if d == 0:
+            out.append(np.nan)
+            continue
+        scaled = abs(n) * 10 ** decimals
+        q = (2 * scaled + abs(d)) // (2 * abs(d))
+        sign = -1 if (n < 0) != (d < 0) else 1
+        out.append(sign * q / 10 ** decimals)
+    return np.array(out, dtype=np.float64)
+
+
+def _sum_by_month(month: np.ndarray, cents: np.ndarray) -> pd.Series:
+    """SUM en centavos por mes (sólo meses presentes), indexado por mes entero."""
+    if len(month) == 0:
+        return pd.Series(np.zeros(0, dtype=np.int64), index=np.zeros(0, dtype=np.int64))
+    base = month.min()
+    # float64 suma enteros exactos hasta 2**53 centavos
+    sums = np.rint(np.bincount(month - base, weights=cents)).astype(np.int64)
+    present = np.flatnonzero(np.bincount(month - base))
+    return pd.Series(sums[present], index=present + base)
+
+
+@dataclass(frozen=True)
+class CompletedTransactions:
+    """Columnas de las transacciones completadas, preparadas una vez y compartidas entre KPIs."""
+    payment_month: np.ndarray
+    first_month: np.ndarray
+    last_month: np.ndarray
+    gross_cents: np.ndarray
+    discount_cents: np.ndarray
+    net_cents: np.ndarray
+    plan_id: np.ndarray
+    subscription_id: np.ndarray
+
+
+# Los KPIs de transacciones aceptan el DataFrame o las columnas ya preparadas
+Transactions = Union[pd.DataFrame, CompletedTransactions]
+
+
+def completed_transactions(transactions: Transactions) -> CompletedTransactions:
+    if isinstance(transactions, CompletedTransactions):
+        return transactions
+    mask = (transactions["transaction_status"] == "completed").to_numpy()
+
+    def column(name: str) -> np.ndarray:
+        return transactions[name].to_numpy()[mask]
+
+    return CompletedTransactions(
+        payment_month=calendar.month_index(column("payment_date")),
+        first_month=calendar.month_index(column("billing_period_start")),
+        last_month=calendar.month_index(column("billing_period_end")),
+        gross_cents=_cents(column("gross_amount")),
+        discount_cents=_cents(column("discount_amount")),
+        net_cents=_cents(column("net_revenue")),
+        plan_id=column("plan_id").astype(np.int64),
+        subscription_id=column("subscription_id").astype(np.int64),
+    )
+
+
+# -----------------------------
+# Revenue
+# -----------------------------
+def total_revenue(transactions: Transactions) -> pd.DataFrame:
+    """sql/03_kpis/01_01_total_revenue.sql"""
+    t = completed_transactions(transactions)
+    return pd.DataFrame({
+        "gross_revenue": [t.gross_cents.sum() / 100],
+        "total_discounts": [t.discount_cents.sum() / 100],
+        "net_revenue": [t.net_cents.sum() / 100],
+    })
+
+
+def _monthly_revenue_cents(transactions: Transactions) -> pd.Series:
+    t = completed_transactions(transactions)
+    return _sum_by_month(t.payment_month, t.net_cents)
+
+
+def monthly_revenue(transactions: Transactions) -> pd.DataFrame:
+    """vw_monthly_revenue"""
+    rev = _monthly_revenue_cents(transactions)
+    return pd.DataFrame({"month": _months(rev.index), "net_revenue": rev.to_numpy() / 100})
+
+
+def revenue_growth(transactions: Transactions) -> pd.DataFrame:
+    """vw_revenue_growth: LAG sobre los meses con revenue (no sobre el calendario)."""
+    monthly = _monthly_revenue_cents(transactions)
+    rev = monthly.to_numpy()
+    prev = np.r_[[0], rev[:-1]]
+    prev_year = np.r_[np.zeros(min(12, len(rev)), dtype=np.int64), rev[:-12]]
+    has_prev = np.arange(len(rev)) >= 1
+    has_prev_year = np.arange(len(rev)) >= 12
+
+    mom = np.where(has_prev, _round_ratio((rev - prev) * 100, prev, 2), np.nan)
+    yoy = np.where(has_prev_year, _round_ratio((rev - prev_year) * 100, prev_year, 2), np.nan)
+    return pd.DataFrame({
+        "month": _months(monthly.index),
+        "revenue": rev / 100,
+        "prev_month_revenue": np.where(has_prev, prev / 100, np.nan),
+        "growth_mom_pct": mom,
+        "growth_yoy_pct": yoy,
+    })
+
+
+def mrr(transactions: Transactions) -> pd.DataFrame:
+    """
+    vw_mrr: el net_revenue de cada transacción completada se reparte en partes iguales
+    entre los meses de su período de facturación, cortado en el último mes con pagos.
+    """
+    t = completed_transactions(transactions)
+    if len(t.net_cents) == 0:
+        return pd.DataFrame({"month": pd.Series(dtype="datetime64[s]"), "mrr": pd.Series(dtype=np.float64)})
+
+    first = t.first_month
+    n_months = np.minimum(t.last_month, t.payment_month.max()) - first + 1
+    keep = n_months > 0
+    first, n_months, cents = first[keep], n_months[keep], t.net_cents[keep]
+
+    # pocos grupos (mes inicial, largo del período): el reparto se hace por grupo
+    base = first.min()
+    width = int(n_months.max()) + 1
+    key = (first - base) * width + n_months
+    group_cents = np.rint(np.bincount(key, weights=cents)).astype(np.int64)
+    groups = np.flatnonzero(np.bincount(key))
+    g_first, g_months = groups // width, groups % width
+
+    # centavos * lcm / meses: enteros exactos (int de Python, sin overflow)
+    lcm = math.lcm(*np.unique(g_months).tolist())
+    n_slots = int((g_first + g_months).max()) + 1
+    diff = np.zeros(n_slots + 1, dtype=object)
+    coverage = np.zeros(n_slots + 1, dtype=np.int64)
+    for f, m, c in zip(g_first.tolist(), g_months.tolist(), group_cents[groups].tolist()):
+        share = c * (lcm // m)
+        diff[f] += share
+        diff[f + m] -= share
+    np.add.at(coverage, g_first, 1)
+    np.add.at(coverage, g_first + g_months, -1)
+
+    scaled = np.cumsum(diff)[:-1]
+    months = np.flatnonzero(np.cumsum(coverage)[:-1] > 0)
+    return pd.DataFrame({
+        "month": _months(months + base),
+        "mrr": _round_ratio(scaled[months], np.full(len(months), lcm * 100, dtype=object), 2),
+    })
+
+
+def plan_performance(transactions: Transactions, plans: pd.DataFrame) -> pd.DataFrame:
+    """vw_plan_performance"""
+    t = completed_transactions(transactions)
+    # plan_id es un entero chico: bincount directo, sin ordenar
+    plan_ids = np.flatnonzero(np.bincount(t.plan_id))
+    plan_idx = np.searchsorted(plan_ids, t.plan_id)
+    n = np.bincount(plan_idx, minlength=len(plan_ids))
+    cents = np.rint(np.bincount(plan_idx, weights=t.net_cents, minlength=len(plan_ids))).astype(np.int64)
+
+    # COUNT(DISTINCT subscription_id): ids densos -> un bitmap por plan
+    width = int(t.subscription_id.max()) + 1 if len(t.subscription_id) else 1
+    if len(plan_ids) * width <= DISTINCT_BITMAP_MAX:
+        seen = np.zeros(len(plan_ids) * width, dtype=bool)
+        seen[plan_idx * width + t.subscription_id] = True
+        subscriptions = seen.reshape(len(plan_ids), width).sum(axis=1)
+    else:
+        subscriptions = pd.Series(t.subscription_id).groupby(plan_idx).nunique().to_numpy()
+
+    g = pd.DataFrame({
+        "plan_id": plan_ids,
+        "subscriptions": subscriptions,
+        "net_revenue": cents / 100,
+        "avg_revenue_per_tx": _round_ratio(cents, n * 100, 2),
+    })
+    p = plans[["plan_id", "plan_name", "tier"]].astype({"plan_id": np.int64})
+    out = p.merge(g, on="plan_id", how="inner")
+    out = out.sort_values("net_revenue", ascending=False, kind="stable").reset_index(drop=True)
+    return out[["plan_id", "plan_name", "tier", "subscriptions", "net_revenue", "avg_revenue_per_tx"]]
+
+
+# -----------------------------
+# Churn
+# -----------------------------
+def churn_rate(subscriptions: pd.DataFrame, date_dim: pd.DataFrame) -> pd.DataFrame:
+    """
+    vw_churn_rate. Activos al inicio del mes M = start_date <= M y (end_date nulo o >= M):
+    #(start <= M) - #(end < M), con start/end ordenados y searchsorted.
+    """
+    month_idx = np.unique(calendar.month_index(date_dim["date"]))
+    months = calendar.month_days(month_idx)
+
+    start = calendar.to_days(subscriptions["start_date"])
+    end = calendar.to_days(subscriptions["end_date"])
+    has_end = ~np.isnat(end)
+    # end_date < start_date nunca está activa: se excluye de ambos conteos
+    valid = ~has_end | (end >= start)
+    starts = np.sort(start[valid])
+    ends = np.sort(end[valid & has_end])
+    active = np.searchsorted(starts, months, side="right") - np.searchsorted(ends, months, side="left")
+
+    canceled = (subscriptions["status"] == "canceled").to_numpy() & has_end
+    cancel_months, cancel_counts = np.unique(calendar.month_index(end[canceled]), return_counts=True)
+    cancellations = np.zeros(len(months), dtype=np.int64)
+    pos = np.searchsorted(month_idx, cancel_months)
+    found = (pos < len(months)) & (month_idx[np.minimum(pos, len(months) - 1)] == cancel_months)
+    cancellations[pos[found]] = cancel_counts[found]
+
+    return churn_frame(months, cancellations, active)
+
+
+def churn_frame(months: np.ndarray, cancellations: np.ndarray, active: np.ndarray) -> pd.DataFrame:
+    """Filas de vw_churn_rate desde los conteos por mes (primer día); sólo meses con activos."""
+    keep = active > 0
+    months, active, cancellations = months[keep], active[keep], cancellations[keep]
+    return pd.DataFrame({
+        "month": pd.Series(months.astype("datetime64[s]")),
+        "cancellations": cancellations,
+        "active_at_start": active,
+        "churn_rate": _round_ratio(cancellations, active, 4),
+        "is_complete_month": months < months.max() if len(months) else np.zeros(0, dtype=bool),
+    })
+
+
+def churn_reasons(subscriptions: pd.DataFrame) -> pd.DataFrame:
+    """vw_churn_reasons (el motivo nulo es un grupo más, como en GROUP BY)."""
+    reasons = subscriptions.loc[(subscriptions["status"] == "canceled").to_numpy(), "cancellation_reason"]
+    counts = reasons.astype(object).value_counts(dropna=False, sort=False)
+    counts = counts.sort_values(ascending=False, kind="stable")
+    return pd.DataFrame({
+        "cancellation_reason": counts.index.to_numpy(),
+        "cancellations": counts.to_numpy(dtype=np.int64),
+        "share": _round_ratio(counts.to_numpy(), np.full(len(counts), counts.sum()), 3),
+    })
+
+
+# -----------------------------
+# Costs & margin
+# -----------------------------
+def _costs_by_type_cents(costs: pd.DataFrame) -> pd.DataFrame:
+    return (
+        pd.DataFrame({
+            "month": calendar.month_index(costs["date"]),
+            "cost_type": costs["cost_type"].astype(object).to_numpy(),
+            "cents": _cents(costs["amount"]),
+        })
+        .groupby(["month", "cost_type"], sort=True)["cents"].sum()
+        .reset_index()
+    )
+
+
+def monthly_costs(costs: pd.DataFrame) -> pd.DataFrame:
+    """
+    vw_monthly_costs (month = date; los costos se registran el primer día del mes,
+    así que coincide con monthly_costs_by_type).
+    """
+    g = _costs_by_type_cents(costs)
+    return pd.DataFrame({"month": _months(g["month"]), "cost_type": g["cost_type"], "amount": g["cents"] / 100})
+
+
+def monthly_costs_by_type(costs: pd.DataFrame) -> pd.DataFrame:
+    """vw_monthly_costs_by_type (sql/03_kpis/04_03)"""
+    return monthly_costs(costs)
+
+
+def monthly_margin(transactions: Transactions, costs: pd.DataFrame) -> pd.DataFrame:
+    """vw_monthly_margin: sólo meses con revenue y costos."""
+    rev = _monthly_revenue_cents(transactions)
+    total_costs = _costs_by_type_cents(costs).groupby("month")["cents"].sum()
+    months = rev.index.intersection(total_costs.index)
+    r, c = rev.loc[months].to_numpy(), total_costs.loc[months].to_numpy()
+    return pd.DataFrame({
+        "month": _months(months),
+        "net_revenue": r / 100,
+        "total_costs": c / 100,
+        "gross_margin": (r - c) / 100,
+        "margin_pct": _round_ratio(r - c, r, 4),
+    })
+
+
+def payment_fees_ratio(transactions: Transactions, costs: pd.DataFrame) -> pd.DataFrame:
+    """vw_payment_fees_ratio (sql/03_kpis/04_04): todos los meses con revenue."""
+    rev = _monthly_revenue_cents(transactions)
+    by_type = _costs_by_type_cents(costs)
+    fees = by_type[by_type["cost_type"] == "payment_fees"].groupby("month")["cents"].sum()
+    fees = fees.reindex(rev.index, fill_value=0).to_numpy()
+    return pd.DataFrame({
+        "month": _months(rev.index),
+        "payment_fees": fees / 100,
+        "net_revenue": rev.to_numpy() / 100,
+        "fee_ratio": _round_ratio(fees, rev.to_numpy(), 4),
+    })
+
+
+# -----------------------------
+# All KPIs
+# -----------------------------
+# vista SQL equivalente -> (función, tablas que recibe); "transactions" llega como
+# CompletedTransactions, preparado una sola vez para todos los KPIs
+KPIS = {
+    "total_revenue": (total_revenue, ("transactions",)),
+    "vw_monthly_revenue": (monthly_revenue, ("transactions",)),
+    "vw_mrr": (mrr, ("transactions",)),
+    "vw_churn_rate": (churn_rate, ("subscriptions", "date_dim")),
+    "vw_churn_reasons": (churn_reasons, ("subscriptions",)),
+    "vw_monthly_costs": (monthly_costs, ("costs",)),
+    "vw_monthly_margin": (monthly_margin, ("transactions", "costs")),
+    "vw_revenue_growth": (revenue_growth, ("transactions",)),
+    "vw_plan_performance": (plan_performance, ("transactions", "plans")),
+    "vw_monthly_costs_by_type": (monthly_costs_by_type, ("costs",)),
+    "vw_payment_fees_ratio": (payment_fees_ratio, ("transactions", "costs")),
+}
+
+
+def compute_all(tables: Dict[str, pd.DataFrame]) -> Dict[str, pd.DataFrame]:
+    """Todos los KPIs, con el nombre de la vista SQL equivalente."""
+    inputs = dict(tables, transactions=completed_transactions(tables["transactions"]))
+    return {name: kpi(*(inputs[t] for t in args)) for name, (kpi, args) in KPIS.items()}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compute the analytics KPIs from generated files, without PostgreSQL.")
+    parser.add_argument("--data-dir", default=gd.Config().out_dir,
+                        help="directory with the generated files (default: data/raw)")
+    args = parser.parse_args()
+
+    kpis = compute_all(load_tables(args.data_dir))
+    with pd.option_context("display.width", 160, "display.max_columns", 20):
+        for name, df in kpis.items():
+            print(f"\n{name} ({len(df):,} rows)")
+            print(df.to_string(index=False, max_rows=12))
+
+
+if __name__ == "__main__":
+    main()
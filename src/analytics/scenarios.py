@@ -0,0 +1,570 @@
+"""
+Escenarios what-if sobre el modelo estático del generador: revenue, MRR, margen y churn
+para muchas variantes de precios (plan_defs), churn_prob, failed_rate, tasas de descuento
+y cancellation_reason_dist, sin generar archivos ni cargar la base.
+
+- Números aleatorios comunes: cada shard de customers se sortea una sola vez
+  (SCENARIO_STREAM) y los sorteos que dependen de un parámetro quedan como uniformes
+  U[0, 1): cancelada = u < churn_prob, fallido = u < failed_rate, descuento y motivo por
+  CDF inversa. Todos los escenarios ven los mismos customers, suscripciones y pagos, así
+  las diferencias entre escenarios son efecto de los parámetros y no ruido de muestreo.
+- Los sorteos no dependen de qué escenarios se corren juntos: las segundas suscripciones
+  y los períodos de facturación (hasta end_date) se sortean todos, una vez por shard, y
+  recién después se descartan los que ningún escenario usa (los posteriores al horizonte
+  más largo). Cada escenario sólo filtra los períodos hasta su propio horizonte. Así un
+  escenario da lo mismo en cualquier lote (--check lo verifica).
+- Out-of-core: los shards (chunk_size) se evalúan uno por vez por proceso y sólo vuelven
+  acumuladores chicos por escenario: centavos por (plan, mes inicial, mes final del
+  período), activos y cancelaciones por mes y cancelaciones por motivo. Son enteros y se
+  suman en cualquier orden, así el resultado no depende de n_workers.
+- Con n_workers > 1 los (shard, bloque de escenarios) se reparten en un pool de procesos;
+  cada worker guarda los sorteos del último shard para sus bloques siguientes.
+- Los KPIs salen de los acumuladores con las funciones de kpis.py (mismos redondeos que
+  las vistas); los costos, de generate_costs_from_revenue con el mismo COSTS_STREAM.
+
+Los escenarios no cambian tier_dist, billing_cycle_dist ni el tamaño o rango de fechas:
+eso cambia los sorteos compartidos (es otra corrida del generador).
+
+Uso (desde la raíz del repo):
+    python -m src.analytics.scenarios --grid price.Pro=20,25,30 --grid churn_prob=0.30,0.35,0.40
+    python -m src.analytics.scenarios --scenarios sweep.json --n-customers 1000000 --chunk-size 200000 --workers 4 --out data/scenarios.csv
+"""
+from __future__ import annotations
+
+import argparse
+import itertools
+import json
+import math
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import replace
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.analytics import kpis
+from src.data_generation import calendar, generate_data as gd
+
+
+# campos de Config que un escenario puede cambiar sin cambiar los sorteos compartidos
+SCENARIO_FIELDS = (
+    "plan_defs", "churn_prob", "failed_rate", "discount_txn_rate", "yearly_discount_txn_rate",
+    "cancellation_reason_dist",
+)
+BASELINE = "baseline"
+
+# acumuladores por (plan, mes inicial, mes final): pagos completados y fallidos, centavos
+MEASURES = ("completed", "failed", "gross", "discount", "net")
+# meses que un período puede pasar del último mes del rango (anual: 13 meses calendario)
+_PERIOD_MONTHS = 13
+
+
+# -----------------------------
+# Escenarios
+# -----------------------------
+def scenario_config(cfg: gd.Config, values: dict) -> gd.Config:
+    """
+    Config de un escenario: cfg con los valores de SCENARIO_FIELDS de values; "prices"
+    ({plan_name: precio}) cambia sólo el precio de esos planes. "name" se ignora.
+    """
+    values = {k: v for k, v in values.items() if k != "name"}
+    prices = values.pop("prices", None)
+    unknown = set(values) - set(SCENARIO_FIELDS)
+    assert not unknown, f"scenario keys must be in {', '.join(SCENARIO_FIELDS + ('prices', 'name'))}: {sorted(unknown)}"
+
+    scenario = gd.config_from_dict(values, base=cfg)
+    if prices:
+        names = {p[1] for p in scenario.plan_defs}
+        assert set(prices) <= names, f"unknown plans in prices: {sorted(set(prices) - names)}"
+        scenario = replace(scenario, plan_defs=tuple(
+            (p[0], p[1], p[2], float(prices.get(p[1], p[3])), *p[4:]) for p in scenario.plan_defs
+        ))
+    gd.validate_config(scenario)
+    assert [p[:3] for p in scenario.plan_defs] == [p[:3] for p in cfg.plan_defs], \
+        "scenarios may change plan prices and costs, not plan_id / plan_name / tier"
+    assert list(scenario.cancellation_reason_dist) == list(cfg.cancellation_reason_dist), \
+        "scenarios may change cancellation_reason_dist probabilities, not its reasons"
+    return scenario
+
+
+def scenario_grid(grid: Dict[str, Sequence]) -> List[dict]:
+    """
+    Producto cartesiano de valores: claves de SCENARIO_FIELDS o "price.<plan_name>".
+    Ej: {"price.Pro": [20, 25], "churn_prob": [0.3, 0.4]} -> 4 escenarios.
+    """
+    scenarios = []
+    for combo in itertools.product(*grid.values()):
+        values: dict = {"name": ",".join(f"{k}={v}" for k, v in zip(grid, combo))}
+        for key, value in zip(grid, combo):
+            if key.startswith("price."):
+                values.setdefault("prices", {})[key[len("price."):]] = value
+            else:
+                values[key] = value
+        scenarios.append(values)
+    return scenarios
+
+
+# -----------------------------
+# Sorteos compartidos de un shard
+# -----------------------------
+def _inverse_cdf(dist: Dict, u: np.ndarray) -> np.ndarray:
+    """Códigos en las claves de dist desde u ~ U[0, 1), como rng.choice(len(dist), p=...)."""
+    cdf = np.cumsum(list(dist.values()))
+    return np.searchsorted(cdf / cdf[-1], u, side="right")
+
+
+class _Shard:
+    """
+    Suscripciones y períodos de un shard de customers con los sorteos que comparten todos
+    los escenarios. Suscripciones: las primeras de cada customer y las segundas candidatas
+    (existen en los escenarios en que la primera se cancela). Los sorteos dependen sólo de
+    cfg y del shard; churn_range = (mínimo, máximo) churn_prob de los escenarios sólo acota
+    qué períodos se guardan.
+    """
+
+    def __init__(
+        self,
+        cfg: gd.Config,
+        plans: pd.DataFrame,
+        shard_index: int,
+        n_customers: int,
+        churn_range: Tuple[float, float]
+    ):
+        rng = gd.make_rng(cfg.seed, gd.SCENARIO_STREAM, shard_index)
+        start_d = np.datetime64(cfg.start_date, "D")
+        self.end = np.datetime64(cfg.end_date, "D")
+        self.first_month = int(calendar.month_index(np.array([start_d]))[0])
+        self.n_months = int(calendar.month_index(np.array([self.end]))[0]) - self.first_month + 1
+        monthly_plan_ids, plan_id_pro_year = gd._subscription_plan_ids(cfg, plans)
+
+        counts = gd._sample_subscription_count(cfg, rng, n_customers)
+        n_days = int((self.end - start_d).astype(int)) + 1
+        first_start = start_d + rng.integers(0, n_days, size=n_customers).astype("timedelta64[D]")
+        first = self._terms(cfg, rng, first_start, monthly_plan_ids, plan_id_pro_year)
+
+        # 2da suscripción: como generate_subscriptions, después de la cancelación de la 1ra
+        # (gap 0-30 días). Se sortea para todos los customers con 2: los sorteos no dependen
+        # de qué escenarios comparten la corrida
+        second_idx = np.flatnonzero(counts == 2)
+        second_start = first["canceled_end"][second_idx] + rng.integers(0, 31, size=len(second_idx)).astype("timedelta64[D]")
+        fits = second_start <= self.end
+        second_idx = second_idx[fits]
+        second = self._terms(cfg, rng, second_start[fits], monthly_plan_ids, plan_id_pro_year)
+
+        for name in first:
+            setattr(self, name, np.concatenate([first[name], second[name]]))
+        self.parent = np.r_[np.full(n_customers, -1), second_idx]
+
+        # todos los períodos hasta end_date, con sus uniformes: forma fija, como arriba
+        sub, period_start, period_end = calendar.billing_periods(
+            self.start, np.full(len(self.start), self.end), self.is_monthly, start_d
+        )
+        u_failed, u_discount, u_pct = (rng.random(len(sub)) for _ in range(3))
+
+        # sólo quedan los períodos que cobra algún escenario: de suscripciones que existen en
+        # alguno y hasta el horizonte más largo (end_date, salvo las canceladas en todos).
+        # Filtrar después de sortear no corre los sorteos de los demás períodos
+        exists = np.where(self.parent < 0, True, self.u_cancel[np.maximum(self.parent, 0)] < churn_range[1])
+        horizon = np.minimum(np.where(self.u_cancel < churn_range[0], self.canceled_end, self.end), self.end)
+        keep = exists[sub] & (period_start <= horizon[sub])
+        self.sub, self.period_start, period_end = sub[keep], period_start[keep], period_end[keep]
+        self.u_failed, self.u_discount, self.u_pct = u_failed[keep], u_discount[keep], u_pct[keep]
+        self.period_monthly = self.is_monthly[self.sub]
+        self.period_plan = self.plan_id[self.sub].astype(np.int64)
+        first_month = calendar.month_index(self.period_start) - self.first_month
+        last_month = calendar.month_index(period_end) - self.first_month
+        width = self.n_months + _PERIOD_MONTHS
+        self.keys, self.key_index = np.unique(
+            (self.period_plan * self.n_months + first_month) * width + last_month, return_inverse=True
+        )
+
+    def _terms(
+        self,
+        cfg: gd.Config,
+        rng: np.random.Generator,
+        start: np.ndarray,
+        monthly_plan_ids: np.ndarray,
+        plan_id_pro_year: int
+    ) -> dict:
+        """Como _sample_subscription_terms, con fin y motivo sorteados para todas (canceladas o no)."""
+        n = len(start)
+        is_monthly = gd._sample_billing_cycle(cfg, rng, n) == gd._billing_cycle_code(cfg, "monthly")
+        tier_idx = rng.choice(len(cfg.tier_dist), size=n, p=list(cfg.tier_dist.values()))
+        canceled_end = np.minimum(calendar.add_months(start, gd._sample_churn_duration_months(rng, n)), self.end)
+        too_early = canceled_end <= start
+        canceled_end[too_early] = calendar.add_months(start[too_early], 1)
+        return {
+            "start": start,
+            "is_monthly": is_monthly,
+            "plan_id": np.where(is_monthly, monthly_plan_ids[tier_idx], plan_id_pro_year),
+            "canceled_end": canceled_end,
+            "u_cancel": rng.random(n),
+            "u_reason": rng.random(n),
+        }
+
+    def evaluate(self, scenario: gd.Config) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Acumuladores de un escenario: (MEASURES por clave de self.keys, activos al inicio
+        de cada mes, cancelaciones por mes, cancelaciones por motivo).
+        """
+        canceled = self.u_cancel < scenario.churn_prob
+        exists = np.where(self.parent < 0, True, canceled[np.maximum(self.parent, 0)])
+        # como _expand_billing_periods: end_date si está cancelada, recortado al rango
+        horizon = np.minimum(np.where(canceled, self.canceled_end, self.end), self.end)
+        keep = exists[self.sub] & (self.period_start <= horizon[self.sub])
+
+        plan_price = np.zeros(int(self.plan_id.max(initial=0)) + 1)
+        for plan_id, _, _, price, *_ in scenario.plan_defs:
+            if plan_id < len(plan_price):
+                plan_price[plan_id] = price
+        failed = self.u_failed[keep] < scenario.failed_rate
+        gross, discount, net = gd.transaction_amounts(
+            scenario, plan_price[self.period_plan[keep]], self.period_start[keep], self.period_monthly[keep],
+            failed, self.u_discount[keep], self.u_pct[keep]
+        )
+        key = self.key_index[keep]
+        completed = ~failed
+        n_keys = len(self.keys)
+        measures = np.column_stack([
+            np.bincount(key[completed], minlength=n_keys),
+            np.bincount(key[failed], minlength=n_keys),
+            *(np.rint(np.bincount(key[completed], weights=cents[completed], minlength=n_keys))
+              for cents in (gross, discount, net)),
+        ]).astype(np.int64)
+
+        # churn como vw_churn_rate: activos al primer día de cada mes y cancelaciones por mes
+        ended = exists & canceled
+        months = calendar.month_days(self.first_month + np.arange(self.n_months))
+        active = (
+            np.searchsorted(np.sort(self.start[exists]), months, side="right")
+            - np.searchsorted(np.sort(self.canceled_end[ended]), months, side="left")
+        )
+        # cancelaciones corridas después de end_date (a un mes de un inicio al final del rango): fuera de la vista
+        cancellations = np.bincount(
+            calendar.month_index(self.canceled_end[ended]) - self.first_month, minlength=self.n_months
+        )[:self.n_months]
+        reasons = np.bincount(
+            _inverse_cdf(scenario.cancellation_reason_dist, self.u_reason[ended]),
+            minlength=len(scenario.cancellation_reason_dist)
+        )
+        return measures, active, cancellations, reasons
+
+
+# -----------------------------
+# Evaluación por shards
+# -----------------------------
+class _Evaluator:
+    """Evalúa bloques de escenarios por shard; guarda los sorteos del último shard."""
+
+    def __init__(self, cfg: gd.Config, plans: pd.DataFrame, churn_range: Tuple[float, float]):
+        self.cfg = cfg
+        self.plans = plans
+        self.churn_range = churn_range
+        self.shard: Optional[Tuple[int, _Shard]] = None
+
+    def run(self, shard: Tuple[int, int, int], scenarios: List[gd.Config]) -> Tuple[np.ndarray, ...]:
+        shard_index, _, n_customers = shard
+        if self.shard is None or self.shard[0] != shard_index:
+            self.shard = (shard_index, _Shard(self.cfg, self.plans, shard_index, n_customers, self.churn_range))
+        draws = self.shard[1]
+        results = [draws.evaluate(scenario) for scenario in scenarios]
+        return (draws.keys, *(np.stack(r) for r in zip(*results)))
+
+
+# evaluador de cada worker del pool (lo arma _init_worker)
+_WORKER: Optional[_Evaluator] = None
+
+
+def _init_worker(cfg: gd.Config, plans: pd.DataFrame, churn_range: Tuple[float, float]) -> None:
+    global _WORKER
+    _WORKER = _Evaluator(cfg, plans, churn_range)
+
+
+def _run_block(shard: Tuple[int, int, int], scenarios: List[gd.Config]) -> Tuple[np.ndarray, ...]:
+    return _WORKER.run(shard, scenarios)
+
+
+class _Totals:
+    """Acumuladores de todos los escenarios, sumados sobre los shards."""
+
+    def __init__(self, n_scenarios: int, n_months: int, n_reasons: int):
+        self.keys = pd.Index([], dtype=np.int64)
+        self.measures = np.zeros((n_scenarios, 0, len(MEASURES)), dtype=np.int64)
+        self.active = np.zeros((n_scenarios, n_months), dtype=np.int64)
+        self.cancellations = np.zeros((n_scenarios, n_months), dtype=np.int64)
+        self.reasons = np.zeros((n_scenarios, n_reasons), dtype=np.int64)
+
+    def add(self, block: np.ndarray, keys: np.ndarray, measures, active, cancellations, reasons) -> None:
+        missing = keys[self.keys.get_indexer(keys) < 0]
+        if len(missing):
+            self.keys = self.keys.append(pd.Index(missing))
+            extra = np.zeros((len(self.measures), len(missing), len(MEASURES)), dtype=np.int64)
+            self.measures = np.concatenate([self.measures, extra], axis=1)
+        self.measures[block[:, None], self.keys.get_indexer(keys)[None, :]] += measures
+        self.active[block] += active
+        self.cancellations[block] += cancellations
+        self.reasons[block] += reasons
+
+
+def _iter_blocks(cfg: gd.Config, n_scenarios: int, n_workers: int) -> List[Tuple[Tuple[int, int, int], np.ndarray]]:
+    """
+    (shard, índices de escenarios) en orden de shard. Con menos shards que workers, cada
+    shard se parte en bloques de escenarios para ocupar el pool.
+    """
+    shards = list(gd.iter_customer_shards(cfg))
+    n_blocks = max(1, min(n_scenarios, math.ceil(n_workers / len(shards))))
+    return [(shard, block) for shard in shards for block in np.array_split(np.arange(n_scenarios), n_blocks)]
+
+
+def run_scenarios(cfg: gd.Config, scenarios: List[dict], n_workers: Optional[int] = None) -> Dict[str, pd.DataFrame]:
+    """
+    KPIs de cfg (escenario "baseline") y de cada escenario (dicts de scenario_config, con
+    "name" opcional). Devuelve {"summary": una fila por escenario, "monthly": revenue, MRR,
+    costos, margen y churn por escenario y mes, "churn_reasons": por escenario y motivo}.
+    n_workers: procesos (default: cfg.n_workers).
+    """
+    gd.validate_config(cfg)
+    n_workers = cfg.n_workers if n_workers is None else n_workers
+    names = [BASELINE] + [s.get("name", f"scenario_{i}") for i, s in enumerate(scenarios, start=1)]
+    assert len(set(names)) == len(names), "scenario names must be unique (and not 'baseline')"
+    configs = [cfg] + [scenario_config(cfg, s) for s in scenarios]
+    churn_range = (min(c.churn_prob for c in configs), max(c.churn_prob for c in configs))
+
+    plans = gd.generate_plans(cfg)
+    n_months = len(np.unique(calendar.month_index(pd.date_range(cfg.start_date, cfg.end_date, freq="D"))))
+    totals = _Totals(len(configs), n_months, len(cfg.cancellation_reason_dist))
+    tasks = _iter_blocks(cfg, len(configs), n_workers)
+
+    if n_workers <= 1:
+        evaluator = _Evaluator(cfg, plans, churn_range)
+        for shard, block in tasks:
+            totals.add(block, *evaluator.run(shard, [configs[i] for i in block]))
+    else:
+        # a lo sumo 2 * n_workers bloques en vuelo: la memoria depende de chunk_size
+        with ProcessPoolExecutor(max_workers=n_workers, initializer=_init_worker,
+                                 initargs=(cfg, plans, churn_range)) as pool:
+            pending = deque()
+            for shard, block in tasks:
+                pending.append((block, pool.submit(_run_block, shard, [configs[i] for i in block])))
+                if len(pending) >= 2 * n_workers:
+                    block, future = pending.popleft()
+                    totals.add(block, *future.result())
+            while pending:
+                block, future = pending.popleft()
+                totals.add(block, *future.result())
+
+    return _results(cfg, names, configs, totals)
+
+
+# -----------------------------
+# KPIs
+# -----------------------------
+def _completed(cfg: gd.Config, keys: np.ndarray, measures: np.ndarray, n_months: int) -> kpis.CompletedTransactions:
+    """
+    CompletedTransactions con una fila por (plan, mes inicial, mes final) con pagos
+    completados: los KPIs de kpis.py sólo suman por mes o por período, así que dan lo
+    mismo que con una fila por transacción (payment_month = mes inicial en el modelo estático).
+    """
+    present = measures[:, 0] > 0
+    keys, measures = keys[present], measures[present]
+    width = n_months + _PERIOD_MONTHS
+    base = int(calendar.month_index(np.array([np.datetime64(cfg.start_date, "D")]))[0])
+    first_month = keys // width % n_months + base
+    return kpis.CompletedTransactions(
+        payment_month=first_month,
+        first_month=first_month,
+        last_month=keys % width + base,
+        gross_cents=measures[:, 2],
+        discount_cents=measures[:, 3],
+        net_cents=measures[:, 4],
+        plan_id=keys // width // n_months,
+        subscription_id=np.zeros(len(keys), dtype=np.int64),
+    )
+
+
+def _results(cfg: gd.Config, names: List[str], configs: List[gd.Config], totals: _Totals) -> Dict[str, pd.DataFrame]:
+    n_months = totals.active.shape[1]
+    base = int(calendar.month_index(np.array([np.datetime64(cfg.start_date, "D")]))[0])
+    months = calendar.month_days(base + np.arange(n_months))
+    keys = totals.keys.to_numpy(dtype=np.int64)
+    reasons = list(cfg.cancellation_reason_dist)
+
+    summary, monthly, churn_reasons = [], [], []
+    for s, (name, scenario) in enumerate(zip(names, configs)):
+        t = _completed(cfg, keys, totals.measures[s], n_months)
+        revenue = kpis._monthly_revenue_cents(t)
+        # mismos sorteos de costos (COSTS_STREAM) para todos los escenarios
+        costs = gd.generate_costs_from_revenue(
+            scenario,
+            pd.Series(revenue.to_numpy(), index=pd.DatetimeIndex(kpis._months(revenue.index.to_numpy()))),
+            gd.make_rng(cfg.seed, gd.COSTS_STREAM)
+        )
+        margin = kpis.monthly_margin(t, costs)
+        churn = kpis.churn_frame(months, totals.cancellations[s], totals.active[s])
+        frame = (
+            kpis.monthly_revenue(t)
+            .merge(kpis.mrr(t), on="month", how="outer")
+            .merge(margin[["month", "total_costs", "gross_margin", "margin_pct"]], on="month", how="left")
+            .merge(churn[["month", "cancellations", "active_at_start", "churn_rate"]], on="month", how="outer")
+            .sort_values("month", ignore_index=True)
+        )
+        frame.insert(0, "scenario", name)
+        monthly.append(frame)
+
+        counts = totals.reasons[s]
+        churn_reasons.append(pd.DataFrame({
+            "scenario": name,
+            "cancellation_reason": reasons,
+            "cancellations": counts,
+            "share": kpis._round_ratio(counts, np.full(len(counts), counts.sum()), 3),
+        }).sort_values("cancellations", ascending=False, kind="stable"))
+
+        totals_row = kpis.total_revenue(t).iloc[0]
+        complete = churn[churn["is_complete_month"]]
+        measures = totals.measures[s].sum(axis=0)
+        summary.append({
+            "scenario": name,
+            **{f"price_{p[1]}": float(p[3]) for p in scenario.plan_defs},
+            "churn_prob": scenario.churn_prob,
+            "failed_rate": scenario.failed_rate,
+            "discount_txn_rate": scenario.discount_txn_rate,
+            "yearly_discount_txn_rate": scenario.yearly_discount_txn_rate,
+            "completed_transactions": int(measures[0]),
+            "failed_transactions": int(measures[1]),
+            "gross_revenue": totals_row["gross_revenue"],
+            "total_discounts": totals_row["total_discounts"],
+            "net_revenue": totals_row["net_revenue"],
+            "total_costs": round(margin["total_costs"].sum(), 2),
+            "gross_margin": round(margin["gross_margin"].sum(), 2),
+            "final_mrr": frame["mrr"].dropna().iloc[-1] if frame["mrr"].notna().any() else np.nan,
+            "cancellations": int(totals.cancellations[s].sum()),
+            "avg_churn_rate": round(complete["churn_rate"].mean(), 4) if len(complete) else np.nan,
+        })
+
+    summary = pd.DataFrame(summary)
+    # con los mismos sorteos, la diferencia con baseline es el efecto de los parámetros
+    for column in ("net_revenue", "gross_margin", "final_mrr"):
+        summary[f"{column}_delta"] = (summary[column] - summary[column].iloc[0]).round(2)
+    return {
+        "summary": summary,
+        "monthly": pd.concat(monthly, ignore_index=True),
+        "churn_reasons": pd.concat(churn_reasons, ignore_index=True),
+    }
+
+
+def check_batch_independence(cfg: gd.Config, scenarios: List[dict], summary: pd.DataFrame) -> None:
+    """
+    Regresión de los números aleatorios comunes: el primer y el último escenario, corridos
+    solos (con baseline), dan las mismas filas que en summary (la corrida de todo el lote).
+    """
+    # posición en summary (0 = baseline) -> escenarios de la corrida aislada
+    checks = {1: scenarios[:1], len(scenarios): scenarios[-1:]} if scenarios else {0: []}
+    for position, alone in checks.items():
+        expected = summary.iloc[sorted({0, position})].reset_index(drop=True)
+        got = run_scenarios(cfg, alone)["summary"]
+        assert expected.equals(got), (
+            f"scenario results depend on the batch: {', '.join(expected['scenario'])}\n"
+            f"{pd.concat([expected, got], keys=['batch', 'alone']).T.to_string()}"
+        )
+
+
+# -----------------------------
+# CLI
+# -----------------------------
+def load_scenarios(path: str) -> List[dict]:
+    """JSON con una lista de escenarios, o {"scenarios": [...], "grid": {...}} (ver scenario_grid)."""
+    with open(path, encoding="utf-8") as f:
+        spec = json.load(f)
+    if isinstance(spec, list):
+        return spec
+    unknown = set(spec) - {"scenarios", "grid"}
+    assert not unknown, f"Unknown scenario file keys: {sorted(unknown)}"
+    return list(spec.get("scenarios", [])) + (scenario_grid(spec["grid"]) if "grid" in spec else [])
+
+
+def _parse_grid(items: List[str]) -> Dict[str, list]:
+    """--grid KEY=V1,V2,... -> {KEY: [V1, V2, ...]} (valores numéricos)."""
+    grid = {}
+    for item in items:
+        key, _, values = item.partition("=")
+        assert key and values, f"--grid must be KEY=V1,V2,...: {item}"
+        grid[key] = [float(v) for v in values.split(",")]
+    return grid
+
+
+def write_scenarios(df: pd.DataFrame, path: str) -> None:
+    """Escribe un resultado en csv, parquet o feather según la extensión."""
+    output_format = os.path.splitext(path)[1].lstrip(".")
+    assert output_format in gd.OUTPUT_FORMATS, f"output paths must end in one of {', '.join(gd.OUTPUT_FORMATS)}"
+    if output_format == "csv":
+        gd.write_csv(df, path)
+    elif output_format == "parquet":
+        df.to_parquet(path, index=False, compression="zstd")
+    else:
+        df.to_feather(path, compression="zstd")
+
+
+# flag de la CLI -> campo de Config (el modelo base de todos los escenarios)
+CLI_FIELDS = {
+    "n_customers": "n_customers",
+    "start_date": "start_date",
+    "end_date": "end_date",
+    "seed": "seed",
+    "chunk_size": "chunk_size",
+    "workers": "n_workers",
+}
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(
+        description="What-if KPIs (revenue, MRR, margin, churn) for many pricing / churn scenarios over the generator model.",
+        epilog="Every scenario shares the same random draws (common random numbers); the first row is the baseline."
+    )
+    parser.add_argument("--config", default=None, help="JSON file with the base Config (as in generate_data --config)")
+    parser.add_argument("--n-customers", type=int, default=None)
+    parser.add_argument("--start-date", default=None, help="YYYY-MM-DD")
+    parser.add_argument("--end-date", default=None, help="YYYY-MM-DD")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--chunk-size", type=int, default=None, help="customers per shard (0 = one shard)")
+    parser.add_argument("--workers", type=int, default=None, help="processes evaluating shards / scenario blocks")
+    parser.add_argument("--scenarios", default=None,
+                        help='JSON file: a list of scenarios ({"name", "prices": {plan: price}, "churn_prob", ...}) '
+                             'or {"scenarios": [...], "grid": {...}}')
+    parser.add_argument("--grid", action="append", default=[],
+                        help=f"KEY=V1,V2,... with KEY price.<plan_name> or one of {', '.join(SCENARIO_FIELDS[1:-1])}; "
+                             "repeat for a cartesian product")
+    parser.add_argument("--out", default=None, help="write the summary to this .csv/.parquet/.feather file")
+    parser.add_argument("--monthly-out", default=None, help="write the monthly KPIs per scenario to this file")
+    parser.add_argument("--check", action="store_true",
+                        help="rerun the first and last scenarios alone and assert the same summary rows as in the batch")
+    args = parser.parse_args(argv)
+
+    cfg = gd.load_config(args.config) if args.config else gd.Config()
+    cfg = replace(cfg, **{name: getattr(args, flag) for flag, name in CLI_FIELDS.items() if getattr(args, flag) is not None})
+    scenarios = (load_scenarios(args.scenarios) if args.scenarios else []) + \
+        (scenario_grid(_parse_grid(args.grid)) if args.grid else [])
+
+    start = time.perf_counter()
+    results = run_scenarios(cfg, scenarios)
+    print(f"{len(scenarios) + 1} scenarios x {cfg.n_customers:,} customers: {time.perf_counter() - start:.1f}s")
+    if args.check:
+        check_batch_independence(cfg, scenarios, results["summary"])
+        print("check: first and last scenarios match when run alone")
+    if args.out:
+        write_scenarios(results["summary"], args.out)
+        print(f"{len(results['summary']):,} rows: {args.out}")
+    if args.monthly_out:
+        write_scenarios(results["monthly"], args.monthly_out)
+        print(f"{len(results['monthly']):,} rows: {args.monthly_out}")
+    if not args.out:
+        columns = ["scenario", "net_revenue", "gross_margin", "final_mrr", "avg_churn_rate",
+                   "net_revenue_delta", "gross_margin_delta"]
+        with pd.option_context("display.width", 160, "display.max_columns", 20):
+            print(results["summary"][columns].to_string(index=False, max_rows=40))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,313 @@
+"""
+Serving de KPIs con cache de resultados para lecturas repetidas entre cargas.
+
+Los dashboards y los usuarios ad-hoc leen las mismas vistas vw_* una y otra vez, y cada
+lectura recalcula la agregación aunque los datos no cambiaron desde el último ETL:
+
+- Clave: (vista o tabla agg_*, filtros normalizados). Los filtros son rangos sobre la
+  columna de mes (since/until) e igualdades (columna = valor o columna IN valores),
+  siempre parametrizados; vistas y columnas se validan contra sql/ y el catálogo.
+- LRU acotado por cantidad de entradas y por bytes (memoria de los DataFrames).
+- Invalidación: analytics.etl_load_generation, que los loaders (bulk_load y
+  run_incremental) incrementan en la misma transacción que los datos y las tablas agg_*:
+  ninguna lectura ve datos nuevos con la generación vieja. Cada lectura compara la generación (un lookup por PK, o
+  cada check_interval segundos) y, si cambió, descarta todo el cache.
+- Métricas: hits, misses, hit rate, evictions e invalidaciones, en total y por vista
+  (metrics()).
+
+Tras una carga manual (pgAdmin) hay que incrementar la generación a mano:
+    UPDATE analytics.etl_load_generation SET generation = generation + 1, loaded_at = now();
+
+Uso (desde la raíz del repo):
+    python -m src.analytics.serving --dsn postgresql://user@localhost/db --view vw_mrr --repeat 5
+    python -m src.analytics.serving --dsn ... --view vw_cohort_retention --since 2023-01-01 --where country=AR,UY
+"""
+from __future__ import annotations
+
+import argparse
+import datetime as dt
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+import pandas as pd
+
+from src.etl.load_postgres import REPO_ROOT, SCHEMA, connect, read_dataframe
+
+
+SQL_DIR = os.path.join(REPO_ROOT, "sql")
+# vistas y tablas materializadas que se pueden servir, por archivo
+SERVED_SOURCES = (
+    ("03_kpis", r"CREATE\s+OR\s+REPLACE\s+VIEW\s+(\w+)"),
+    ("04_views", r"CREATE\s+OR\s+REPLACE\s+VIEW\s+(\w+)"),
+    ("01_schema/05_kpi_aggregates.sql", r"CREATE\s+TABLE\s+IF\s+NOT\s+EXISTS\s+(agg_\w+_(?:monthly|daily))\b"),
+)
+
+MAX_ENTRIES = 256
+MAX_BYTES = 256 << 20
+# columna de los filtros since/until
+MONTH_COLUMN = "month"
+DATE_OID = 1082
+
+Filters = Tuple[Tuple[str, Tuple[Any, ...]], ...]
+Generation = Tuple[int, dt.datetime]
+
+
+def served_relations() -> List[str]:
+    names = []
+    for source, pattern in SERVED_SOURCES:
+        path = os.path.join(SQL_DIR, source)
+        paths = [path] if path.endswith(".sql") else sorted(
+            os.path.join(path, f) for f in os.listdir(path) if f.endswith(".sql")
+        )
+        for p in paths:
+            with open(p, encoding="utf-8") as f:
+                names += re.findall(pattern, f.read(), flags=re.I)
+    return sorted(set(names))
+
+
+# -----------------------------
+# Cache LRU
+# -----------------------------
+class ResultCache:
+    """
+    LRU de DataFrames acotado por entradas y bytes, con contadores para métricas.
+    Un resultado más grande que max_bytes no se guarda.
+    """
+
+    def __init__(self, max_entries: int = MAX_ENTRIES, max_bytes: int = MAX_BYTES) -> None:
+        assert max_entries > 0 and max_bytes > 0, "max_entries and max_bytes must be > 0"
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Hashable, Tuple[pd.DataFrame, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Optional[pd.DataFrame]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: Hashable, df: pd.DataFrame) -> None:
+        size = int(df.memory_usage(index=True, deep=True).sum())
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self.bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (df, size)
+            self.bytes += size
+            while len(self._entries) > self.max_entries or self.bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.bytes -= evicted
+                self.evictions += 1
+
+    def clear(self) -> int:
+        """Descarta todas las entradas (invalidación); devuelve cuántas había."""
+        with self._lock:
+            dropped = len(self._entries)
+            self._entries.clear()
+            self.bytes = 0
+            self.invalidations += dropped
+            return dropped
+
+
+def _hit_rate(hits: int, misses: int) -> Optional[float]:
+    return round(hits / (hits + misses), 4) if hits + misses else None
+
+
+# -----------------------------
+# Server
+# -----------------------------
+class KpiServer:
+    """
+    Lecturas de vistas/tablas de KPIs sobre una conexión psycopg abierta (autocommit),
+    servidas desde el cache mientras la generación de carga no cambie.
+    Los DataFrames devueltos son copias: el llamador puede modificarlos.
+    """
+
+    def __init__(
+        self,
+        conn,
+        max_entries: int = MAX_ENTRIES,
+        max_bytes: int = MAX_BYTES,
+        check_interval: float = 0.0
+    ) -> None:
+        self.conn = conn
+        self.cache = ResultCache(max_entries, max_bytes)
+        self.check_interval = check_interval
+        self.relations = set(served_relations())
+        self.generation: Optional[Generation] = None
+        self.generation_changes = 0
+        self._checked_at = float("-inf")
+        # por relación: nombre de columna -> es fecha
+        self._columns: Dict[str, Dict[str, bool]] = {}
+        self._by_view: Dict[str, Dict[str, float]] = {}
+
+    def _current_generation(self) -> Generation:
+        now = time.monotonic()
+        if self.generation is not None and now - self._checked_at < self.check_interval:
+            return self.generation
+        row = self.conn.execute(f"SELECT generation, loaded_at FROM {SCHEMA}.etl_load_generation").fetchone()
+        assert row is not None, f"{SCHEMA}.etl_load_generation is empty: run sql/01_schema/04_etl_watermarks.sql"
+        self._checked_at = now
+        # loaded_at distingue una base recreada que volvió a la misma generación
+        generation = (row[0], row[1])
+        if generation != self.generation:
+            if self.generation is not None:
+                self.generation_changes += 1
+            self.cache.clear()
+            self._columns.clear()
+            self.generation = generation
+        return generation
+
+    def _relation_columns(self, view: str) -> Dict[str, bool]:
+        if view not in self._columns:
+            cursor = self.conn.execute(f"SELECT * FROM {SCHEMA}.{view} LIMIT 0")
+            self._columns[view] = {c.name: c.type_code == DATE_OID for c in cursor.description}
+        return self._columns[view]
+
+    def _filters(self, view: str, where: Dict[str, Any]) -> Filters:
+        """Filtros normalizados (clave del cache): columnas ordenadas, valores como tuplas ordenadas."""
+        columns = self._relation_columns(view)
+        filters = []
+        for column, values in sorted(where.items()):
+            assert column in columns, f"{view} has no column {column!r}"
+            if not isinstance(values, (list, tuple, set, frozenset)):
+                values = (values,)
+            if columns[column]:
+                values = [pd.Timestamp(v).date() for v in values]
+            filters.append((column, tuple(sorted(set(values), key=repr))))
+        return tuple(filters)
+
+    def _sql(self, view: str, since: Optional[dt.date], until: Optional[dt.date], filters: Filters) -> Tuple[str, list]:
+        conditions, params = [], []
+        if since is not None:
+            conditions.append(f"{MONTH_COLUMN} >= %s")
+            params.append(since)
+        if until is not None:
+            conditions.append(f"{MONTH_COLUMN} <= %s")
+            params.append(until)
+        for column, values in filters:
+            conditions.append(f"{column} = ANY(%s)")
+            params.append(list(values))
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        return f"SELECT * FROM {SCHEMA}.{view}{where}", params
+
+    def _read(self, view: str, query: str, params: list) -> pd.DataFrame:
+        # COPY no acepta parámetros: se interpolan del lado del cliente, con la adaptación de psycopg
+        import psycopg
+
+        statement = psycopg.ClientCursor(self.conn).mogrify(query, params)
+        dates = tuple(c for c, is_date in self._relation_columns(view).items() if is_date)
+        return read_dataframe(self.conn, statement, parse_dates=dates)
+
+    def query(
+        self,
+        view: str,
+        since: Optional[Any] = None,
+        until: Optional[Any] = None,
+        where: Optional[Dict[str, Any]] = None
+    ) -> pd.DataFrame:
+        """
+        Filas de view con month en [since, until] y column = valor (o IN valores) por cada
+        entrada de where; desde el cache si ya se leyeron con la misma generación de carga.
+        """
+        assert view in self.relations, f"unknown view {view!r}; one of: {', '.join(sorted(self.relations))}"
+        generation = self._current_generation()
+        if since is not None or until is not None:
+            assert MONTH_COLUMN in self._relation_columns(view), f"{view} has no {MONTH_COLUMN} column for since/until"
+        since = None if since is None else pd.Timestamp(since).date()
+        until = None if until is None else pd.Timestamp(until).date()
+        filters = self._filters(view, where or {})
+        key = (generation, view, since, until, filters)
+
+        stats = self._by_view.setdefault(view, {"hits": 0, "misses": 0, "query_seconds": 0.0})
+        df = self.cache.get(key)
+        if df is not None:
+            stats["hits"] += 1
+            return df.copy()
+        stats["misses"] += 1
+        start = time.perf_counter()
+        df = self._read(view, *self._sql(view, since, until, filters))
+        stats["query_seconds"] += time.perf_counter() - start
+        self.cache.put(key, df)
+        return df.copy()
+
+    def metrics(self) -> dict:
+        """Hits, misses, hit rate, evictions e invalidaciones del cache, en total y por vista."""
+        cache = self.cache
+        return {
+            "generation": None if self.generation is None else self.generation[0],
+            "generation_changes": self.generation_changes,
+            "entries": len(cache),
+            "bytes": cache.bytes,
+            "hits": cache.hits,
+            "misses": cache.misses,
+            "hit_rate": _hit_rate(cache.hits, cache.misses),
+            "evictions": cache.evictions,
+            "invalidations": cache.invalidations,
+            "views": {
+                view: {
+                    "hits": stats["hits"],
+                    "misses": stats["misses"],
+                    "hit_rate": _hit_rate(stats["hits"], stats["misses"]),
+                    "query_seconds": round(stats["query_seconds"], 4),
+                }
+                for view, stats in sorted(self._by_view.items())
+            },
+        }
+
+
+def _parse_where(items: List[str]) -> Dict[str, List[str]]:
+    where = {}
+    for item in items:
+        column, sep, values = item.partition("=")
+        assert sep, f"--where must be column=value[,value...], got {item!r}"
+        where[column] = values.split(",")
+    return where
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Read a KPI view through the result cache and print cache metrics.")
+    parser.add_argument("--dsn", default=os.environ.get("DATABASE_URL", ""),
+                        help="libpq connection string (default: $DATABASE_URL / PG* env vars)")
+    parser.add_argument("--view", required=True, help="view or agg_* table in the analytics schema")
+    parser.add_argument("--since", default=None, help=f"first {MONTH_COLUMN}, YYYY-MM-DD")
+    parser.add_argument("--until", default=None, help=f"last {MONTH_COLUMN}, YYYY-MM-DD")
+    parser.add_argument("--where", action="append", default=[],
+                        help="equality filter column=value[,value...] (repeatable)")
+    parser.add_argument("--repeat", type=int, default=3, help="number of reads (default: 3)")
+    args = parser.parse_args(argv)
+    assert args.repeat >= 1, "--repeat must be >= 1"
+
+    where = _parse_where(args.where)
+    with connect(args.dsn) as conn:
+        server = KpiServer(conn)
+        for i in range(args.repeat):
+            start = time.perf_counter()
+            df = server.query(args.view, since=args.since, until=args.until, where=where)
+            print(f"read {i + 1}: {len(df):,} rows in {(time.perf_counter() - start) * 1000:.2f} ms")
+        with pd.option_context("display.width", 160, "display.max_columns", 20):
+            print(df.to_string(index=False, max_rows=24))
+        print(json.dumps(server.metrics(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,387 @@
+"""
+Distinct counts mergeables con HyperLogLog: sketches de subscription_id y customer_id
+por celda (mes de pago x plan x country x acquisition_channel), los mismos que
+agg_distinct_sketches (sql/02_etl/05_distinct_sketches.sql), bit a bit.
+
+- COUNT(DISTINCT) no se puede sumar entre meses ni segmentos; los sketches sí: la unión
+  de cualquier conjunto de celdas es el máximo registro a registro. rollup() estima
+  distinct counts por cualquier agrupación y rango de meses sin volver a las transacciones.
+- hash = hashint4extended(id, 0) de Postgres (lookup3 de Jenkins, sin seed), en numpy;
+  registro = 11 bits bajos, rho = ceros a la izquierda de los otros 53 bits + 1 (máximo
+  LEVELS). 2048 registros por sketch: error estándar ~2.3%.
+- En la tabla cada sketch va en niveles de bits (BIT(65536) en Postgres): el bit r del
+  nivel L vale 1 si el registro r >= L, así la unión es un OR y BIT_OR la hace en SQL.
+  En memoria los registros son uint8.
+- add_transactions acepta bloques en cualquier orden (shards, cargas por ventana): el
+  máximo es conmutativo e idempotente.
+- exact_rollup calcula lo mismo con nunique sobre las transacciones, para verificar.
+
+Uso (desde la raíz del repo):
+    python -m src.analytics.sketches --data-dir data/raw --by plan_id --exact
+    python -m src.analytics.sketches --data-dir data/raw --out data/sketches.parquet
+"""
+from __future__ import annotations
+
+import argparse
+import os
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.analytics.kpis import _months
+from src.data_generation import calendar, generate_data as gd
+
+
+# Columnas que usa el engine, por tabla generada
+SKETCH_COLUMNS = {
+    "customers": ["customer_id", "country", "acquisition_channel"],
+    "transactions": ["customer_id", "subscription_id", "plan_id", "payment_date", "transaction_status"],
+}
+
+PRECISION = 11
+REGISTERS = 1 << PRECISION
+# niveles del formato en bits: rho se satura en LEVELS (hacen falta miles de millones de ids)
+LEVELS = 32
+ID_KINDS = ("subscription", "customer")
+CELL_COLUMNS = ["month", "plan_id", "country", "acquisition_channel"]
+# sketch por tipo de id: columna de agg_distinct_sketches
+SKETCH_TABLE_COLUMNS = {"subscription": "subscriptions", "customer": "customers"}
+
+# clave de celda = mes << 32 | plan_id << 16 | segmento
+PLAN_BITS = 16
+SEGMENT_BITS = 16
+
+_ALPHA = 0.7213 / (1 + 1.079 / REGISTERS)
+_LOOKUP3_INIT = np.uint32((0x9E3779B9 + 4 + 3923095) & 0xFFFFFFFF)
+
+
+# -----------------------------
+# HyperLogLog
+# -----------------------------
+def _rot(x: np.ndarray, k: int) -> np.ndarray:
+    return (x << np.uint32(k)) | (x >> np.uint32(32 - k))
+
+
+def hash_ids(ids) -> np.ndarray:
+    """hashint4extended(id, 0) de Postgres para cada id (uint64)."""
+    k = np.asarray(ids).astype(np.uint32)
+    with np.errstate(over="ignore"):
+        a = k + _LOOKUP3_INIT
+        b = np.full_like(k, _LOOKUP3_INIT)
+        c = np.full_like(k, _LOOKUP3_INIT)
+        # final() de lookup3 (src/common/hashfn.c)
+        c ^= b; c -= _rot(b, 14)
+        a ^= c; a -= _rot(c, 11)
+        b ^= a; b -= _rot(a, 25)
+        c ^= b; c -= _rot(b, 16)
+        a ^= c; a -= _rot(c, 4)
+        b ^= a; b -= _rot(a, 14)
+        c ^= b; c -= _rot(b, 24)
+    return (b.astype(np.uint64) << np.uint64(32)) | c.astype(np.uint64)
+
+
+def register_rho(hashes: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """(registro, rho) de cada hash, como hll_register / hll_rho."""
+    register = (hashes & np.uint64(REGISTERS - 1)).astype(np.int64)
+    w = hashes >> np.uint64(PRECISION)
+    # w < 2^53: frexp en float64 es exacto y su exponente es el largo en bits (0 para w = 0)
+    bit_length = np.frexp(w.astype(np.float64))[1]
+    return register, np.minimum(64 - PRECISION + 1 - bit_length, LEVELS).astype(np.uint8)
+
+
+def estimate(sketches: np.ndarray) -> np.ndarray:
+    """Cardinalidad estimada de cada sketch (última dimensión = registros), como hll_estimate."""
+    sketches = np.asarray(sketches)
+    nonzero = (sketches > 0).sum(axis=-1)
+    harmonic = np.where(sketches > 0, np.ldexp(1.0, -sketches.astype(np.int64)), 0.0).sum(axis=-1)
+    zeros = REGISTERS - nonzero
+    raw = _ALPHA * REGISTERS * REGISTERS / (harmonic + zeros)
+    with np.errstate(divide="ignore"):
+        linear = REGISTERS * np.log(REGISTERS / zeros)
+    return np.rint(np.where((raw <= 2.5 * REGISTERS) & (zeros > 0), linear, raw)).astype(np.int64)
+
+
+def to_levels(registers: np.ndarray) -> np.ndarray:
+    """Registros (..., REGISTERS) -> sketches en niveles de bits (..., LEVELS * REGISTERS / 8 bytes)."""
+    levels = registers[..., None, :] >= np.arange(1, LEVELS + 1, dtype=np.uint8)[:, None]
+    return np.packbits(levels, axis=-1).reshape(*registers.shape[:-1], -1)
+
+
+def from_levels(sketches: np.ndarray) -> np.ndarray:
+    """Inversa de to_levels: el registro es la cantidad de niveles con su bit en 1."""
+    bits = np.unpackbits(sketches.reshape(*sketches.shape[:-1], LEVELS, -1), axis=-1)
+    return bits.sum(axis=-2, dtype=np.uint8)
+
+
+def _to_bytes(value) -> bytes:
+    """
+    Sketch de parquet/feather (bytes), de csv ('x' + hex, entrada de BIT de Postgres)
+    o de COPY / read_dataframe de agg_distinct_sketches ('0'/'1' por bit).
+    """
+    if isinstance(value, str):
+        if value[:1] in ("x", "X"):
+            return bytes.fromhex(value[1:])
+        return np.packbits(np.frombuffer(value.encode(), dtype=np.uint8) - ord("0")).tobytes()
+    return bytes(value)
+
+
+# -----------------------------
+# Cubo de sketches
+# -----------------------------
+class SketchCube:
+    """
+    Sketches por celda (mes de pago, plan, country, acquisition_channel) de las transacciones
+    completadas agregadas. Los customers de cada transacción tienen que haberse agregado antes
+    con add_customers (su segmento); from_table carga sketches ya calculados.
+    """
+
+    def __init__(self) -> None:
+        self.segments: Dict[Tuple[str, str], int] = {}
+        # por customer_id: código de segmento (-1 = desconocido)
+        self.segment = np.full(0, -1, dtype=np.int64)
+        self.cells = pd.Index([], dtype=np.int64)
+        self.registers = np.zeros((0, len(ID_KINDS), REGISTERS), dtype=np.uint8)
+
+    def _segment_codes(self, country: np.ndarray, channel: np.ndarray) -> np.ndarray:
+        codes, pairs = pd.MultiIndex.from_arrays([country, channel]).factorize()
+        known = np.array([self.segments.setdefault(p, len(self.segments)) for p in pairs], dtype=np.int64)
+        assert len(self.segments) <= 1 << SEGMENT_BITS, "too many country x acquisition_channel segments"
+        return known[codes]
+
+    def _rows(self, keys: np.ndarray) -> np.ndarray:
+        """Fila de cada clave de celda, agregando las celdas nuevas."""
+        unique = np.unique(keys)
+        missing = unique[self.cells.get_indexer(unique) < 0]
+        if len(missing):
+            self.cells = self.cells.append(pd.Index(missing))
+            extra = np.zeros((len(missing), len(ID_KINDS), REGISTERS), dtype=np.uint8)
+            self.registers = np.concatenate([self.registers, extra])
+        return self.cells.get_indexer(keys)
+
+    def add_customers(self, customers: pd.DataFrame) -> None:
+        ids = customers["customer_id"].to_numpy().astype(np.int64)
+        if not len(ids):
+            return
+        codes = self._segment_codes(
+            customers["country"].astype(str).to_numpy(), customers["acquisition_channel"].astype(str).to_numpy()
+        )
+        if ids.max() >= len(self.segment):
+            grown = np.full(max(int(ids.max()) + 1, 2 * len(self.segment)), -1, dtype=np.int64)
+            grown[:len(self.segment)] = self.segment
+            self.segment = grown
+        self.segment[ids] = codes
+
+    def add_transactions(self, transactions: pd.DataFrame) -> None:
+        mask = (transactions["transaction_status"] == "completed").to_numpy()
+
+        def column(name: str) -> np.ndarray:
+            return transactions[name].to_numpy()[mask]
+
+        customer = column("customer_id").astype(np.int64)
+        if not len(customer):
+            return
+        assert customer.max() < len(self.segment) and (self.segment[customer] >= 0).all(), \
+            "transactions of customers not added with add_customers"
+        plan = column("plan_id").astype(np.int64)
+        assert plan.min() >= 0 and plan.max() < 1 << PLAN_BITS, "plan_id out of range"
+
+        key = calendar.month_index(column("payment_date")) << (PLAN_BITS + SEGMENT_BITS) \
+            | plan << SEGMENT_BITS | self.segment[customer]
+        row = self._rows(key)
+        flat = self.registers.reshape(-1)
+        for k, ids in enumerate((column("subscription_id"), customer)):
+            register, rho = register_rho(hash_ids(ids))
+            np.maximum.at(flat, (row * len(ID_KINDS) + k) * REGISTERS + register, rho)
+
+    def _cell_frame(self) -> pd.DataFrame:
+        keys = self.cells.to_numpy(dtype=np.int64)
+        names = np.array(list(self.segments), dtype=object).reshape(-1, 2)
+        segment = keys & ((1 << SEGMENT_BITS) - 1)
+        return pd.DataFrame({
+            "month": _months(keys >> (PLAN_BITS + SEGMENT_BITS)),
+            "plan_id": (keys >> SEGMENT_BITS) & ((1 << PLAN_BITS) - 1),
+            "country": names[segment, 0],
+            "acquisition_channel": names[segment, 1],
+        })
+
+    def table(self) -> pd.DataFrame:
+        """Sketches por celda: mismas filas y bits que agg_distinct_sketches."""
+        cells = self._cell_frame().sort_values(CELL_COLUMNS)
+        rows = cells.index.to_numpy()
+        cells = cells.reset_index(drop=True)
+        sketches: List[List[bytes]] = [[] for _ in ID_KINDS]
+        # por bloques: los niveles ocupan 32 bytes por registro antes de empaquetar
+        for start in range(0, len(rows), 1024):
+            levels = to_levels(self.registers[rows[start:start + 1024]])
+            for k in range(len(ID_KINDS)):
+                sketches[k].extend(s.tobytes() for s in levels[:, k])
+        for k, kind in enumerate(ID_KINDS):
+            cells[SKETCH_TABLE_COLUMNS[kind]] = sketches[k]
+        return cells
+
+    @classmethod
+    def from_table(cls, table: pd.DataFrame) -> "SketchCube":
+        """Cubo desde sketches guardados (table() o agg_distinct_sketches)."""
+        cube = cls()
+        segment = cube._segment_codes(
+            table["country"].astype(str).to_numpy(), table["acquisition_channel"].astype(str).to_numpy()
+        )
+        key = calendar.month_index(table["month"]) << (PLAN_BITS + SEGMENT_BITS) \
+            | table["plan_id"].to_numpy().astype(np.int64) << SEGMENT_BITS | segment
+        row = cube._rows(key)
+        for k, kind in enumerate(ID_KINDS):
+            sketches = b"".join(_to_bytes(v) for v in table[SKETCH_TABLE_COLUMNS[kind]])
+            sketches = np.frombuffer(sketches, dtype=np.uint8).reshape(len(row), -1)
+            for start in range(0, len(row), 1024):
+                np.maximum.at(
+                    cube.registers[:, k], row[start:start + 1024], from_levels(sketches[start:start + 1024])
+                )
+        return cube
+
+    def rollup(
+        self,
+        kind: str = "subscription",
+        by: Sequence[str] = (),
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        plan_ids: Optional[Sequence[int]] = None,
+        countries: Optional[Sequence[str]] = None,
+        channels: Optional[Sequence[str]] = None
+    ) -> pd.DataFrame:
+        """
+        Distinct count estimado por los grupos de `by` (columnas de celda), con las celdas
+        filtradas: los sketches de cada grupo se unen (máximo por registro) y se estiman.
+        """
+        assert kind in ID_KINDS, f"kind must be one of {', '.join(ID_KINDS)}"
+        cells = self._cell_frame()
+        mask = _filter_mask(cells, since, until, plan_ids, countries, channels)
+        cells, registers = cells[mask], self.registers[mask, ID_KINDS.index(kind)]
+        if not by:
+            merged = registers.max(axis=0) if len(registers) else np.zeros(REGISTERS, dtype=np.uint8)
+            return pd.DataFrame({kind + "s": [int(estimate(merged))]})
+        group, labels = pd.MultiIndex.from_frame(cells[list(by)]).factorize(sort=True)
+        order = np.argsort(group, kind="stable")
+        starts = np.flatnonzero(np.r_[True, np.diff(group[order]) != 0])
+        merged = np.maximum.reduceat(registers[order], starts, axis=0)
+        out = labels.set_names(list(by)).to_frame(index=False)
+        out[kind + "s"] = estimate(merged)
+        return out
+
+
+def _filter_mask(
+    frame: pd.DataFrame,
+    since: Optional[str],
+    until: Optional[str],
+    plan_ids: Optional[Sequence[int]],
+    countries: Optional[Sequence[str]],
+    channels: Optional[Sequence[str]]
+) -> np.ndarray:
+    """Filas con month en [since, until] (meses) y plan / country / channel en las listas dadas."""
+    mask = np.ones(len(frame), dtype=bool)
+    month = calendar.month_index(frame["month"])
+    if since is not None:
+        mask &= month >= calendar.month_index(np.array([since], dtype="datetime64[D]"))[0]
+    if until is not None:
+        mask &= month <= calendar.month_index(np.array([until], dtype="datetime64[D]"))[0]
+    for column, values in (("plan_id", plan_ids), ("country", countries), ("acquisition_channel", channels)):
+        if values is not None:
+            mask &= frame[column].isin(list(values)).to_numpy()
+    return mask
+
+
+def exact_rollup(
+    customers: pd.DataFrame,
+    transactions: pd.DataFrame,
+    kind: str = "subscription",
+    by: Sequence[str] = (),
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    plan_ids: Optional[Sequence[int]] = None,
+    countries: Optional[Sequence[str]] = None,
+    channels: Optional[Sequence[str]] = None
+) -> pd.DataFrame:
+    """Mismo resultado que SketchCube.rollup con COUNT(DISTINCT) exacto sobre las transacciones."""
+    assert kind in ID_KINDS, f"kind must be one of {', '.join(ID_KINDS)}"
+    completed = transactions[transactions["transaction_status"] == "completed"]
+    segments = customers[SKETCH_COLUMNS["customers"]].astype({"country": str, "acquisition_channel": str})
+    frame = completed[["customer_id", "subscription_id", "plan_id"]].merge(segments, on="customer_id", how="left")
+    frame["month"] = _months(calendar.month_index(completed["payment_date"])).to_numpy()
+    frame = frame[_filter_mask(frame, since, until, plan_ids, countries, channels)]
+    ids = f"{kind}_id"
+    if not by:
+        return pd.DataFrame({kind + "s": [frame[ids].nunique()]})
+    return frame.groupby(list(by))[ids].nunique().rename(kind + "s").reset_index()
+
+
+def compute_sketches(customers: pd.DataFrame, transactions: pd.DataFrame) -> SketchCube:
+    cube = SketchCube()
+    cube.add_customers(customers)
+    cube.add_transactions(transactions)
+    return cube
+
+
+def load_tables(data_dir: str) -> Dict[str, pd.DataFrame]:
+    return {name: gd.read_table(gd.find_table(data_dir, name), columns) for name, columns in SKETCH_COLUMNS.items()}
+
+
+def write_sketches(df: pd.DataFrame, path: str) -> None:
+    """Escribe los sketches en parquet o feather (binario), o csv en hex ('x...', entrada de BIT de Postgres)."""
+    output_format = os.path.splitext(path)[1].lstrip(".")
+    assert output_format in gd.OUTPUT_FORMATS, f"--out must end in one of {', '.join(gd.OUTPUT_FORMATS)}"
+    if output_format == "csv":
+        df = df.copy()
+        for column in SKETCH_TABLE_COLUMNS.values():
+            df[column] = ["x" + v.hex() for v in df[column]]
+        gd.write_csv(df, path)
+    elif output_format == "parquet":
+        df.to_parquet(path, index=False, compression="zstd")
+    else:
+        df.to_feather(path, compression="zstd")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Distinct subscription/customer counts from HyperLogLog sketches.")
+    parser.add_argument("--data-dir", default=gd.Config().out_dir,
+                        help="directory with the generated files (default: data/raw)")
+    parser.add_argument("--kind", default="subscription", choices=ID_KINDS, help="id to count (default: subscription)")
+    parser.add_argument("--by", default="", help=f"comma-separated grouping columns from {', '.join(CELL_COLUMNS)}")
+    parser.add_argument("--since", default=None, help="first payment month, YYYY-MM-DD")
+    parser.add_argument("--until", default=None, help="last payment month, YYYY-MM-DD")
+    parser.add_argument("--plan-ids", default=None, help="comma-separated plan_ids")
+    parser.add_argument("--countries", default=None, help="comma-separated countries")
+    parser.add_argument("--channels", default=None, help="comma-separated acquisition channels")
+    parser.add_argument("--exact", action="store_true", help="add the exact COUNT(DISTINCT) and the relative error")
+    parser.add_argument("--out", default=None, help="write the sketches to this .csv/.parquet/.feather file")
+    args = parser.parse_args(argv)
+
+    by = [c for c in args.by.split(",") if c]
+    assert set(by) <= set(CELL_COLUMNS), f"--by must be a subset of {', '.join(CELL_COLUMNS)}"
+    split = lambda s: None if s is None else s.split(",")
+    filters = dict(
+        since=args.since, until=args.until,
+        plan_ids=None if args.plan_ids is None else [int(p) for p in split(args.plan_ids)],
+        countries=split(args.countries), channels=split(args.channels)
+    )
+
+    tables = load_tables(args.data_dir)
+    cube = compute_sketches(tables["customers"], tables["transactions"])
+    if args.out:
+        sketches = cube.table()
+        write_sketches(sketches, args.out)
+        print(f"{len(sketches):,} rows: {args.out}")
+        return
+
+    column = args.kind + "s"
+    result = cube.rollup(args.kind, by, **filters)
+    if args.exact:
+        exact = exact_rollup(tables["customers"], tables["transactions"], args.kind, by, **filters)
+        result = result.merge(exact, on=by, how="outer", suffixes=("", "_exact")) if by else \
+            result.join(exact, rsuffix="_exact")
+        result["relative_error"] = np.round(result[column] / result[column + "_exact"] - 1, 4)
+    with pd.option_context("display.width", 160, "display.max_columns", 20):
+        print(result.to_string(index=False, max_rows=40))
+
+
+if __name__ == "__main__":
+    main()
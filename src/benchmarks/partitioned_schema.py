@@ -0,0 +1,166 @@
+"""
+Benchmark del schema particionado (sql/01_schema/partitioned/) contra el actual (sql/01_schema/).
+
+Para cada variante borra el schema `analytics`, hace la carga full de data_dir con
+src.etl.load_postgres y mide (mediana de --repeat corridas):
+
+- queries sobre fact_transactions: toda la historia y ventanas de tiempo (últimos
+  3 meses, último mes), en las que el particionado sólo lee las particiones del rango;
+- los refresh de las tablas de KPIs (cubo de revenue, MRR y churn), en una transacción
+  que se descarta.
+
+Junto al tiempo se reporta, según EXPLAIN (ANALYZE, BUFFERS), cuántas tablas de
+fact_transactions recorre el plan (partition pruning) y cuántas páginas lee: con los
+datos en cache el tiempo lo domina la agregación, las páginas muestran el I/O evitado.
+
+ATENCIÓN: borra y recrea el schema analytics de la base indicada.
+
+Uso (desde la raíz del repo):
+    python -m src.benchmarks.partitioned_schema --dsn postgresql://user@localhost/db --data-dir data/raw
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import time
+from typing import Dict, Iterator, List, Tuple
+
+from src.data_generation import generate_data as gd
+from src.etl.load_postgres import SCHEMA, bulk_load, connect
+
+
+LAYOUTS = (("heap", False), ("partitioned", True))
+
+# {first_3m} / {first_1m} / {end}: límites literales, para que la poda ocurra al planificar
+QUERIES = {
+    "revenue_by_month_plan": """
+        SELECT DATE_TRUNC('month', payment_date) AS month, plan_id, SUM(net_revenue)
+        FROM fact_transactions
+        WHERE transaction_status = 'completed'
+        GROUP BY 1, 2
+    """,
+    "revenue_by_month_plan_3m": """
+        SELECT DATE_TRUNC('month', payment_date) AS month, plan_id, SUM(net_revenue)
+        FROM fact_transactions
+        WHERE transaction_status = 'completed'
+          AND payment_date >= DATE '{first_3m}' AND payment_date < DATE '{end}'
+        GROUP BY 1, 2
+    """,
+    "revenue_by_day_1m": """
+        SELECT payment_date, SUM(net_revenue), COUNT(*)
+        FROM fact_transactions
+        WHERE transaction_status = 'completed'
+          AND payment_date >= DATE '{first_1m}' AND payment_date < DATE '{end}'
+        GROUP BY 1
+    """,
+    "failed_payments_3m": """
+        SELECT payment_method, COUNT(*)
+        FROM fact_transactions
+        WHERE transaction_status = 'failed'
+          AND payment_date >= DATE '{first_3m}' AND payment_date < DATE '{end}'
+        GROUP BY 1
+    """,
+    "plan_performance": """
+        SELECT plan_id, COUNT(DISTINCT subscription_id), SUM(net_revenue), ROUND(AVG(net_revenue), 2)
+        FROM fact_transactions
+        WHERE transaction_status = 'completed'
+        GROUP BY 1
+    """,
+}
+
+PROCEDURES = {
+    "rebuild_revenue_cube": "CALL rebuild_revenue_cube()",
+    "refresh_mrr_churn_full": "CALL refresh_mrr_churn(true)",
+}
+
+
+def _plan_relations(plan: dict) -> Iterator[str]:
+    if "Relation Name" in plan:
+        yield plan["Relation Name"]
+    for child in plan.get("Plans", ()):
+        yield from _plan_relations(child)
+
+
+def scan_stats(conn, query: str) -> Tuple[int, int]:
+    """(tablas de fact_transactions recorridas, páginas leídas) al ejecutar query."""
+    plan = conn.execute(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {query}").fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    root = plan[0]["Plan"]
+    tables = {name for name in _plan_relations(root) if name.startswith("fact_transactions")}
+    return len(tables), root["Shared Hit Blocks"] + root["Shared Read Blocks"]
+
+
+def _median_seconds(run, repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def _windows(conn) -> Dict[str, str]:
+    end, first_3m, first_1m = conn.execute(
+        """
+        SELECT e, (e - INTERVAL '3 months')::date, (e - INTERVAL '1 month')::date
+        FROM (SELECT (DATE_TRUNC('month', MAX(payment_date)) + INTERVAL '1 month')::date AS e
+              FROM fact_transactions) m
+        """
+    ).fetchone()
+    return {"end": end.isoformat(), "first_3m": first_3m.isoformat(), "first_1m": first_1m.isoformat()}
+
+
+def run_layout(conn, data_dir: str, partitioned: bool, repeat: int) -> Dict[str, Tuple[float, int, int]]:
+    """Carga data_dir con la variante dada y devuelve {medición: (segundos, tablas, páginas)}."""
+    conn.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+    start = time.perf_counter()
+    bulk_load(conn, data_dir=data_dir, partitioned=partitioned)
+    results = {"bulk_load": (time.perf_counter() - start, 0, 0)}
+
+    conn.execute(f"SET search_path TO {SCHEMA}")
+    windows = _windows(conn)
+    for name, template in QUERIES.items():
+        query = template.format(**windows)
+        seconds = _median_seconds(lambda: conn.execute(query).fetchall(), repeat)
+        results[name] = (seconds, *scan_stats(conn, query))
+
+    for name, statement in PROCEDURES.items():
+        def run() -> None:
+            conn.execute("BEGIN")
+            try:
+                conn.execute(statement)
+            finally:
+                conn.execute("ROLLBACK")
+        results[name] = (_median_seconds(run, repeat), 0, 0)
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare the heap and partitioned fact table layouts.")
+    parser.add_argument("--dsn", default=os.environ.get("DATABASE_URL", ""),
+                        help="libpq connection string (default: $DATABASE_URL / PG* env vars)")
+    parser.add_argument("--data-dir", default=gd.Config().out_dir,
+                        help="directory with the generated files (default: data/raw)")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per measurement (median)")
+    args = parser.parse_args()
+    assert args.repeat >= 1, "--repeat must be >= 1"
+
+    with connect(args.dsn) as conn:
+        results = {layout: run_layout(conn, args.data_dir, partitioned, args.repeat)
+                   for layout, partitioned in LAYOUTS}
+
+    names: List[str] = list(results["heap"])
+    width = max(len(name) for name in names)
+    print(f"{'':<{width}}  {'heap (s)':>10}  {'partitioned (s)':>15}  {'speedup':>8}  "
+          f"{'tables':>9}  {'pages (heap / partitioned)':>26}")
+    for name in names:
+        (heap_s, heap_t, heap_p), (part_s, part_t, part_p) = results["heap"][name], results["partitioned"][name]
+        scans = f"{f'{heap_t} / {part_t}':>9}  {f'{heap_p:,} / {part_p:,}':>26}" if heap_t else ""
+        print(f"{name:<{width}}  {heap_s:>10.3f}  {part_s:>15.3f}  {heap_s / part_s:>7.1f}x  {scans}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,350 @@
+"""
+Benchmark por etapas del pipeline a distintas escalas (cantidad de customers).
+
+Para cada escala, en un proceso nuevo (la memoria de una escala no afecta a la siguiente):
+
+1. Genera shard por shard como generate_streaming, midiendo por separado
+   generate_customers / generate_subscriptions / generate_transactions, los costos
+   y la escritura (write_csv o write_arrow según --format).
+2. Lee los archivos con el motor de KPIs (src.analytics.kpis) y mide cada KPI.
+3. Con --dsn, carga los archivos con src.etl.load_postgres y mide cada vista de
+   sql/04_views y cada query de sql/03_kpis (ATENCIÓN: vacía el schema analytics).
+
+Por etapa registra tiempo de pared, filas y filas/segundo (filas emitidas en la
+generación y escritura, filas de entrada en KPIs y SQL) y RSS pico del proceso durante
+la etapa (en Linux se resetea el pico antes de cada etapa; las etapas SQL corren en el
+servidor y no lo reportan). El resultado va a un JSON; con --baseline se compara contra
+una corrida guardada y el proceso termina con código 1 si alguna etapa empeoró más
+de --tolerance.
+
+Uso (desde la raíz del repo):
+    python -m src.benchmarks.scaling --scales 8000,100000
+    python -m src.benchmarks.scaling --scales 8000,100000,1000000 --format parquet --update-baseline
+    python -m src.benchmarks.scaling --scales 8000,100000 --dsn postgresql://user@localhost/db
+"""
+from __future__ import annotations
+
+import argparse
+import datetime as dt
+import json
+import multiprocessing
+import os
+import platform
+import re
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import replace
+from typing import Any, Callable, Dict, List, Optional
+
+import pandas as pd
+
+from src.analytics import kpis
+from src.data_generation import dtypes, generate_data as gd
+from src.data_generation.profiling import peak_rss_mb, reset_peak_rss
+
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+SQL_QUERY_DIRS = (os.path.join(REPO_ROOT, "sql", "04_views"), os.path.join(REPO_ROOT, "sql", "03_kpis"))
+
+DEFAULT_OUTPUT = os.path.join("data", "benchmarks", "results.json")
+DEFAULT_BASELINE = os.path.join("data", "benchmarks", "baseline.json")
+
+# diferencias menores no cuentan como regresión (ruido de timers en etapas de ms)
+MIN_REGRESSION_SECONDS = 0.05
+MIN_REGRESSION_RSS_MB = 16.0
+
+
+# -----------------------------
+# Medición
+# -----------------------------
+class StageStats:
+    """Acumula tiempo, filas y RSS pico por etapa (una etapa puede correr una vez por shard)."""
+
+    def __init__(self) -> None:
+        self.stages: Dict[str, dict] = {}
+        self.errors: Dict[str, str] = {}
+
+    def measure(
+        self,
+        stage: str,
+        fn: Callable,
+        *args,
+        rows: Callable[[Any], int] = len,
+        memory: bool = True,
+        **kwargs
+    ):
+        if memory:
+            reset_peak_rss()
+        start = time.perf_counter()
+        result = fn(*args, **kwargs)
+        seconds = time.perf_counter() - start
+
+        entry = self.stages.setdefault(stage, {"seconds": 0.0, "rows": 0, "peak_rss_mb": None})
+        entry["seconds"] += seconds
+        entry["rows"] += rows(result)
+        if memory:
+            entry["peak_rss_mb"] = max(entry["peak_rss_mb"] or 0.0, peak_rss_mb())
+        return result
+
+    def fail(self, stage: str, error: Exception) -> None:
+        self.errors[stage] = f"{type(error).__name__}: {str(error).splitlines()[0]}"
+
+    def records(self, scale: int) -> List[dict]:
+        failed = [
+            {"scale": scale, "stage": stage, "seconds": None, "rows": 0, "rows_per_sec": None,
+             "peak_rss_mb": None, "error": error}
+            for stage, error in self.errors.items()
+        ]
+        return [
+            {
+                "scale": scale,
+                "stage": stage,
+                "seconds": round(entry["seconds"], 4),
+                "rows": entry["rows"],
+                "rows_per_sec": round(entry["rows"] / entry["seconds"]) if entry["seconds"] > 0 else None,
+                "peak_rss_mb": None if entry["peak_rss_mb"] is None else round(entry["peak_rss_mb"], 1),
+            }
+            for stage, entry in self.stages.items()
+        ] + failed
+
+
+# -----------------------------
+# Etapas
+# -----------------------------
+def _bench_generation(stats: StageStats, cfg: gd.Config) -> None:
+    """Mismo recorrido que gd.generate_streaming (un proceso), con cada etapa medida."""
+    write = f"write_{'csv' if cfg.output_format == 'csv' else 'arrow'}"
+
+    def write_table(df: pd.DataFrame, name: str, part: Optional[int] = None) -> None:
+        stats.measure(write, gd.write_table, cfg, df, name, part=part, rows=lambda _: len(df))
+
+    plans = gd.generate_plans(cfg)
+    write_table(stats.measure("generate_date_dim", gd.generate_date_dim, cfg), "date_dim")
+    write_table(plans, "plans")
+
+    n_subscriptions = n_transactions = 0
+    monthly_revenue = pd.Series(dtype="int64")
+    for shard_index, first_id, n_customers in gd.iter_customer_shards(cfg):
+        rng = gd.make_rng(cfg.seed, gd.SHARD_STREAM, shard_index)
+        customers = stats.measure(
+            "generate_customers", gd.generate_customers,
+            cfg, rng, first_id=first_id, n=n_customers, check_distribution=False
+        )
+        subscriptions = stats.measure(
+            "generate_subscriptions", gd.generate_subscriptions,
+            cfg, customers=customers, plans=plans, rng=rng, check_distribution=False
+        )
+        transactions = stats.measure(
+            "generate_transactions", gd.generate_transactions,
+            cfg, subscriptions=subscriptions, plans=plans, rng=rng, check_distribution=False
+        )
+        dtypes.offset_ids(subscriptions, "subscription_id", n_subscriptions)
+        dtypes.offset_ids(transactions, "subscription_id", n_subscriptions)
+        dtypes.offset_ids(transactions, "transaction_id", n_transactions)
+        n_subscriptions += len(subscriptions)
+        n_transactions += len(transactions)
+
+        for name, df in (("customers", customers), ("subscriptions", subscriptions), ("transactions", transactions)):
+            write_table(df, name, shard_index)
+        shard_revenue = stats.measure("generate_costs", gd.monthly_net_revenue, transactions, rows=lambda _: 0)
+        monthly_revenue = gd.add_monthly_revenue(monthly_revenue, shard_revenue)
+
+    costs = stats.measure(
+        "generate_costs", gd.generate_costs_from_revenue,
+        cfg, monthly_revenue, gd.make_rng(cfg.seed, gd.COSTS_STREAM)
+    )
+    write_table(costs, "costs")
+
+
+def _bench_kpis(stats: StageStats, data_dir: str) -> None:
+    tables = stats.measure(
+        "kpis.load_tables", kpis.load_tables, data_dir, rows=lambda t: sum(len(df) for df in t.values())
+    )
+    inputs = dict(tables, transactions=stats.measure(
+        "kpis.completed_transactions", kpis.completed_transactions, tables["transactions"],
+        rows=lambda _: len(tables["transactions"])
+    ))
+    for name, (kpi, args) in kpis.KPIS.items():
+        stats.measure(
+            f"kpis.{name}", kpi, *(inputs[t] for t in args),
+            rows=lambda _: sum(len(tables[t]) for t in args)
+        )
+
+
+def _select_sql(path: str) -> str:
+    """La query de un archivo de sql/03_kpis o sql/04_views, sin header, SET ni CREATE VIEW."""
+    with open(path, encoding="utf-8") as f:
+        sql = re.sub(r"/\*.*?\*/", "", f.read(), flags=re.S)
+    sql = re.sub(r"SET\s+search_path\s+TO\s+\w+\s*;", "", sql, flags=re.I)
+    sql = re.sub(r"CREATE\s+OR\s+REPLACE\s+VIEW\s+\w+\s+AS", "", sql, flags=re.I)
+    return sql.strip().rstrip(";")
+
+
+def _bench_sql(stats: StageStats, dsn: str, data_dir: str) -> None:
+    import psycopg
+
+    from src.etl.load_postgres import SCHEMA, bulk_load, connect
+
+    with connect(dsn) as conn:
+        counts = stats.measure(
+            "sql.bulk_load", bulk_load, conn, data_dir=data_dir, rows=lambda c: sum(c.values()), memory=False
+        )
+        conn.execute(f"SET search_path TO {SCHEMA}")
+        for directory in SQL_QUERY_DIRS:
+            for name in sorted(f for f in os.listdir(directory) if f.endswith(".sql")):
+                stage, query = f"sql.{os.path.splitext(name)[0]}", _select_sql(os.path.join(directory, name))
+                try:
+                    stats.measure(
+                        stage, lambda: conn.execute(query).fetchall(),
+                        rows=lambda _: counts["fact_transactions"], memory=False
+                    )
+                except psycopg.Error as exc:
+                    # una query rota no invalida el resto de la corrida: queda registrada
+                    stats.fail(stage, exc)
+
+
+def run_scale(
+    n_customers: int,
+    output_format: str,
+    chunk_size: int,
+    work_dir: str,
+    dsn: Optional[str] = None
+) -> List[dict]:
+    """Corre todas las etapas para n_customers y devuelve un registro por etapa."""
+    out_dir = os.path.join(work_dir, f"customers_{n_customers}")
+    cfg = replace(
+        gd.Config(), n_customers=n_customers, chunk_size=chunk_size,
+        output_format=output_format, out_dir=out_dir
+    )
+    shutil.rmtree(out_dir, ignore_errors=True)
+    gd.ensure_out_dir(out_dir)
+
+    stats = StageStats()
+    try:
+        _bench_generation(stats, cfg)
+        _bench_kpis(stats, out_dir)
+        if dsn:
+            _bench_sql(stats, dsn, out_dir)
+    finally:
+        shutil.rmtree(out_dir, ignore_errors=True)
+    return stats.records(n_customers)
+
+
+# -----------------------------
+# Resultados y baseline
+# -----------------------------
+def compare(results: List[dict], baseline: List[dict], tolerance: float) -> List[str]:
+    """Etapas (misma escala) más lentas o con más RSS pico que el baseline, más allá de tolerance."""
+    base = {(r["scale"], r["stage"]): r for r in baseline}
+    regressions = []
+    for r in results:
+        b = base.get((r["scale"], r["stage"]))
+        if r.get("error"):
+            if b is not None and not b.get("error"):
+                regressions.append(f"{r['stage']} @ {r['scale']:,}: {r['error']}")
+            continue
+        if b is None or b.get("error"):
+            continue
+        if r["seconds"] > b["seconds"] * (1 + tolerance) and r["seconds"] - b["seconds"] > MIN_REGRESSION_SECONDS:
+            regressions.append(f"{r['stage']} @ {r['scale']:,}: {b['seconds']:.3f}s -> {r['seconds']:.3f}s")
+        if (
+            r["peak_rss_mb"] is not None and b["peak_rss_mb"] is not None
+            and r["peak_rss_mb"] > b["peak_rss_mb"] * (1 + tolerance)
+            and r["peak_rss_mb"] - b["peak_rss_mb"] > MIN_REGRESSION_RSS_MB
+        ):
+            regressions.append(
+                f"{r['stage']} @ {r['scale']:,}: peak RSS {b['peak_rss_mb']:.0f} MB -> {r['peak_rss_mb']:.0f} MB"
+            )
+    return regressions
+
+
+def _write_json(path: str, payload: dict) -> None:
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(payload, f, indent=2)
+        f.write("\n")
+
+
+def _print_results(results: List[dict], baseline: List[dict]) -> None:
+    base = {(r["scale"], r["stage"]): r for r in baseline}
+    width = max(len(r["stage"]) for r in results)
+    print(f"{'scale':>10}  {'stage':<{width}}  {'seconds':>9}  {'rows/s':>12}  {'peak MB':>8}  {'vs baseline':>11}")
+    for r in results:
+        if r.get("error"):
+            print(f"{r['scale']:>10,}  {r['stage']:<{width}}  failed: {r['error']}")
+            continue
+        b = base.get((r["scale"], r["stage"]))
+        ratio = f"{r['seconds'] / b['seconds']:.2f}x" if b and b["seconds"] else ""
+        rate = f"{r['rows_per_sec']:,}" if r["rows_per_sec"] is not None else ""
+        peak = f"{r['peak_rss_mb']:.0f}" if r["peak_rss_mb"] is not None else ""
+        print(f"{r['scale']:>10,}  {r['stage']:<{width}}  {r['seconds']:>9.3f}  {rate:>12}  {peak:>8}  {ratio:>11}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark each pipeline stage at several data scales.")
+    parser.add_argument("--scales", default="8000,100000",
+                        help="comma-separated customer counts (default: 8000,100000)")
+    parser.add_argument("--format", default="csv", choices=gd.OUTPUT_FORMATS, help="output format to write and read")
+    parser.add_argument("--chunk-size", type=int, default=100_000,
+                        help="customers per shard (0 = one shard; default: 100000)")
+    parser.add_argument("--work-dir", default=None, help="scratch directory for generated files (default: a temp dir)")
+    parser.add_argument("--dsn", default=None,
+                        help="also load into PostgreSQL and time every SQL view / KPI query (empties the analytics schema)")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help=f"results file (default: {DEFAULT_OUTPUT})")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help=f"baseline file (default: {DEFAULT_BASELINE})")
+    parser.add_argument("--update-baseline", action="store_true", help="store these results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="relative slowdown / memory growth reported as a regression (default: 0.25)")
+    args = parser.parse_args()
+
+    scales = [int(s) for s in args.scales.split(",")]
+    assert all(n > 0 for n in scales), "--scales must be positive customer counts"
+
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="subscription-analytics-bench-")
+    results: List[dict] = []
+    try:
+        for n_customers in scales:
+            # un proceso por escala: RSS pico y caches no se arrastran entre escalas
+            with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+                results += pool.submit(run_scale, n_customers, args.format, args.chunk_size, work_dir, args.dsn).result()
+    finally:
+        if args.work_dir is None:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    payload = {
+        "created_at": dt.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "format": args.format,
+        "chunk_size": args.chunk_size,
+        "results": results,
+    }
+    _write_json(args.output, payload)
+
+    baseline: List[dict] = []
+    if os.path.exists(args.baseline) and not args.update_baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+
+    _print_results(results, baseline)
+    print(f"\nResults: {args.output}")
+    if args.update_baseline:
+        _write_json(args.baseline, payload)
+        print(f"Baseline updated: {args.baseline}")
+        return
+
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) against {args.baseline}:")
+        for line in regressions:
+            print(f"- {line}")
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""
+Kernel de calendario vectorizado sobre arrays datetime64[D] e índices de mes.
+
+Índice de mes = meses desde 1970-01 como entero (np.datetime64(..., "M")), el
+equivalente de DATE_TRUNC('month', ...). Las conversiones día -> mes y mes -> día con
+astype pasan por el calendario elemento a elemento; acá se hacen una vez por día (o
+mes) distinto del rango, con una tabla de lookup, y el resto es aritmética entera.
+Con rangos enormes (o NaT) se usa astype directamente.
+
+Lo usan el generador (períodos de facturación, cancelaciones, campañas) y el motor
+de KPIs en proceso (meses de pago y de período).
+"""
+from __future__ import annotations
+
+from typing import Callable, Optional, Tuple
+
+import numpy as np
+
+
+# campañas en Q1 (ene-mar) y Q4 (oct-dic)
+CAMPAIGN_MONTHS = (1, 2, 3, 10, 11, 12)
+
+# rangos más anchos que esto (en días o meses) no usan tabla de lookup
+LOOKUP_MAX_SPAN = 1 << 20
+
+
+def _by_value(values: np.ndarray, table: Callable[[np.ndarray], np.ndarray], direct: Callable) -> np.ndarray:
+    """table(v) para cada valor entero de values, calculado una vez por valor del rango [min, max]."""
+    if len(values) == 0:
+        return direct(values)
+    lo, hi = int(values.min()), int(values.max())
+    if hi - lo >= LOOKUP_MAX_SPAN:
+        return direct(values)
+    return table(np.arange(lo, hi + 1))[values - lo]
+
+
+def to_days(values) -> np.ndarray:
+    """Fechas (Series, DatetimeIndex o array datetime64) como datetime64[D]."""
+    if hasattr(values, "to_numpy"):
+        values = values.to_numpy()
+    return np.asarray(values).astype("datetime64[D]", copy=False)
+
+
+def month_index(days) -> np.ndarray:
+    """Índice de mes de cada fecha."""
+    days = to_days(days).astype(np.int64)
+    to_month = lambda d: d.astype("datetime64[D]").astype("datetime64[M]").astype(np.int64)
+    return _by_value(days, to_month, to_month)
+
+
+def month_days(months: np.ndarray) -> np.ndarray:
+    """Primer día (datetime64[D]) de cada índice de mes."""
+    months = np.asarray(months, dtype=np.int64)
+    to_day = lambda m: m.astype("datetime64[M]").astype("datetime64[D]")
+    return _by_value(months, to_day, to_day)
+
+
+def days_in_month(months: np.ndarray) -> np.ndarray:
+    months = np.asarray(months, dtype=np.int64)
+    return (month_days(months + 1) - month_days(months)).astype(np.int64)
+
+
+def month_start(d: np.ndarray) -> np.ndarray:
+    return month_days(month_index(d))
+
+
+def next_month_start(d: np.ndarray) -> np.ndarray:
+    """Primer día del mes siguiente."""
+    return month_days(month_index(d) + 1)
+
+
+def add_months(d: np.ndarray, months) -> np.ndarray:
+    """
+    Suma meses a un array datetime64[D] recortando al último día del mes,
+    igual que pd.DateOffset(months=n) (ej: 2024-01-31 + 1 mes = 2024-02-29).
+    """
+    d = to_days(d)
+    month = month_index(d)
+    day = (d - month_days(month)).astype(np.int64)
+    target = month + months
+    return month_days(target) + np.minimum(day, days_in_month(target) - 1).astype("timedelta64[D]")
+
+
+def add_year(d: np.ndarray) -> np.ndarray:
+    return add_months(d, 12)
+
+
+def month_of_year(d: np.ndarray) -> np.ndarray:
+    """1..12"""
+    return month_index(d) % 12 + 1
+
+
+def is_campaign_month(d: np.ndarray, campaign_months: Tuple[int, ...] = CAMPAIGN_MONTHS) -> np.ndarray:
+    campaign = np.zeros(12, dtype=bool)
+    campaign[np.asarray(campaign_months) - 1] = True
+    return campaign[month_index(d) % 12]
+
+
+# -----------------------------
+# Períodos de facturación
+# -----------------------------
+def billing_periods(
+    start: np.ndarray,
+    horizon: np.ndarray,
+    is_monthly: np.ndarray,
+    range_start: np.datetime64,
+    since: Optional[np.datetime64] = None
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Expande cada suscripción (start, horizon = último día facturable) en sus períodos
+    de facturación, sin loops por fila. Devuelve (row, period_start, period_end) con
+    una entrada por período, ordenadas por fila y luego cronológicamente.
+
+    - monthly: un período por mes calendario, desde el primer inicio de mes >= start
+      hasta el mes que contiene horizon.
+    - yearly: un pago en start (si start está en [range_start, horizon]) y uno por
+      cada aniversario <= horizon.
+
+    Con since sólo se emiten los períodos con pago posterior a since.
+    """
+    start = to_days(start)
+    horizon = to_days(horizon)
+    start_m = month_index(start)
+    horizon_m = month_index(horizon)
+
+    # monthly: el período arranca el 1ro del mes; si la suscripción empieza a mitad de mes, el siguiente
+    first_m = start_m + (month_days(start_m) < start)
+
+    # yearly: aniversarios k_min <= k <= k_max con start + k años <= horizon
+    k_min = np.zeros(len(start), dtype=np.int64)
+    k_max = (horizon_m - start_m) // 12
+    k_max -= add_months(start, 12 * k_max) > horizon
+
+    if since is not None:
+        since_m = np.datetime64(since, "M").astype(np.int64)
+        # el primer inicio de mes posterior a since es el del mes siguiente
+        first_m = np.maximum(first_m, since_m + 1)
+        k_min = np.maximum((since_m - start_m) // 12, 0)
+        k_min += add_months(start, 12 * k_min) <= np.datetime64(since, "D")
+
+    n_monthly = np.maximum(horizon_m - first_m + 1, 0)
+    n_yearly = np.where(
+        (start >= np.datetime64(range_start, "D")) & (start <= horizon), np.maximum(k_max - k_min + 1, 0), 0
+    )
+
+    n_periods = np.where(is_monthly, n_monthly, n_yearly)
+    row = np.repeat(np.arange(len(start)), n_periods)
+    # posición de cada período dentro de su fila (0, 1, 2, ...)
+    k = np.arange(len(row)) - np.repeat(np.cumsum(n_periods) - n_periods, n_periods)
+
+    # cada ciclo sólo sobre sus propios períodos
+    period_start = np.empty(len(row), dtype="datetime64[D]")
+    next_start = np.empty(len(row), dtype="datetime64[D]")
+    monthly = np.flatnonzero(is_monthly[row])
+    month = first_m[row[monthly]] + k[monthly]
+    period_start[monthly] = month_days(month)
+    next_start[monthly] = month_days(month + 1)
+    yearly = np.flatnonzero(~is_monthly[row])
+    period_start[yearly] = add_months(start[row[yearly]], 12 * (k_min[row[yearly]] + k[yearly]))
+    next_start[yearly] = add_year(period_start[yearly])
+    return row, period_start, next_start - np.timedelta64(1, "D")
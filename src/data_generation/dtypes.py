@@ -0,0 +1,78 @@
+"""
+Tipos compactos de las tablas generadas en memoria.
+
+- Columnas de baja cardinalidad (status, billing_cycle, payment_method, country, ...):
+  pd.Categorical armado directo desde los códigos sorteados (int8), sin pasar por strings.
+- IDs: el entero más chico que alcanza (int32 salvo que el rango no entre); plan_id int16.
+- Dinero: centavos enteros (MONEY_COLUMNS); redondear a centavos es exacto y las sumas
+  (net revenue mensual) no acumulan error de punto flotante.
+- Fechas: datetime64[s] (pandas no tiene datetime64[D]); date32 en parquet/feather.
+
+La conversión al esquema de los CSV / tablas SQL (dinero en float con 2 decimales) se
+hace sólo al escribir, con to_output; categóricas, enteros y fechas se escriben igual.
+"""
+from __future__ import annotations
+
+from typing import Sequence
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import is_integer_dtype
+
+
+# columna -> dtype en centavos (los montos de costos mensuales pueden superar int32)
+MONEY_COLUMNS = {
+    "gross_amount": np.int32,
+    "discount_amount": np.int32,
+    "net_revenue": np.int32,
+    "amount": np.int64,
+}
+
+PLAN_ID_DTYPE = np.int16
+DATE_DTYPE = "datetime64[s]"
+
+_INT32_MAX = np.iinfo(np.int32).max
+
+
+def id_dtype(max_id: int) -> np.dtype:
+    return np.dtype(np.int32) if max_id <= _INT32_MAX else np.dtype(np.int64)
+
+
+def ids(first_id: int, n: int) -> np.ndarray:
+    """first_id, first_id + 1, ..., en el dtype más chico que alcanza."""
+    return np.arange(first_id, first_id + n, dtype=id_dtype(first_id + n - 1))
+
+
+def offset_ids(df: pd.DataFrame, column: str, offset: int) -> None:
+    """df[column] += offset in-place; pasa a int64 sólo si el resultado no entra en el dtype."""
+    if not len(df) or not offset:
+        return
+    if int(df[column].max()) + offset > np.iinfo(df[column].dtype).max:
+        df[column] = df[column].astype(np.int64)
+    df[column] += offset
+
+
+def categorical(codes: np.ndarray, categories: Sequence[str]) -> pd.Categorical:
+    """Categorical desde códigos (índices en categories; -1 = nulo)."""
+    return pd.Categorical.from_codes(codes, categories=list(categories))
+
+
+def cents(amounts: np.ndarray, dtype=np.int64) -> np.ndarray:
+    """Montos en float -> centavos enteros (redondeo al centavo más cercano)."""
+    return np.rint(np.asarray(amounts, dtype=float) * 100).astype(dtype)
+
+
+def dollars(amounts: np.ndarray) -> np.ndarray:
+    """Centavos enteros -> float; los montos que ya son float quedan igual."""
+    return amounts / 100 if is_integer_dtype(amounts.dtype) else amounts
+
+
+def to_output(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    df con el dinero de vuelta en float (el esquema de los archivos y de las tablas SQL).
+    No copia las demás columnas; si no hay centavos, devuelve df tal cual.
+    """
+    money = [c for c in df.columns if c in MONEY_COLUMNS and is_integer_dtype(df[c].dtype)]
+    if not money:
+        return df
+    return df.assign(**{c: dollars(df[c].to_numpy()) for c in money})
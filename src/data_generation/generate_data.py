@@ -1,12 +1,19 @@
 from __future__ import annotations
 
+import argparse
+import json
 import os
-import random
-from dataclasses import dataclass
-from typing import Tuple
+import shutil
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field, fields, replace
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
 
 import numpy as np
 import pandas as pd
+from pandas.api.types import is_integer_dtype
+
+from src.data_generation import calendar, dtypes, profiling, validation
 
 
 # -----------------------------
@@ -19,6 +26,124 @@ class Config:
     n_customers: int = 8000
     seed: int = 42
     out_dir: str = os.path.join("data", "raw")
+    # modo streaming: customers -> subscriptions -> transactions por bloques (shards) de
+    # customer_id (0 = un único shard con todo en memoria)
+    chunk_size: int = 0
+    # procesos para generar shards en paralelo; no cambia el output (sí lo hace chunk_size)
+    n_workers: int = 1
+    # "csv", "parquet" o "feather" (Arrow IPC); los dos últimos requieren pyarrow
+    output_format: str = "csv"
+    # distribuciones y tasas (por defecto, las constantes de más abajo)
+    plan_defs: Tuple[tuple, ...] = field(default_factory=lambda: tuple(PLAN_DEFS))
+    tier_dist: Dict[str, float] = field(default_factory=lambda: dict(TIER_DIST))
+    acquisition_channel_dist: Dict[str, float] = field(default_factory=lambda: dict(ACQUISITION_CHANNEL_DIST))
+    country_dist: Dict[str, float] = field(default_factory=lambda: dict(COUNTRY_DIST))
+    cancellation_reason_dist: Dict[str, float] = field(default_factory=lambda: dict(CANCELLATION_REASON_DIST))
+    billing_cycle_dist: Dict[str, float] = field(default_factory=lambda: dict(BILLING_CYCLE_DIST))
+    subscriptions_per_customer_dist: Dict[int, float] = field(
+        default_factory=lambda: dict(SUBSCRIPTIONS_PER_CUSTOMER_DIST)
+    )
+    payment_method_dist: Dict[str, float] = field(default_factory=lambda: dict(PAYMENT_METHOD_DIST))
+    churn_prob: float = field(default_factory=lambda: CHURN_PROB)
+    failed_rate: float = field(default_factory=lambda: FAILED_RATE)
+    # probabilidad base de descuento por pago (mensual / anual), antes del sesgo por campañas
+    discount_txn_rate: float = field(default_factory=lambda: DISCOUNT_TXN_RATE)
+    yearly_discount_txn_rate: float = field(default_factory=lambda: YEARLY_DISCOUNT_TXN_RATE)
+    # validaciones: "off", "sampled" (chequeos por fila sobre una muestra) o "full"
+    validation: str = "full"
+    validation_sample_rows: int = 100_000
+    # "static" (generate_subscriptions / generate_transactions) o "simulation" (simulation.py:
+    # ciclo de vida mes a mes con cambios de plan, dunning y reactivaciones)
+    model: str = "static"
+    # parámetros de la simulación (y monthly_churn_hazard de la carga incremental)
+    monthly_churn_hazard: float = field(default_factory=lambda: MONTHLY_CHURN_HAZARD)
+    early_churn_months: int = 3
+    early_churn_multiplier: float = 2.0
+    yearly_renewal_churn: float = 0.25
+    upgrade_rate: float = 0.010
+    downgrade_rate: float = 0.005
+    # días después del cobro fallido en que se reintenta; failed_rate es la del primer intento
+    retry_days: Tuple[int, ...] = (3, 7, 14)
+    retry_failure_prob: float = 0.5
+    reactivation_prob: float = 0.25
+    reactivation_months_mean: float = 6.0
+
+
+# valores permitidos por los CHECK de sql/01_schema/02_create_tables.sql
+ALLOWED_VALUES = {
+    "tier_dist": {"basic", "pro", "premium"},
+    "acquisition_channel_dist": {"organic", "paid", "referral", "other"},
+    "cancellation_reason_dist": {"price", "competitor", "features", "other"},
+    "billing_cycle_dist": {"monthly", "yearly"},
+    "payment_method_dist": {"card", "transfer", "wallet"},
+}
+# generate_subscriptions mapea tiers y el ciclo anual a estos planes por nombre
+REQUIRED_PLAN_NAMES = {"Basic", "Pro", "Premium", "Pro Year"}
+
+MODELS = ("static", "simulation")
+
+
+def validate_config(cfg: Config) -> None:
+    assert cfg.output_format in OUTPUT_FORMATS, f"Unknown output_format: {cfg.output_format}"
+    assert pd.Timestamp(cfg.start_date) <= pd.Timestamp(cfg.end_date), "start_date must be <= end_date"
+    assert cfg.n_customers > 0, "n_customers must be positive"
+    assert cfg.chunk_size >= 0 and cfg.n_workers >= 1, "chunk_size must be >= 0 and n_workers >= 1"
+    assert 0 <= cfg.churn_prob <= 1 and 0 <= cfg.failed_rate <= 1, "churn_prob / failed_rate must be in [0, 1]"
+    assert cfg.validation in validation.LEVELS, f"validation must be one of {', '.join(validation.LEVELS)}"
+    assert cfg.validation_sample_rows > 0, "validation_sample_rows must be positive"
+    assert cfg.model in MODELS, f"model must be one of {', '.join(MODELS)}"
+    for name in ("discount_txn_rate", "yearly_discount_txn_rate", "monthly_churn_hazard", "yearly_renewal_churn",
+                 "upgrade_rate", "downgrade_rate", "retry_failure_prob", "reactivation_prob"):
+        assert 0 <= getattr(cfg, name) <= 1, f"{name} must be in [0, 1]"
+    assert cfg.upgrade_rate + cfg.downgrade_rate <= 1, "upgrade_rate + downgrade_rate must be <= 1"
+    assert cfg.early_churn_months >= 0 and cfg.early_churn_multiplier * cfg.monthly_churn_hazard <= 1, \
+        "early churn hazard must be in [0, 1]"
+    assert all(d > 0 for d in cfg.retry_days) and list(cfg.retry_days) == sorted(set(cfg.retry_days)), \
+        "retry_days must be positive and strictly increasing"
+    assert cfg.reactivation_months_mean >= 1, "reactivation_months_mean must be >= 1"
+
+    for f in fields(Config):
+        if f.name.endswith("_dist"):
+            dist = getattr(cfg, f.name)
+            assert dist and all(p >= 0 for p in dist.values()), f"{f.name}: probabilities must be >= 0"
+            assert np.isclose(sum(dist.values()), 1.0), f"{f.name}: probabilities must sum to 1"
+            allowed = ALLOWED_VALUES.get(f.name)
+            assert allowed is None or set(dist) <= allowed, f"{f.name}: values must be in {sorted(allowed)}"
+
+    plans = pd.DataFrame(list(cfg.plan_defs), columns=PLAN_COLUMNS)
+    assert REQUIRED_PLAN_NAMES <= set(plans["plan_name"]), f"plan_defs must include {sorted(REQUIRED_PLAN_NAMES)}"
+    assert set(cfg.subscriptions_per_customer_dist) <= {1, 2}, "subscriptions_per_customer_dist: 1 or 2 only"
+
+
+def config_from_dict(values: dict, base: Optional[Config] = None) -> Config:
+    """
+    Config con los valores de un dict (ej: JSON) sobre base (default: Config()).
+    plan_defs acepta listas o dicts con las columnas de dim_plans; las claves de
+    subscriptions_per_customer_dist llegan como strings en JSON; retry_days como lista.
+    """
+    names = {f.name for f in fields(Config)}
+    unknown = set(values) - names
+    assert not unknown, f"Unknown config keys: {sorted(unknown)}"
+
+    values = dict(values)
+    if "plan_defs" in values:
+        values["plan_defs"] = tuple(
+            tuple(p[c] for c in PLAN_COLUMNS) if isinstance(p, dict) else tuple(p)
+            for p in values["plan_defs"]
+        )
+    if "subscriptions_per_customer_dist" in values:
+        values["subscriptions_per_customer_dist"] = {
+            int(k): v for k, v in values["subscriptions_per_customer_dist"].items()
+        }
+    if "retry_days" in values:
+        values["retry_days"] = tuple(values["retry_days"])
+    return replace(base or Config(), **values)
+
+
+def load_config(path: str, base: Optional[Config] = None) -> Config:
+    """Config desde un archivo JSON con cualquier subconjunto de los campos de Config."""
+    with open(path, encoding="utf-8") as f:
+        return config_from_dict(json.load(f), base=base)
 
 
 PLAN_DEFS = [
@@ -50,9 +175,20 @@ COUNTRY_DIST = {
 }
 
 
-def set_seeds(seed: int) -> None:
-    np.random.seed(seed)
-    random.seed(seed)
+# streams de aleatoriedad independientes derivados de Config.seed
+SHARD_STREAM = 0
+COSTS_STREAM = 1
+INCREMENTAL_STREAM = 2
+SIMULATION_STREAM = 3
+SCENARIO_STREAM = 4
+
+
+def make_rng(seed: int, *key: int) -> np.random.Generator:
+    """
+    Generator independiente derivado de seed vía SeedSequence; key identifica el stream
+    (ej: (SHARD_STREAM, shard_index)). Mismo seed + key => misma secuencia, sin estado global.
+    """
+    return np.random.default_rng(np.random.SeedSequence(seed, spawn_key=key))
 
 
 def ensure_out_dir(path: str) -> None:
@@ -73,28 +209,25 @@ def generate_date_dim(cfg: Config) -> pd.DataFrame:
     df["quarter"] = df["date"].dt.quarter.astype(int)
     df["month_name"] = df["date"].dt.strftime("%b")
 
-    # Validations
-    assert df["date"].min() == start
-    assert df["date"].max() == end
-    assert df["date"].is_unique
-
+    validation.check_date_dim(cfg, df)
     return df
 
 
-def generate_plans() -> pd.DataFrame:
-    df = pd.DataFrame(
-        PLAN_DEFS,
-        columns=["plan_id", "plan_name", "tier", "price", "cost_per_subscription", "active_flag"]
-    )
+PLAN_COLUMNS = ["plan_id", "plan_name", "tier", "price", "cost_per_subscription", "active_flag"]
 
-    # Validations
-    assert df["plan_id"].is_unique
-    assert (df["price"] > 0).all()
-    assert set(df["tier"]).issubset({"basic", "pro", "premium"})
 
+def generate_plans(cfg: Optional[Config] = None) -> pd.DataFrame:
+    cfg = Config() if cfg is None else cfg
+    df = pd.DataFrame(list(cfg.plan_defs), columns=PLAN_COLUMNS)
+    validation.check_plans(cfg, df)
     return df
 
 
+def _sample_codes(rng: np.random.Generator, dist: Dict, n: int) -> np.ndarray:
+    """Índices (int8) en las claves de dist, sorteados con sus probabilidades."""
+    return rng.choice(len(dist), size=n, p=list(dist.values())).astype(np.int8)
+
+
 def _seasonal_weights(dates: pd.DatetimeIndex) -> np.ndarray:
     """
     Leve estacionalidad: más signups en Q1 y Q4.
@@ -107,52 +240,40 @@ def _seasonal_weights(dates: pd.DatetimeIndex) -> np.ndarray:
     return w
 
 
-def generate_customers(cfg: Config) -> pd.DataFrame:
+def generate_customers(
+    cfg: Config,
+    rng: np.random.Generator,
+    first_id: int = 1,
+    n: Optional[int] = None,
+    check_distribution: bool = True,
+    validate: bool = True
+) -> pd.DataFrame:
     start = pd.Timestamp(cfg.start_date)
     end = pd.Timestamp(cfg.end_date)
+    n = cfg.n_customers if n is None else n
 
     # IDs
-    customer_ids = np.arange(1, cfg.n_customers + 1)
+    customer_ids = dtypes.ids(first_id, n)
 
     # Signup dates with mild seasonality
     all_days = pd.date_range(start=start, end=end, freq="D")
     day_probs = _seasonal_weights(all_days)
-    signup_dates = np.random.choice(all_days, size=cfg.n_customers, replace=True, p=day_probs)
-    signup_dates = pd.to_datetime(signup_dates)
-
-    # Channels
-    channels = np.random.choice(
-        list(ACQUISITION_CHANNEL_DIST.keys()),
-        size=cfg.n_customers,
-        p=list(ACQUISITION_CHANNEL_DIST.values())
-    )
+    day_idx = rng.choice(len(all_days), size=n, replace=True, p=day_probs)
+    signup_dates = all_days.to_numpy().astype(dtypes.DATE_DTYPE)[day_idx]
 
-    # Countries
-    countries = np.random.choice(
-        list(COUNTRY_DIST.keys()),
-        size=cfg.n_customers,
-        p=list(COUNTRY_DIST.values())
-    )
+    # Channels / countries: códigos -> Categorical
+    channels = _sample_codes(rng, cfg.acquisition_channel_dist, n)
+    countries = _sample_codes(rng, cfg.country_dist, n)
 
     df = pd.DataFrame({
         "customer_id": customer_ids,
         "signup_date": signup_dates,
-        "country": countries,
-        "acquisition_channel": channels
-    }).sort_values("customer_id").reset_index(drop=True)
-
-    # Validations (las que pediste + algunas extra)
-    assert df["customer_id"].is_unique
-    assert df["signup_date"].min() >= start
-    assert df["signup_date"].max() <= end
-    assert set(df["acquisition_channel"]).issubset(set(ACQUISITION_CHANNEL_DIST.keys()))
-    assert set(df["country"]).issubset(set(COUNTRY_DIST.keys()))
-
-    # Quick distribution sanity (tolerancias suaves)
-    # Evita casos raros por azar; no hace falta exactitud perfecta.
-    channel_share = df["acquisition_channel"].value_counts(normalize=True)
-    assert channel_share.max() < 0.60, "Channel distribution looks too skewed; check probabilities."
+        "country": dtypes.categorical(countries, cfg.country_dist),
+        "acquisition_channel": dtypes.categorical(channels, cfg.acquisition_channel_dist)
+    })
 
+    if validate:
+        validation.check_customers(cfg, df, check_distribution=check_distribution)
     return df
 
 
@@ -175,434 +296,939 @@ SUBSCRIPTIONS_PER_CUSTOMER_DIST = {
 }
 
 
-def _sample_subscription_count(n_customers: int) -> np.ndarray:
-    return np.random.choice(
-        list(SUBSCRIPTIONS_PER_CUSTOMER_DIST.keys()),
+def _sample_subscription_count(cfg: Config, rng: np.random.Generator, n_customers: int) -> np.ndarray:
+    return rng.choice(
+        list(cfg.subscriptions_per_customer_dist.keys()),
         size=n_customers,
-        p=list(SUBSCRIPTIONS_PER_CUSTOMER_DIST.values())
+        p=list(cfg.subscriptions_per_customer_dist.values())
     )
 
 
-def _sample_cancellation_reason(n: int) -> np.ndarray:
-    return np.random.choice(
-        list(CANCELLATION_REASON_DIST.keys()),
-        size=n,
-        p=list(CANCELLATION_REASON_DIST.values())
-    )
+def _sample_cancellation_reason(cfg: Config, rng: np.random.Generator, n: int) -> np.ndarray:
+    """Códigos en cfg.cancellation_reason_dist."""
+    return _sample_codes(rng, cfg.cancellation_reason_dist, n)
 
 
-def _sample_billing_cycle(n: int) -> np.ndarray:
-    return np.random.choice(
-        list(BILLING_CYCLE_DIST.keys()),
-        size=n,
-        p=list(BILLING_CYCLE_DIST.values())
-    )
+def _sample_billing_cycle(cfg: Config, rng: np.random.Generator, n: int) -> np.ndarray:
+    """Códigos en cfg.billing_cycle_dist."""
+    return _sample_codes(rng, cfg.billing_cycle_dist, n)
+
 
+def _billing_cycle_code(cfg: Config, cycle: str) -> int:
+    """Código de cycle en cfg.billing_cycle_dist; -1 si la distribución no lo incluye (ej: sólo anual)."""
+    return list(cfg.billing_cycle_dist).index(cycle) if cycle in cfg.billing_cycle_dist else -1
 
-def _sample_churn_duration_months(n: int) -> np.ndarray:
+
+def _sample_churn_duration_months(rng: np.random.Generator, n: int) -> np.ndarray:
     """
     Duración (en meses) para suscripciones canceladas:
     - 40%: 1–2 meses
     - 40%: 3–8 meses
     - 20%: 9–12 meses
     """
-    buckets = np.random.choice([1, 2, 3], size=n, p=[0.40, 0.40, 0.20])
-    out = np.empty(n, dtype=int)
-    for i, b in enumerate(buckets):
-        if b == 1:
-            out[i] = np.random.randint(1, 3)      # 1-2
-        elif b == 2:
-            out[i] = np.random.randint(3, 9)      # 3-8
-        else:
-            out[i] = np.random.randint(9, 13)     # 9-12
-    return out
+    buckets = rng.choice(3, size=n, p=[0.40, 0.40, 0.20])
+    low = np.array([1, 3, 9])[buckets]
+    high = np.array([3, 9, 13])[buckets]   # exclusivo: 1-2, 3-8, 9-12
+    return rng.integers(low, high)
 
 
-def generate_subscriptions(cfg: Config, customers: pd.DataFrame, plans: pd.DataFrame) -> pd.DataFrame:
-    start = pd.Timestamp(cfg.start_date)
-    end = pd.Timestamp(cfg.end_date)
+CHURN_PROB = 0.35  # churn target global ~35%
+
+# categorías de status (el código es el flag canceled)
+SUBSCRIPTION_STATUSES = ("active", "canceled")
+
+
+def _sample_subscription_terms(
+    cfg: Config,
+    rng: np.random.Generator,
+    sub_start: np.ndarray,
+    end: np.datetime64,
+    monthly_plan_ids: np.ndarray,
+    plan_id_pro_year: int
+) -> dict:
+    """
+    Sortea plan, ciclo, status, end_date y motivo de cancelación para un lote
+    de suscripciones con start_date ya definido. Las categóricas salen como códigos
+    (status, billing_cycle, cancellation_reason; -1 = sin motivo).
+    """
+    n = len(sub_start)
+    billing_cycle = _sample_billing_cycle(cfg, rng, n)
+    is_monthly = billing_cycle == _billing_cycle_code(cfg, "monthly")
+
+    # mensual: tier mix -> plan_id; anual: lo simplificamos a Pro Year (realista y manejable)
+    tier_idx = rng.choice(len(cfg.tier_dist), size=n, p=list(cfg.tier_dist.values()))
+    plan_id = np.where(is_monthly, monthly_plan_ids[tier_idx], plan_id_pro_year).astype(dtypes.PLAN_ID_DTYPE)
+
+    canceled = rng.random(n) < cfg.churn_prob
+    n_canceled = int(canceled.sum())
+
+    sub_end = np.full(n, np.datetime64("NaT"), dtype="datetime64[D]")
+    canceled_start = sub_start[canceled]
+    canceled_end = calendar.add_months(canceled_start, _sample_churn_duration_months(rng, n_canceled))
+    # recortar al rango máximo
+    canceled_end = np.minimum(canceled_end, end)
+    # si la cancelación quedara antes del inicio por recortes raros, corregimos
+    too_early = canceled_end <= canceled_start
+    canceled_end[too_early] = calendar.add_months(canceled_start[too_early], 1)
+    sub_end[canceled] = canceled_end
+
+    cancellation_reason = np.full(n, -1, dtype=np.int8)
+    cancellation_reason[canceled] = _sample_cancellation_reason(cfg, rng, n_canceled)
+
+    return {
+        "plan_id": plan_id,
+        "start_date": sub_start,
+        "end_date": sub_end,
+        "status": canceled.astype(np.int8),
+        "billing_cycle": billing_cycle,
+        "cancellation_reason": cancellation_reason
+    }
 
-    customer_ids = customers["customer_id"].to_numpy()
-    subs_counts = _sample_subscription_count(len(customer_ids))
 
-    # Plan selection: tier mix (basic/pro/premium) y luego mapeo a plan_id
-    # Nota: plan anual "Pro Year" lo dejamos como opción cuando billing_cycle = yearly.
+def _subscription_plan_ids(cfg: Config, plans: pd.DataFrame) -> Tuple[np.ndarray, int]:
+    """
+    Plan selection: tier mix (basic/pro/premium) y luego mapeo a plan_id.
+    Devuelve (plan_id mensual de cada tier de cfg.tier_dist, plan_id de "Pro Year");
+    el plan anual "Pro Year" es la opción cuando billing_cycle = yearly.
+    """
     plan_map_monthly = {
         "basic": int(plans.loc[plans["plan_name"] == "Basic", "plan_id"].iloc[0]),
         "pro": int(plans.loc[plans["plan_name"] == "Pro", "plan_id"].iloc[0]),
         "premium": int(plans.loc[plans["plan_name"] == "Premium", "plan_id"].iloc[0]),
     }
+    monthly_plan_ids = np.array([plan_map_monthly[tier] for tier in cfg.tier_dist])
     plan_id_pro_year = int(plans.loc[plans["plan_name"] == "Pro Year", "plan_id"].iloc[0])
+    return monthly_plan_ids, plan_id_pro_year
+
+
+def generate_subscriptions(
+    cfg: Config,
+    customers: pd.DataFrame,
+    plans: pd.DataFrame,
+    rng: np.random.Generator,
+    first_id: int = 1,
+    check_distribution: bool = True,
+    validate: bool = True
+) -> pd.DataFrame:
+    start_d = np.datetime64(cfg.start_date, "D")
+    end_d = np.datetime64(cfg.end_date, "D")
+
+    customer_ids = customers["customer_id"].to_numpy()
+    n_customers = len(customer_ids)
+    subs_counts = _sample_subscription_count(cfg, rng, n_customers)
+    monthly_plan_ids, plan_id_pro_year = _subscription_plan_ids(cfg, plans)
+
+    # 1ra suscripción: start_date uniforme en el rango
+    n_days = int((end_d - start_d).astype(int)) + 1
+    first_start = start_d + rng.integers(0, n_days, size=n_customers).astype("timedelta64[D]")
+    first = _sample_subscription_terms(cfg, rng, first_start, end_d, monthly_plan_ids, plan_id_pro_year)
+
+    # 2da suscripción (secuencial, no superpuesta): sólo si la 1ra se canceló;
+    # arranca después de la cancelación (gap 0-30 días) y debe entrar en el rango
+    has_second = (subs_counts == 2) & (first["status"] == SUBSCRIPTION_STATUSES.index("canceled"))
+    second_idx = np.flatnonzero(has_second)
+    gap_days = rng.integers(0, 31, size=len(second_idx)).astype("timedelta64[D]")
+    second_start = first["end_date"][second_idx] + gap_days
+    fits = second_start <= end_d
+    second_idx = second_idx[fits]
+    second = _sample_subscription_terms(cfg, rng, second_start[fits], end_d, monthly_plan_ids, plan_id_pro_year)
+
+    # intercalamos por customer: 1ra y (si existe) 2da suscripción de cada uno
+    cust_idx = np.concatenate([np.arange(n_customers), second_idx])
+    order = np.argsort(cust_idx, kind="stable")
+
+    columns = {col: np.concatenate([first[col], second[col]])[order] for col in first}
+    categories = {
+        "status": SUBSCRIPTION_STATUSES,
+        "billing_cycle": cfg.billing_cycle_dist,
+        "cancellation_reason": cfg.cancellation_reason_dist,
+    }
+    for col, values in categories.items():
+        columns[col] = dtypes.categorical(columns[col], values)
 
-    rows = []
-    subscription_id = 1
-
-    for cust_id, k in zip(customer_ids, subs_counts):
-        # Para customers con 2 suscripciones, generamos períodos secuenciales no superpuestos
-        prev_end = None
-        for _ in range(int(k)):
-            # start_date: si hay una suscripción previa cancelada, arranca después (gap 0-30 días)
-            if prev_end is None:
-                sub_start = pd.Timestamp(np.random.choice(pd.date_range(start, end, freq="D")))
-            else:
-                gap_days = np.random.randint(0, 31)
-                sub_start = prev_end + pd.Timedelta(days=gap_days)
-                if sub_start > end:
-                    break  # no entra en el rango
-
-            billing_cycle = _sample_billing_cycle(1)[0]
-
-            if billing_cycle == "monthly":
-                tier = np.random.choice(list(TIER_DIST.keys()), p=list(TIER_DIST.values()))
-                plan_id = plan_map_monthly[tier]
-            else:
-                # anual: lo simplificamos a Pro Year (realista y manejable)
-                plan_id = plan_id_pro_year
-
-            # Status: churn target global ~35%
-            status = np.random.choice(["active", "canceled"], p=[0.65, 0.35])
-
-            if status == "canceled":
-                dur_months = _sample_churn_duration_months(1)[0]
-                sub_end = sub_start + pd.DateOffset(months=int(dur_months))
-                # recortar al rango máximo
-                if sub_end > end:
-                    sub_end = end
-                cancellation_reason = _sample_cancellation_reason(1)[0]
-            else:
-                sub_end = pd.NaT
-                cancellation_reason = None
-
-            # si la cancelación quedara antes del inicio por recortes raros, corregimos
-            if status == "canceled" and sub_end <= sub_start:
-                sub_end = sub_start + pd.DateOffset(months=1)
-
-            rows.append({
-                "subscription_id": subscription_id,
-                "customer_id": int(cust_id),
-                "plan_id": int(plan_id),
-                "start_date": sub_start,
-                "end_date": sub_end,
-                "status": status,
-                "billing_cycle": billing_cycle,
-                "cancellation_reason": cancellation_reason
-            })
-            subscription_id += 1
-
-            prev_end = sub_end if status == "canceled" else None
-            if status == "active":
-                # si está activa, no generamos otra suscripción posterior para este customer
-                break
-
-    df = pd.DataFrame(rows)
-
-    # Validations
-    assert df["subscription_id"].is_unique
-    assert df["customer_id"].isin(customers["customer_id"]).all()
-    assert df["plan_id"].isin(plans["plan_id"]).all()
-    assert df["start_date"].min() >= start
-    assert df["start_date"].max() <= end
-
-    canceled = df[df["status"] == "canceled"]
-    active = df[df["status"] == "active"]
-
-    assert canceled["end_date"].notna().all()
-    assert active["end_date"].isna().all()
-
-    # cancellation_reason only for canceled
-    assert canceled["cancellation_reason"].notna().all()
-    assert active["cancellation_reason"].isna().all()
-
-    # churn rate sanity (tolerancia por aleatoriedad)
-    churn_rate = (df["status"] == "canceled").mean()
-    assert 0.30 <= churn_rate <= 0.40, f"Churn rate out of bounds: {churn_rate:.3f}"
-
-    return df.sort_values("subscription_id").reset_index(drop=True)
+    df = pd.DataFrame({
+        "subscription_id": dtypes.ids(first_id, len(order)),
+        "customer_id": customer_ids[cust_idx[order]],
+        **columns
+    })
+
+    if validate:
+        validation.check_subscriptions(cfg, df, customers, plans, check_distribution=check_distribution)
+    return df
+
+
+# churn mensual de suscripciones activas: carga incremental y simulación (Config.monthly_churn_hazard)
+MONTHLY_CHURN_HAZARD = 0.04
+
+
+def generate_cancellations(
+    cfg: Config,
+    subscriptions: pd.DataFrame,
+    since: np.datetime64,
+    rng: np.random.Generator
+) -> pd.DataFrame:
+    """
+    Carga incremental: cancela suscripciones activas dentro de (since, cfg.end_date] con
+    hazard mensual cfg.monthly_churn_hazard. Devuelve sólo las suscripciones que cambian,
+    con status, end_date y cancellation_reason actualizados.
+    """
+    since = np.datetime64(since, "D")
+    end = np.datetime64(cfg.end_date, "D")
+
+    active = subscriptions[subscriptions["status"] == "active"]
+    window_months = (end - since).astype(int) / 30.4375
+    churn_prob = 1 - (1 - cfg.monthly_churn_hazard) ** window_months
+    changed = active[rng.random(len(active)) < churn_prob].copy()
+
+    # fecha de cancelación uniforme en la ventana y siempre posterior al inicio
+    lo = np.maximum(changed["start_date"].to_numpy().astype("datetime64[D]"), since)
+    window_days = np.maximum((end - lo).astype(int), 1)
+    offset = 1 + np.floor(rng.random(len(changed)) * window_days).astype(int)
+    changed["end_date"] = np.minimum(lo + offset.astype("timedelta64[D]"), end)
+    changed["status"] = "canceled"
+    reasons = _sample_cancellation_reason(cfg, rng, len(changed))
+    changed["cancellation_reason"] = dtypes.categorical(reasons, cfg.cancellation_reason_dist)
+
+    validation.check_cancellations(cfg, changed, since)
+    return changed
 
 
 FAILED_RATE = 0.05
 
+# categorías de transaction_status (el código es el flag failed)
+TRANSACTION_STATUSES = ("completed", "failed")
+
 DISCOUNT_TXN_RATE = 0.15  # promedio; luego lo sesgamos por Q1/Q4
 DISCOUNT_PCT_RANGE = (0.05, 0.25)  # 5% a 25%
 
+# anual: descuentos menos comunes, pero pueden existir
+YEARLY_DISCOUNT_TXN_RATE = 0.08
+YEARLY_DISCOUNT_PCT_RANGE = (0.03, 0.15)
 
-def _month_start(d: pd.Timestamp) -> pd.Timestamp:
-    return pd.Timestamp(year=d.year, month=d.month, day=1)
-
+PAYMENT_METHOD_DIST = {
+    "card": 0.78,
+    "transfer": 0.07,
+    "wallet": 0.15
+}
 
-def _add_month(d: pd.Timestamp) -> pd.Timestamp:
-    return (d + pd.offsets.MonthBegin(1)).normalize()
 
+def _expand_billing_periods(
+    cfg: Config,
+    subscriptions: pd.DataFrame,
+    since: Optional[np.datetime64] = None
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Períodos de facturación de cada suscripción (calendar.billing_periods), hasta su
+    end_date si está cancelada o hasta cfg.end_date. Devuelve (sub_idx, period_start,
+    period_end) con una entrada por transacción, ordenadas por suscripción y luego
+    cronológicamente.
 
-def _add_year(d: pd.Timestamp) -> pd.Timestamp:
-    return (d + pd.DateOffset(years=1))
+    Con since (carga incremental) sólo se emiten los períodos con pago posterior a since.
+    """
+    end = np.datetime64(cfg.end_date, "D")
+    sub_end = calendar.to_days(subscriptions["end_date"])
+    is_monthly = (subscriptions["billing_cycle"] == "monthly").to_numpy(dtype=bool)
 
+    # si está cancelada, end_date; si activa, fin de rango
+    canceled = (subscriptions["status"] == "canceled").to_numpy(dtype=bool)
+    horizon = np.minimum(np.where(canceled, sub_end, end), end)
 
-def _is_campaign_month(d: pd.Timestamp) -> bool:
-    # campañas en Q1 (ene-mar) y Q4 (oct-dic)
-    return d.month in (1, 2, 3, 10, 11, 12)
+    return calendar.billing_periods(
+        subscriptions["start_date"], horizon, is_monthly, np.datetime64(cfg.start_date, "D"), since=since
+    )
 
 
-def generate_transactions(cfg: Config, subscriptions: pd.DataFrame, plans: pd.DataFrame) -> pd.DataFrame:
-    start = pd.Timestamp(cfg.start_date)
-    end = pd.Timestamp(cfg.end_date)
+def _transaction_amounts(
+    cfg: Config,
+    rng: np.random.Generator,
+    price: np.ndarray,
+    payment_date: np.ndarray,
+    is_monthly: np.ndarray,
+    failed: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """(gross_amount, discount_amount, net_revenue) en centavos de cada pago."""
+    n = len(price)
+    u_discount = rng.random(n)
+    u_pct = rng.random(n)
+    return transaction_amounts(cfg, price, payment_date, is_monthly, failed, u_discount, u_pct)
+
+
+def transaction_amounts(
+    cfg: Config,
+    price: np.ndarray,
+    payment_date: np.ndarray,
+    is_monthly: np.ndarray,
+    failed: np.ndarray,
+    u_discount: np.ndarray,
+    u_pct: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    _transaction_amounts con los sorteos ya hechos (u ~ U[0, 1) por pago): mismos sorteos
+    con otros precios o tasas dan montos comparables (src/analytics/scenarios.py).
+    """
+    # descuento: más probable en meses de campaña (Q1/Q4); en anual menos común
+    campaign = calendar.is_campaign_month(payment_date)
+    disc_prob = np.where(
+        is_monthly,
+        np.clip(cfg.discount_txn_rate * np.where(campaign, 1.8, 0.7), 0.0, 0.6),
+        cfg.yearly_discount_txn_rate * np.where(campaign, 1.5, 0.8)
+    )
+    discounted = ~failed & (u_discount < disc_prob)
+
+    pct_lo = np.where(is_monthly, DISCOUNT_PCT_RANGE[0], YEARLY_DISCOUNT_PCT_RANGE[0])
+    pct_hi = np.where(is_monthly, DISCOUNT_PCT_RANGE[1], YEARLY_DISCOUNT_PCT_RANGE[1])
+    disc_pct = pct_lo + u_pct * (pct_hi - pct_lo)
+
+    # dinero en centavos enteros
+    money = dtypes.MONEY_COLUMNS
+    gross_amount = dtypes.cents(price, money["gross_amount"])
+    discount_amount = np.where(discounted, dtypes.cents(price * disc_pct, money["discount_amount"]), 0)
+    net_revenue = np.where(failed, 0, gross_amount - discount_amount).astype(money["net_revenue"])
+    return gross_amount, discount_amount.astype(money["discount_amount"]), net_revenue
+
+
+def generate_transactions(
+    cfg: Config,
+    subscriptions: pd.DataFrame,
+    plans: pd.DataFrame,
+    rng: np.random.Generator,
+    first_id: int = 1,
+    check_distribution: bool = True,
+    since: Optional[np.datetime64] = None,
+    validate: bool = True
+) -> pd.DataFrame:
+    sub_idx, period_start, period_end = _expand_billing_periods(cfg, subscriptions, since=since)
+    n = len(sub_idx)
 
     # precio por plan_id
-    plan_price = dict(zip(plans["plan_id"].astype(int), plans["price"].astype(float)))
+    plan_ids = subscriptions["plan_id"].to_numpy()[sub_idx]
+    price = plans.set_index("plan_id")["price"].astype(float).reindex(plan_ids).to_numpy()
+    is_monthly = (subscriptions["billing_cycle"] == "monthly").to_numpy(dtype=bool)[sub_idx]
 
-    rows = []
-    transaction_id = 1
+    # payment_date: inicio del período (mensual) o del año (anual)
+    payment_date = period_start
 
-    for _, sub in subscriptions.iterrows():
-        sub_id = int(sub["subscription_id"])
-        cust_id = int(sub["customer_id"])
-        plan_id = int(sub["plan_id"])
-        billing_cycle = sub["billing_cycle"]
+    # status
+    failed = rng.random(n) < cfg.failed_rate
+    gross_amount, discount_amount, net_revenue = _transaction_amounts(cfg, rng, price, payment_date, is_monthly, failed)
 
-        sub_start = pd.Timestamp(sub["start_date"])
-        # si está cancelada, end_date; si activa, fin de rango
-        if sub["status"] == "canceled":
-            sub_end = pd.Timestamp(sub["end_date"])
-        else:
-            sub_end = end
-
-        # seguridad
-        if sub_start > end:
-            continue
-
-        price = float(plan_price[plan_id])
-
-        if billing_cycle == "monthly":
-            # generamos períodos mensuales
-            period_start = _month_start(sub_start)
-            # no antes de start
-            if period_start < sub_start:
-                period_start = _month_start(_add_month(sub_start))
-
-            while period_start <= sub_end and period_start <= end:
-                period_end = (_add_month(period_start) - pd.Timedelta(days=1)).normalize()
-
-                # payment_date: usamos el inicio del período (simple y defendible)
-                payment_date = period_start
-
-                # status
-                status = np.random.choice(["completed", "failed"], p=[1 - FAILED_RATE, FAILED_RATE])
-
-                # descuento: más probable en meses de campaña (Q1/Q4)
-                base_disc_prob = DISCOUNT_TXN_RATE
-                disc_prob = base_disc_prob * (1.8 if _is_campaign_month(payment_date) else 0.7)
-                disc_prob = min(max(disc_prob, 0.0), 0.6)
-
-                if status == "completed" and (np.random.rand() < disc_prob):
-                    disc_pct = np.random.uniform(*DISCOUNT_PCT_RANGE)
-                    discount_amount = round(price * disc_pct, 2)
-                else:
-                    discount_amount = 0.0
-
-                gross_amount = price
-                net_revenue = round(gross_amount - discount_amount, 2) if status == "completed" else 0.0
-
-                rows.append({
-                    "transaction_id": transaction_id,
-                    "payment_date": payment_date,
-                    "customer_id": cust_id,
-                    "subscription_id": sub_id,
-                    "plan_id": plan_id,
-                    "gross_amount": round(gross_amount, 2),
-                    "discount_amount": round(discount_amount, 2),
-                    "net_revenue": net_revenue,
-                    "payment_method": np.random.choice(["card", "transfer", "wallet"], p=[0.78, 0.07, 0.15]),
-                    "transaction_status": status,
-                    "billing_period_start": period_start,
-                    "billing_period_end": period_end
-                })
-
-                transaction_id += 1
-                period_start = _add_month(period_start)
-
-        else:  # yearly
-            # 1 pago por año: pago al inicio (normalizado al día del start)
-            payment_date = sub_start
-
-            # primer período anual
-            period_start = payment_date
-            period_end = (_add_year(period_start) - pd.Timedelta(days=1)).normalize()
-
-            def emit_year_payment(p_date: pd.Timestamp) -> None:
-                nonlocal transaction_id
-                status = np.random.choice(["completed", "failed"], p=[1 - FAILED_RATE, FAILED_RATE])
-
-                # descuentos en anual: menos comunes, pero pueden existir
-                base_disc_prob = 0.08
-                disc_prob = base_disc_prob * (1.5 if _is_campaign_month(p_date) else 0.8)
-
-                if status == "completed" and (np.random.rand() < disc_prob):
-                    disc_pct = np.random.uniform(0.03, 0.15)
-                    discount_amount = round(price * disc_pct, 2)
-                else:
-                    discount_amount = 0.0
-
-                gross_amount = price
-                net_revenue = round(gross_amount - discount_amount, 2) if status == "completed" else 0.0
-
-                rows.append({
-                    "transaction_id": transaction_id,
-                    "payment_date": p_date,
-                    "customer_id": cust_id,
-                    "subscription_id": sub_id,
-                    "plan_id": plan_id,
-                    "gross_amount": round(gross_amount, 2),
-                    "discount_amount": round(discount_amount, 2),
-                    "net_revenue": net_revenue,
-                    "payment_method": np.random.choice(["card", "transfer", "wallet"], p=[0.78, 0.07, 0.15]),
-                    "transaction_status": status,
-                    "billing_period_start": p_date,
-                    "billing_period_end": (_add_year(p_date) - pd.Timedelta(days=1)).normalize()
-                })
-                transaction_id += 1
-
-            # emit primer pago si entra en rango
-            if start <= payment_date <= end:
-                emit_year_payment(payment_date)
-
-            # renovación: si sigue activa/cubierta más de 1 año y cae dentro del rango
-            renewal_date = _add_year(payment_date)
-            if renewal_date <= sub_end and renewal_date <= end:
-                emit_year_payment(renewal_date)
-
-    df = pd.DataFrame(rows)
-
-    # Validations
-    assert df["transaction_id"].is_unique
-    assert df["customer_id"].notna().all()
-    assert df["subscription_id"].isin(subscriptions["subscription_id"]).all()
-    assert df["plan_id"].isin(plans["plan_id"]).all()
-
-    assert df["payment_date"].min() >= start
-    assert df["payment_date"].max() <= end
-
-    # net_revenue rule
-    failed = df[df["transaction_status"] == "failed"]
-    assert (failed["net_revenue"] == 0).all()
-
-    # sanity on failed rate
-    fr = (df["transaction_status"] == "failed").mean()
-    assert 0.03 <= fr <= 0.07, f"Failed rate out of bounds: {fr:.3f}"
-
-    return df.sort_values("transaction_id").reset_index(drop=True)
-
-
-def generate_costs(cfg: Config, transactions: pd.DataFrame) -> pd.DataFrame:
-    start = pd.Timestamp(cfg.start_date)
-    end = pd.Timestamp(cfg.end_date)
+    payment_method = _sample_codes(rng, cfg.payment_method_dist, n)
+
+    df = pd.DataFrame({
+        "transaction_id": dtypes.ids(first_id, n),
+        "payment_date": payment_date,
+        "customer_id": subscriptions["customer_id"].to_numpy()[sub_idx],
+        "subscription_id": subscriptions["subscription_id"].to_numpy()[sub_idx],
+        "plan_id": plan_ids,
+        "gross_amount": gross_amount,
+        "discount_amount": discount_amount,
+        "net_revenue": net_revenue,
+        "payment_method": dtypes.categorical(payment_method, cfg.payment_method_dist),
+        "transaction_status": dtypes.categorical(failed.astype(np.int8), TRANSACTION_STATUSES),
+        "billing_period_start": period_start,
+        "billing_period_end": period_end
+    })
+
+    if validate:
+        validation.check_transactions(cfg, df, subscriptions, plans, check_distribution=check_distribution)
+    return df
 
-    tx_completed = transactions[transactions["transaction_status"] == "completed"].copy()
-    tx_completed["month"] = tx_completed["payment_date"].dt.to_period("M").dt.to_timestamp()
 
-    monthly_rev = (
-        tx_completed.groupby("month", as_index=False)["net_revenue"]
-        .sum()
-        .rename(columns={"net_revenue": "monthly_net_revenue"})
-        .sort_values("month")
-    )
+def monthly_net_revenue(transactions: pd.DataFrame) -> pd.Series:
+    """
+    Net revenue de transacciones completadas por mes, en centavos (índice = primer día
+    del mes). Es sumable entre bloques (add_monthly_revenue), así el modo streaming lo
+    acumula sin guardar transacciones; en centavos enteros la suma es exacta.
+    """
+    completed = (transactions["transaction_status"] == "completed").to_numpy(dtype=bool)
+    month = transactions["payment_date"].to_numpy()[completed].astype("datetime64[M]")
+    net_revenue = transactions["net_revenue"].to_numpy()[completed]
+    if not is_integer_dtype(net_revenue.dtype):
+        net_revenue = dtypes.cents(net_revenue)
+    if not len(month):
+        return pd.Series(dtype="int64")
+    # bincount por mes (desde el primero): sin sort ni hash
+    month_idx = month.astype(np.int64)
+    first = month_idx.min()
+    month_idx -= first
+    present = np.bincount(month_idx) > 0
+    total = np.bincount(month_idx, weights=net_revenue).astype(np.int64)[present]
+    months = (np.flatnonzero(present) + first).astype("datetime64[M]")
+    return pd.Series(total, index=pd.DatetimeIndex(months.astype(dtypes.DATE_DTYPE)))
+
+
+def add_monthly_revenue(total: pd.Series, other: pd.Series) -> pd.Series:
+    """Suma dos monthly_net_revenue (centavos), alineando por mes."""
+    return total.add(other, fill_value=0).astype(np.int64)
+
+
+COST_TYPES = ("payment_fees", "marketing", "infra", "support")
+# fixed_or_variable de cada cost_type (códigos en ("fixed", "variable"))
+COST_KINDS = ("fixed", "variable")
+COST_TYPE_KIND = np.array([1, 1, 0, 0], dtype=np.int8)
+
+# Parámetros base (ajustables, pero razonables)
+BASE_INFRA = 12000.0     # fijo mensual
+BASE_SUPPORT = 7000.0    # fijo mensual
+BASE_MARKETING = 9000.0  # variable con picos
+
+
+def generate_costs(cfg: Config, transactions: pd.DataFrame, rng: np.random.Generator) -> pd.DataFrame:
+    return generate_costs_from_revenue(cfg, monthly_net_revenue(transactions), rng)
+
+
+def _uniform(u: np.ndarray, low: float, high: float) -> np.ndarray:
+    """u ~ U[0, 1) -> U[low, high), con la misma aritmética que rng.uniform(low, high)."""
+    return low + (high - low) * u
+
+
+def generate_costs_from_revenue(
+    cfg: Config,
+    monthly_revenue: pd.Series,
+    rng: np.random.Generator,
+    first_id: int = 1
+) -> pd.DataFrame:
+    """
+    Costos mensuales (payment fees, marketing, infra, support) a partir del net revenue
+    mensual: en centavos (monthly_net_revenue, el acumulador del modo streaming) o en
+    float (ej: sumado en SQL). Sólo usa el acumulador (una fila por mes): las cuatro
+    series salen como arrays, con un sorteo por mes y tipo de costo en el orden
+    mes -> tipo.
+    """
+    monthly_revenue = pd.Series(
+        dtypes.dollars(monthly_revenue.to_numpy()), index=monthly_revenue.index
+    ).sort_index()
+    months = monthly_revenue.index.to_numpy().astype(dtypes.DATE_DTYPE)
+    rev = monthly_revenue.to_numpy(dtype=float)
+    u = rng.random((len(rev), len(COST_TYPES)))
+
+    # 1) payment_fees: 2-3% del revenue
+    payment_fees = rev * _uniform(u[:, 0], 0.02, 0.03)
+
+    # 2) marketing: picos en Q1/Q4 (campañas); multiplicador de campaña: 1.3 a 2.2
+    is_campaign = calendar.is_campaign_month(months)
+    marketing_mult = np.where(is_campaign, _uniform(u[:, 1], 1.3, 2.2), _uniform(u[:, 1], 0.6, 1.1))
+    marketing = BASE_MARKETING * marketing_mult
+
+    # 3) infra: estable con ruido leve
+    infra = BASE_INFRA * _uniform(u[:, 2], 0.95, 1.05)
+
+    # 4) support: estable con ruido + leve relación con revenue
+    support = BASE_SUPPORT * _uniform(u[:, 3], 0.95, 1.08) + rev * 0.002
+
+    # una fila por mes y tipo, en el orden de COST_TYPES; redondeo al centavo
+    amounts = np.column_stack([payment_fees, marketing, infra, support])
+    n_rows = amounts.size
+    df = pd.DataFrame({
+        "cost_id": dtypes.ids(first_id, n_rows),
+        "date": np.repeat(months, len(COST_TYPES)),  # primer día del mes
+        "cost_type": dtypes.categorical(np.tile(np.arange(len(COST_TYPES), dtype=np.int8), len(rev)), COST_TYPES),
+        "amount": dtypes.cents(np.round(amounts.ravel(), 2), dtypes.MONEY_COLUMNS["amount"]),
+        "fixed_or_variable": dtypes.categorical(np.tile(COST_TYPE_KIND, len(rev)), COST_KINDS)
+    })
+    validation.check_costs(cfg, df, monthly_revenue)
+    return df
 
-    # Generamos costos por mes
-    rows = []
-    cost_id = 1
 
-    # Parámetros base (ajustables, pero razonables)
-    base_infra = 12000.0     # fijo mensual
-    base_support = 7000.0    # fijo mensual
-    base_marketing = 9000.0  # variable con picos
+# -----------------------------
+# IO
+# -----------------------------
+OUTPUT_FORMATS = ("csv", "parquet", "feather")
+
+FILE_EXTENSIONS = {
+    "csv": "csv",
+    "parquet": "parquet",
+    "feather": "feather"
+}
+
+# Columnas de baja cardinalidad: dictionary-encoded en parquet/feather
+CATEGORICAL_COLUMNS = {
+    "month_name", "tier", "country", "acquisition_channel", "status", "billing_cycle",
+    "cancellation_reason", "payment_method", "transaction_status", "cost_type", "fixed_or_variable"
+}
+
+# Enteros compactos en parquet/feather (el resto de los int queda en int64)
+COMPACT_INT_COLUMNS = {
+    "customer_id": "int32",
+    "subscription_id": "int32",
+    "transaction_id": "int32",
+    "cost_id": "int32",
+    "plan_id": "int16",
+    "year": "int16",
+    "month": "int8",
+    "quarter": "int8"
+}
 
-    for _, r in monthly_rev.iterrows():
-        month_date = pd.Timestamp(r["month"])
-        rev = float(r["monthly_net_revenue"])
+DATE_COLUMNS = {
+    "date", "signup_date", "start_date", "end_date", "payment_date",
+    "billing_period_start", "billing_period_end"
+}
+
+# fact_transactions se particiona por mes de pago (hive: payment_month=YYYY-MM/)
+PARTITION_COLUMNS = {
+    "transactions": "payment_month"
+}
+
+
+DATASET_MIN_ROWS_PER_GROUP = 1 << 16
 
-        # 1) payment_fees: 2-3% del revenue
-        fee_rate = float(np.random.uniform(0.02, 0.03))
-        payment_fees = round(rev * fee_rate, 2)
 
-        # 2) marketing: picos en Q1/Q4 (campañas)
-        is_campaign = month_date.month in (1, 2, 3, 10, 11, 12)
-        # multiplicador de campaña: 1.3 a 2.2
-        marketing_mult = float(np.random.uniform(1.3, 2.2)) if is_campaign else float(np.random.uniform(0.6, 1.1))
-        marketing = round(base_marketing * marketing_mult, 2)
+def write_csv(df: pd.DataFrame, out_path: str, append: bool = False) -> None:
+    df.to_csv(out_path, index=False, mode="a" if append else "w", header=not append)
+
+
+def _to_arrow(df: pd.DataFrame):
+    """
+    DataFrame -> pyarrow.Table con tipos compactos: categóricas como dictionary,
+    IDs y componentes de fecha en enteros chicos y fechas como date32.
+    """
+    import pyarrow as pa
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    arrow_fields = []
+    for arrow_field in table.schema:
+        if arrow_field.name in CATEGORICAL_COLUMNS:
+            arrow_field = arrow_field.with_type(pa.dictionary(pa.int8(), pa.string()))
+        elif arrow_field.name in COMPACT_INT_COLUMNS:
+            arrow_field = arrow_field.with_type(pa.from_numpy_dtype(np.dtype(COMPACT_INT_COLUMNS[arrow_field.name])))
+        elif pa.types.is_timestamp(arrow_field.type):
+            arrow_field = arrow_field.with_type(pa.date32())
+        arrow_fields.append(arrow_field)
+    return table.cast(pa.schema(arrow_fields))
+
+
+def write_arrow(
+    df: pd.DataFrame,
+    out_path: str,
+    output_format: str,
+    part: Optional[int] = None,
+    partition_column: Optional[str] = None
+) -> None:
+    """
+    Escribe df como parquet (zstd) o feather (Arrow IPC, zstd).
+
+    - part None: un único archivo en out_path.
+    - part n: dataset en el directorio out_path, un archivo por shard (part-0000n-*);
+      part 0 limpia el directorio. Con partition_column, además se particiona
+      por el mes de payment_date (partition_column=YYYY-MM/).
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+    except ImportError as exc:
+        raise ImportError(f"output_format='{output_format}' requires pyarrow (pip install pyarrow)") from exc
+
+    table = _to_arrow(df)
+
+    if part is None:
+        if output_format == "parquet":
+            import pyarrow.parquet as pq
+            pq.write_table(table, out_path, compression="zstd")
+        else:
+            import pyarrow.feather as feather
+            feather.write_feather(table, out_path, compression="zstd")
+        return
+
+    if part == 0 and os.path.isdir(out_path):
+        shutil.rmtree(out_path)
+
+    partitioning = None
+    if partition_column is not None:
+        month = df["payment_date"].dt.strftime("%Y-%m").to_numpy()
+        table = table.append_column(partition_column, pa.array(month, type=pa.string()))
+        partitioning = ds.partitioning(pa.schema([(partition_column, pa.string())]), flavor="hive")
+
+    file_format = ds.ParquetFileFormat() if output_format == "parquet" else ds.IpcFileFormat()
+    ds.write_dataset(
+        table,
+        out_path,
+        format=file_format,
+        file_options=file_format.make_write_options(compression="zstd"),
+        partitioning=partitioning,
+        basename_template=f"part-{part:05d}-{{i}}.{FILE_EXTENSIONS[output_format]}",
+        existing_data_behavior="overwrite_or_ignore",
+        # sin mínimo, cada batch de entrada se parte por mes y deja row groups de pocas filas
+        min_rows_per_group=DATASET_MIN_ROWS_PER_GROUP
+    )
 
-        # 3) infra: estable con ruido leve
-        infra = round(base_infra * float(np.random.uniform(0.95, 1.05)), 2)
 
-        # 4) support: estable con ruido + leve relación con revenue (opcional)
-        support = round(base_support * float(np.random.uniform(0.95, 1.08)) + (rev * 0.002), 2)
+def output_name(name: str, output_format: str, sharded: bool = False) -> str:
+    """Nombre del archivo (o directorio de dataset, si sharded) de una tabla."""
+    if output_format != "csv" and sharded:
+        return name
+    return f"{name}.{FILE_EXTENSIONS[output_format]}"
 
-        # Emit rows
-        for cost_type, amount, fov in [
-            ("payment_fees", payment_fees, "variable"),
-            ("marketing", marketing, "variable"),
-            ("infra", infra, "fixed"),
-            ("support", support, "fixed"),
-        ]:
-            rows.append({
-                "cost_id": cost_id,
-                "date": month_date,  # primer día del mes
-                "cost_type": cost_type,
-                "amount": float(amount),
-                "fixed_or_variable": fov
-            })
-            cost_id += 1
 
-    df = pd.DataFrame(rows)
+def find_table(data_dir: str, name: str) -> str:
+    """Archivo (o directorio de dataset) de una tabla generada en data_dir, en cualquier formato."""
+    for fmt in OUTPUT_FORMATS:
+        for sharded in (False, True):
+            path = os.path.join(data_dir, output_name(name, fmt, sharded=sharded))
+            if os.path.exists(path):
+                return path
+    raise FileNotFoundError(f"No data found for table '{name}' in {data_dir}")
 
-    # Validations
-    assert df["cost_id"].is_unique
-    assert df["date"].min() >= pd.Timestamp(cfg.start_date).to_period("M").to_timestamp()
-    assert df["date"].max() <= pd.Timestamp(cfg.end_date).to_period("M").to_timestamp()
 
-    # Payment fee sanity: ratio 2-3% en promedio (tolerancia)
-    pf = df[df["cost_type"] == "payment_fees"].copy()
-    pf = pf.merge(monthly_rev, left_on="date", right_on="month", how="left")
-    pf_ratio = (pf["amount"] / pf["monthly_net_revenue"]).mean()
-    assert 0.019 <= pf_ratio <= 0.031, f"Payment fee ratio out of bounds: {pf_ratio:.4f}"
+def arrow_format(path: str) -> str:
+    """parquet o feather según la extensión del archivo (o del primer archivo del dataset)."""
+    if os.path.isdir(path):
+        path = next(f for _, _, files in os.walk(path) for f in files)
+    return "parquet" if path.endswith(".parquet") else "feather"
 
-    return df.sort_values("cost_id").reset_index(drop=True)
 
+def read_table(path: str, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    Lee una tabla escrita por write_table (csv, parquet o feather; archivo o dataset).
+    Sólo las columnas pedidas; fechas como datetime64 y categóricas como category.
+    """
+    if path.endswith(".csv"):
+        header = pd.read_csv(path, nrows=0).columns
+        columns = list(header) if columns is None else columns
+        return pd.read_csv(
+            path,
+            usecols=columns,
+            parse_dates=[c for c in columns if c in DATE_COLUMNS],
+            dtype={c: "category" for c in columns if c in CATEGORICAL_COLUMNS}
+        )[columns]
+
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    dataset = ds.dataset(path, format=arrow_format(path), partitioning="hive")
+    if columns is None:
+        columns = [c for c in dataset.schema.names if c not in PARTITION_COLUMNS.values()]
+    table = dataset.to_table(columns=columns)
+    # date32 -> timestamp antes de pasar a pandas (si no, quedan objetos datetime.date)
+    for i, arrow_field in enumerate(table.schema):
+        if arrow_field.name in DATE_COLUMNS:
+            table = table.set_column(i, arrow_field.name, table.column(i).cast(pa.timestamp("s")))
+    return table.to_pandas()
+
+
+def write_table(cfg: Config, df: pd.DataFrame, name: str, part: Optional[int] = None) -> None:
+    """
+    Escribe una tabla en cfg.output_format. part = índice de shard para las tablas
+    que se escriben por bloques (en csv, part > 0 agrega filas al mismo archivo).
+    """
+    df = dtypes.to_output(df)
+    out_path = os.path.join(cfg.out_dir, output_name(name, cfg.output_format, sharded=part is not None))
+    if cfg.output_format == "csv":
+        profiling.measure("write_csv", write_csv, df, out_path, append=bool(part), rows=len(df))
+    else:
+        profiling.measure(
+            f"write_{cfg.output_format}", write_arrow, df, out_path, cfg.output_format,
+            part=part, partition_column=PARTITION_COLUMNS.get(name), rows=len(df)
+        )
 
 
 # -----------------------------
-# IO
+# Shards (streaming / paralelo)
 # -----------------------------
-def write_csv(df: pd.DataFrame, out_path: str) -> None:
-    df.to_csv(out_path, index=False)
+def iter_customer_shards(cfg: Config) -> Iterator[Tuple[int, int, int]]:
+    """
+    Shards (shard_index, first_customer_id, n_customers) de tamaño cfg.chunk_size;
+    con chunk_size = 0, un único shard con todos los customers.
+    """
+    shard_size = cfg.chunk_size if cfg.chunk_size > 0 else cfg.n_customers
+    for shard_index, first_id in enumerate(range(1, cfg.n_customers + 1, shard_size)):
+        yield shard_index, first_id, min(shard_size, cfg.n_customers - first_id + 1)
+
+
+def generate_shard(
+    cfg: Config,
+    plans: pd.DataFrame,
+    shard_index: int,
+    first_customer_id: int,
+    n_customers: int
+) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """
+    customers -> subscriptions -> transactions de un shard, con su propio Generator
+    (derivado de cfg.seed y shard_index). subscription_id y transaction_id son locales
+    al shard (arrancan en 1); se renumeran al unir los shards. Sin validaciones:
+    generate_streaming las corre aparte, en paralelo con la escritura.
 
+    Con cfg.model = "simulation", los genera el motor de simulation.py.
+    """
+    if cfg.model == "simulation":
+        # import diferido: simulation importa este módulo
+        from src.data_generation import simulation
+        return simulation.simulate_shard(cfg, plans, shard_index, first_customer_id, n_customers)
+
+    rng = make_rng(cfg.seed, SHARD_STREAM, shard_index)
+    customers = profiling.measure(
+        "generate_customers", generate_customers,
+        cfg, rng, first_id=first_customer_id, n=n_customers, validate=False
+    )
+    subscriptions = profiling.measure(
+        "generate_subscriptions", generate_subscriptions,
+        cfg, customers=customers, plans=plans, rng=rng, validate=False
+    )
+    transactions = profiling.measure(
+        "generate_transactions", generate_transactions,
+        cfg, subscriptions=subscriptions, plans=plans, rng=rng, validate=False
+    )
+    return customers, subscriptions, transactions
 
-def main() -> None:
-    cfg = Config()
-    set_seeds(cfg.seed)
+
+def _generate_shard_profiled(
+    cfg: Config,
+    plans: pd.DataFrame,
+    *shard: int
+) -> Tuple[Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame], dict]:
+    """generate_shard en un worker, con sus etapas medidas para sumarlas en el proceso principal."""
+    with profiling.Profiler() as profiler:
+        result = generate_shard(cfg, plans, *shard)
+    return result, profiler.stages
+
+
+def _iter_generated_shards(cfg: Config, plans: pd.DataFrame) -> Iterator[Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]]:
+    """
+    Genera los shards en orden; con n_workers > 1 en un pool de procesos, con a lo sumo
+    2 * n_workers shards en vuelo para que la memoria siga acotada.
+    """
+    shards = iter_customer_shards(cfg)
+    if cfg.n_workers <= 1:
+        for shard in shards:
+            yield generate_shard(cfg, plans, *shard)
+        return
+
+    profiler = profiling.active()
+    task = generate_shard if profiler is None else _generate_shard_profiled
+
+    def result(future):
+        if profiler is None:
+            return future.result()
+        shard, stages = future.result()
+        profiler.merge(stages)
+        return shard
+
+    with ProcessPoolExecutor(max_workers=cfg.n_workers) as pool:
+        pending = deque()
+        for shard in shards:
+            pending.append(pool.submit(task, cfg, plans, *shard))
+            if len(pending) >= 2 * cfg.n_workers:
+                yield result(pending.popleft())
+        while pending:
+            yield result(pending.popleft())
+
+
+def _check_shard(
+    cfg: Config,
+    plans: pd.DataFrame,
+    customers: pd.DataFrame,
+    subscriptions: pd.DataFrame,
+    transactions: pd.DataFrame
+) -> Counter:
+    """Validaciones de integridad de un shard; el resumen alimenta las de distribución."""
+    return (
+        validation.check_customers(cfg, customers, check_distribution=False)
+        + validation.check_subscriptions(cfg, subscriptions, customers, plans, check_distribution=False)
+        + validation.check_transactions(cfg, transactions, subscriptions, plans, check_distribution=False)
+    )
+
+
+# destino de cada bloque generado: sink(df, table_name, part); part = índice de shard o None
+Sink = Callable[[pd.DataFrame, str, Optional[int]], None]
+
+
+def generate_streaming(
+    cfg: Config,
+    plans: pd.DataFrame,
+    sink: Optional[Sink] = None,
+    costs: bool = True
+) -> dict:
+    """
+    Genera customers -> subscriptions -> transactions por shards de customer_id y
+    entrega cada shard al sink apenas se produce (por defecto write_table), así la
+    memoria pico depende de cfg.chunk_size y no de cfg.n_customers.
+
+    Los shards se unen en orden renumerando subscription_id y transaction_id con
+    offsets acumulados, por lo que el output depende sólo de seed y chunk_size
+    (cantidad de shards), no de n_workers.
+
+    Las validaciones de integridad (según cfg.validation) corren por shard en un
+    thread, mientras el shard se escribe; las de distribución (churn, failed rate,
+    canales) sobre los totales acumulados al final. Los costos (si costs) salen del
+    net revenue mensual acumulado. Devuelve la cantidad de filas escritas por archivo.
+    """
+    if sink is None:
+        def sink(df: pd.DataFrame, name: str, part: Optional[int]) -> None:
+            write_table(cfg, df, name, part=part)
+
+    counts = dict.fromkeys(("customers", "subscriptions", "transactions"), 0)
+    monthly_revenue = pd.Series(dtype="int64")
+
+    with validation.BackgroundValidator() as validator:
+        for i, (customers, subscriptions, transactions) in enumerate(_iter_generated_shards(cfg, plans)):
+            # IDs globalmente únicos: offset = filas ya escritas
+            dtypes.offset_ids(subscriptions, "subscription_id", counts["subscriptions"])
+            dtypes.offset_ids(transactions, "subscription_id", counts["subscriptions"])
+            dtypes.offset_ids(transactions, "transaction_id", counts["transactions"])
+
+            if cfg.validation != "off":
+                validator.submit(
+                    len(customers) + len(subscriptions) + len(transactions),
+                    _check_shard, cfg, plans, customers, subscriptions, transactions
+                )
+
+            for name, df in (("customers", customers), ("subscriptions", subscriptions), ("transactions", transactions)):
+                sink(df, name, i)
+                counts[name] += len(df)
+
+            # acumulador chico (por mes), independiente del volumen
+            shard_revenue = profiling.measure("generate_costs", monthly_net_revenue, transactions, rows=0)
+            monthly_revenue = add_monthly_revenue(monthly_revenue, shard_revenue)
+
+    profiling.measure("validate", validation.check_distributions, cfg, validator.summary, rows=0)
+
+    if costs:
+        counts["costs"] = _generate_and_sink_costs(cfg, monthly_revenue, sink)
+
+    return counts
+
+
+def _generate_and_sink_costs(cfg: Config, monthly_revenue: pd.Series, sink: Sink) -> int:
+    costs = profiling.measure(
+        "generate_costs", generate_costs_from_revenue, cfg, monthly_revenue, make_rng(cfg.seed, COSTS_STREAM)
+    )
+    sink(costs, "costs", None)
+    return len(costs)
+
+
+def monthly_net_revenue_from_file(path: str) -> pd.Series:
+    """
+    monthly_net_revenue de un archivo de transacciones ya escrito, leído por bloques:
+    la memoria no depende del tamaño del archivo.
+    """
+    columns = ["payment_date", "net_revenue", "transaction_status"]
+    if path.endswith(".csv"):
+        batches = pd.read_csv(path, usecols=columns, parse_dates=["payment_date"], chunksize=1 << 20)
+    else:
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+
+        dataset = ds.dataset(path, format=arrow_format(path), partitioning="hive")
+        batches = (
+            pa.Table.from_batches([batch]).cast(
+                pa.schema([("payment_date", pa.timestamp("s")), ("net_revenue", pa.float64()),
+                           ("transaction_status", pa.string())])
+            ).to_pandas()
+            for batch in dataset.to_batches(columns=columns)
+        )
+
+    monthly_revenue = pd.Series(dtype="int64")
+    for batch in batches:
+        monthly_revenue = add_monthly_revenue(monthly_revenue, monthly_net_revenue(batch))
+    return monthly_revenue
+
+
+DEFAULT_REPORT = os.path.join("data", "run_report.json")
+
+# dims = date_dim + plans; facts = customers -> subscriptions -> transactions;
+# costs sin facts = desde las transacciones ya escritas en out_dir
+STAGES = ("dims", "facts", "costs")
+
+# flag de la CLI -> campo de Config
+CLI_FIELDS = {
+    "n_customers": "n_customers",
+    "start_date": "start_date",
+    "end_date": "end_date",
+    "seed": "seed",
+    "out_dir": "out_dir",
+    "format": "output_format",
+    "chunk_size": "chunk_size",
+    "workers": "n_workers",
+    "validation": "validation",
+    "model": "model",
+}
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Generate the synthetic subscription datasets.",
+        epilog="Precedence: Config defaults < --config file < command-line flags."
+    )
+    parser.add_argument("--config", default=None,
+                        help="JSON file with any Config fields (sizes, dates, distributions, plan_defs, ...)")
+    parser.add_argument("--n-customers", type=int, default=None)
+    parser.add_argument("--start-date", default=None, help="YYYY-MM-DD")
+    parser.add_argument("--end-date", default=None, help="YYYY-MM-DD")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--out-dir", default=None)
+    parser.add_argument("--format", choices=OUTPUT_FORMATS, default=None)
+    parser.add_argument("--chunk-size", type=int, default=None, help="customers per shard (0 = one shard)")
+    parser.add_argument("--workers", type=int, default=None, help="processes generating shards")
+    parser.add_argument("--validation", choices=validation.LEVELS, default=None,
+                        help="integrity/distribution checks: off, sampled (validation_sample_rows rows per shard) or full")
+    parser.add_argument("--model", choices=MODELS, default=None,
+                        help="static (default) or simulation (lifecycle with plan changes, dunning retries, reactivations)")
+    parser.add_argument("--stages", default=",".join(STAGES),
+                        help=f"comma-separated subset of {','.join(STAGES)} (default: all); "
+                             "costs without facts reads the transactions already in --out-dir")
+    parser.add_argument("--print-config", action="store_true", help="print the resolved config as JSON and exit")
+    parser.add_argument("--report", default=None,
+                        help="write a JSON run report (time, rows and peak RSS per stage) to this path")
+    parser.add_argument("--profile", action="store_true",
+                        help=f"also capture cProfile; implies --report (default path: {DEFAULT_REPORT})")
+    return parser.parse_args(argv)
+
+
+def resolve_config(args: argparse.Namespace) -> Config:
+    cfg = load_config(args.config) if args.config else Config()
+    overrides = {name: getattr(args, flag) for flag, name in CLI_FIELDS.items() if getattr(args, flag) is not None}
+    cfg = replace(cfg, **overrides)
+    validate_config(cfg)
+    return cfg
+
+
+def run(cfg: Config, stages: Tuple[str, ...] = STAGES) -> dict:
+    """Corre las etapas pedidas sobre cfg.out_dir; devuelve filas escritas por tabla."""
     ensure_out_dir(cfg.out_dir)
+    counts = {}
 
-    date_dim = generate_date_dim(cfg)
-    plans = generate_plans()
-    customers = generate_customers(cfg)
-    subscriptions = generate_subscriptions(cfg, customers=customers, plans=plans)
-    transactions = generate_transactions(cfg, subscriptions=subscriptions, plans=plans)
-    costs = generate_costs(cfg, transactions=transactions)
+    def sink(df: pd.DataFrame, name: str, part: Optional[int]) -> None:
+        write_table(cfg, df, name, part=part)
 
+    plans = profiling.measure("generate_plans", generate_plans, cfg)
+    if "dims" in stages:
+        date_dim = profiling.measure("generate_date_dim", generate_date_dim, cfg)
+        sink(date_dim, "date_dim", None)
+        sink(plans, "plans", None)
+        counts.update(date_dim=len(date_dim), plans=len(plans))
 
+    if "facts" in stages:
+        counts.update(generate_streaming(cfg, plans=plans, sink=sink, costs="costs" in stages))
+    elif "costs" in stages:
+        transactions = find_table(cfg.out_dir, "transactions")
+        monthly_revenue = profiling.measure(
+            "read_transactions", monthly_net_revenue_from_file, transactions, rows=0
+        )
+        counts["costs"] = _generate_and_sink_costs(cfg, monthly_revenue, sink)
+    return counts
 
-    write_csv(date_dim, os.path.join(cfg.out_dir, "date_dim.csv"))
-    write_csv(plans, os.path.join(cfg.out_dir, "plans.csv"))
-    write_csv(customers, os.path.join(cfg.out_dir, "customers.csv"))
-    write_csv(subscriptions, os.path.join(cfg.out_dir, "subscriptions.csv"))
-    write_csv(transactions, os.path.join(cfg.out_dir, "transactions.csv"))
-    write_csv(costs, os.path.join(cfg.out_dir, "costs.csv"))
+
+def main() -> None:
+    args = parse_args()
+    cfg = resolve_config(args)
+    stages = tuple(s.strip() for s in args.stages.split(",") if s.strip())
+    assert stages and set(stages) <= set(STAGES), f"--stages must be a subset of {','.join(STAGES)}"
+
+    if args.print_config:
+        print(json.dumps(asdict(cfg), indent=2))
+        return
+    report_path = args.report or (DEFAULT_REPORT if args.profile else None)
+
+    with profiling.Profiler(cprofile=args.profile) as profiler:
+        counts = run(cfg, stages)
 
     print("Generated:")
-    print(f"- {len(date_dim):,} rows: date_dim.csv")
-    print(f"- {len(plans):,} rows: plans.csv")
-    print(f"- {len(customers):,} rows: customers.csv")
-    print(f"- {len(subscriptions):,} rows: subscriptions.csv")
-    print(f"- {len(transactions):,} rows: transactions.csv")
-    print(f"- {len(costs):,} rows: costs.csv")
+    for name, n_rows in counts.items():
+        sharded = name in ("customers", "subscriptions", "transactions")
+        print(f"- {n_rows:,} rows: {output_name(name, cfg.output_format, sharded=sharded)}")
+
+    if report_path:
+        profiler.write_report(report_path, config=asdict(cfg), pipeline_stages=list(stages))
+        print(f"Run report: {report_path}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,183 @@
+"""
+Instrumentación por etapas del pipeline de generación.
+
+generate_data envuelve cada generate_* / write_* / validación con profiling.measure():
+sin un Profiler activo es una llamada directa; dentro de `with Profiler(): ...` registra
+por etapa llamadas, tiempo de pared, filas emitidas y RSS pico (en Linux el pico se
+resetea antes de cada etapa, así que es el de la etapa y no el del proceso).
+
+Con cprofile=True además captura cProfile del proceso principal: el reporte incluye las
+funciones con más tiempo acumulado y el .prof completo queda junto al reporte (para
+pstats / snakeviz). Los shards generados en workers (n_workers > 1) devuelven sus
+etapas y se suman a las del proceso principal (el tiempo es la suma de todos los
+procesos, así que share puede superar 1), pero no entran en cProfile.
+
+Uso:
+    python -m src.data_generation.generate_data --profile
+"""
+from __future__ import annotations
+
+import cProfile
+import datetime as dt
+import json
+import os
+import platform
+import pstats
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+CPROFILE_TOP = 30
+
+
+# -----------------------------
+# Memoria
+# -----------------------------
+def reset_peak_rss() -> None:
+    """En Linux, resetea VmHWM (pico de RSS) del proceso; en otros sistemas no hace nada."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def peak_rss_mb() -> float:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+
+    # sin /proc: pico de toda la vida del proceso (KB en Linux, bytes en macOS)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1 << 20) if platform.system() == "Darwin" else peak / 1024
+
+
+# -----------------------------
+# Profiler
+# -----------------------------
+_ACTIVE: Optional["Profiler"] = None
+
+
+def _short_path(filename: str) -> str:
+    """Rutas del repo y de site-packages, relativas (pandas/io/..., src/...)."""
+    for root in (REPO_ROOT + os.sep, "site-packages" + os.sep):
+        if root in filename:
+            return filename.split(root, 1)[1]
+    return filename
+
+
+class Profiler:
+    """Acumula por etapa: llamadas, segundos, filas y RSS pico. Se activa con `with`."""
+
+    def __init__(self, cprofile: bool = False) -> None:
+        self.stages: Dict[str, dict] = {}
+        self.peak_rss_mb = 0.0
+        self._cprofile = cProfile.Profile() if cprofile else None
+        self._previous: Optional[Profiler] = None
+        self._started = 0.0
+        self.wall_seconds = 0.0
+
+    def __enter__(self) -> "Profiler":
+        global _ACTIVE
+        self._previous, _ACTIVE = _ACTIVE, self
+        self._started = time.perf_counter()
+        if self._cprofile is not None:
+            self._cprofile.enable()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        global _ACTIVE
+        if self._cprofile is not None:
+            self._cprofile.disable()
+        self.wall_seconds = time.perf_counter() - self._started
+        self.peak_rss_mb = max(self.peak_rss_mb, peak_rss_mb())
+        _ACTIVE = self._previous
+
+    def measure(self, stage: str, fn: Callable, *args, rows: Optional[int] = None, **kwargs) -> Any:
+        reset_peak_rss()
+        start = time.perf_counter()
+        result = fn(*args, **kwargs)
+        seconds = time.perf_counter() - start
+        if rows is None:
+            rows = len(result) if hasattr(result, "__len__") else 0
+        self.merge({stage: {"calls": 1, "seconds": seconds, "rows": rows, "peak_rss_mb": peak_rss_mb()}})
+        return result
+
+    def merge(self, stages: Dict[str, dict]) -> None:
+        """Suma etapas medidas en otro Profiler (ej: el de un worker)."""
+        for stage, other in stages.items():
+            entry = self.stages.setdefault(stage, {"calls": 0, "seconds": 0.0, "rows": 0, "peak_rss_mb": 0.0})
+            entry["calls"] += other["calls"]
+            entry["seconds"] += other["seconds"]
+            entry["rows"] += other["rows"]
+            entry["peak_rss_mb"] = max(entry["peak_rss_mb"], other["peak_rss_mb"])
+            self.peak_rss_mb = max(self.peak_rss_mb, other["peak_rss_mb"])
+
+    def _cprofile_top(self) -> List[dict]:
+        stats = pstats.Stats(self._cprofile)
+        rows = []
+        for (filename, line, name), (_, calls, tottime, cumtime, _) in stats.stats.items():
+            if filename == __file__:
+                continue
+            rows.append({
+                "function": f"{_short_path(filename)}:{line}({name})",
+                "calls": calls,
+                "tottime": round(tottime, 4),
+                "cumtime": round(cumtime, 4),
+            })
+        return sorted(rows, key=lambda r: r["cumtime"], reverse=True)[:CPROFILE_TOP]
+
+    def report(self, **meta) -> dict:
+        """Reporte estructurado: meta dada, totales y etapas de más a menos tiempo."""
+        stages = [
+            {
+                "stage": stage,
+                "calls": entry["calls"],
+                "seconds": round(entry["seconds"], 4),
+                "share": round(entry["seconds"] / self.wall_seconds, 4) if self.wall_seconds else None,
+                "rows": entry["rows"],
+                "rows_per_sec": round(entry["rows"] / entry["seconds"]) if entry["seconds"] > 0 else None,
+                "peak_rss_mb": round(entry["peak_rss_mb"], 1),
+            }
+            for stage, entry in sorted(self.stages.items(), key=lambda item: item[1]["seconds"], reverse=True)
+        ]
+        report = {
+            "created_at": dt.datetime.now().isoformat(timespec="seconds"),
+            **meta,
+            "wall_seconds": round(self.wall_seconds, 4),
+            "peak_rss_mb": round(self.peak_rss_mb, 1),
+            "stages": stages,
+        }
+        if self._cprofile is not None:
+            report["cprofile_top"] = self._cprofile_top()
+        return report
+
+    def write_report(self, path: str, **meta) -> None:
+        """Escribe el reporte JSON en path y, con cProfile, las estadísticas en <path sin .json>.prof."""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        report = self.report(**meta)
+        if self._cprofile is not None:
+            report["cprofile_file"] = os.path.splitext(path)[0] + ".prof"
+            self._cprofile.dump_stats(report["cprofile_file"])
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, default=str)
+            f.write("\n")
+
+
+def active() -> Optional[Profiler]:
+    return _ACTIVE
+
+
+def measure(stage: str, fn: Callable, *args, rows: Optional[int] = None, **kwargs) -> Any:
+    """fn(*args, **kwargs), medido como `stage` si hay un Profiler activo."""
+    if _ACTIVE is None:
+        return fn(*args, **kwargs)
+    return _ACTIVE.measure(stage, fn, *args, rows=rows, **kwargs)
@@ -0,0 +1,358 @@
+"""
+Motor de simulación de ciclo de vida (Config.model = "simulation") para historias
+largas y realistas: en vez de sortear de antemano 1-2 suscripciones con churn fijo
+(generate_subscriptions), cada customer recorre el horizonte mes a mes con:
+
+- alta: primera suscripción unos días después del signup;
+- cambios de plan (upgrade / downgrade entre los planes mensuales, por precio);
+- cobro por período con reintentos (dunning): un pago fallido se reintenta a los
+  cfg.retry_days días; si fallan todos, la suscripción se cancela (involuntario);
+- churn voluntario con hazard mensual (más alto los primeros meses), con fecha posterior
+  al último intento de cobro; las anuales sólo pueden no renovar en el aniversario;
+- reactivaciones: un customer que canceló puede volver meses después con una
+  suscripción nueva.
+
+El estado es un conjunto de arrays por customer (suscripción actual, plan, próxima
+fecha de cobro, fecha de (re)activación) y cada paso mensual procesa en lote los
+customers con eventos en ese mes, sin loops por fila. Las fechas son días enteros
+(datetime64[D] como int) y los montos centavos, igual que el generador estático.
+
+El output tiene el mismo esquema que generate_shard:
+- dim_subscriptions es la foto al final del horizonte: plan_id es el plan actual
+  (tras upgrades / downgrades); cada transacción lleva el plan cobrado en su período.
+- un período cobrado con reintentos tiene varias filas (failed... y a lo sumo una
+  completed) con el mismo billing_period_start / billing_period_end.
+- la cancelación involuntaria usa el motivo "other" (el CHECK de la tabla no tiene
+  uno para pagos fallidos).
+"""
+from __future__ import annotations
+
+from typing import List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.data_generation import calendar, dtypes, profiling
+from src.data_generation import generate_data as gd
+
+
+# sin fecha de (re)activación pendiente
+NEVER = np.iinfo(np.int32).max
+
+# motivo de las cancelaciones por pagos fallidos
+INVOLUNTARY_REASON = "other"
+
+# primera suscripción: 0-14 días después del signup
+ACTIVATION_DELAY_DAYS = 15
+
+
+def _days(value) -> int:
+    return int(np.datetime64(value, "D").astype(np.int64))
+
+
+def _as_dates(days: np.ndarray) -> np.ndarray:
+    return days.astype("datetime64[D]").astype(dtypes.DATE_DTYPE)
+
+
+class _Simulation:
+    """
+    Estado de un shard de customers y los eventos emitidos. run() avanza mes a mes:
+    (re)activaciones -> cambios de plan -> no renovación anual -> cobros (con dunning)
+    -> churn voluntario mensual. Las suscripciones se emiten al cerrarse (o al final,
+    activas) y las transacciones a medida que se cobran.
+    """
+
+    def __init__(self, cfg: gd.Config, plans: pd.DataFrame, customers: pd.DataFrame, rng: np.random.Generator):
+        self.cfg = cfg
+        self.rng = rng
+        self.start = _days(cfg.start_date)
+        self.end = _days(cfg.end_date)
+        n = len(customers)
+        self.customer_ids = customers["customer_id"].to_numpy()
+
+        # planes mensuales ordenados por precio (escalera de upgrades) y el anual
+        monthly_plan_ids, self.plan_id_pro_year = gd._subscription_plan_ids(cfg, plans)
+        prices = plans.set_index("plan_id")["price"].astype(float)
+        by_price = np.argsort(prices.reindex(monthly_plan_ids).to_numpy(), kind="stable")
+        self.ladder = monthly_plan_ids[by_price].astype(dtypes.PLAN_ID_DTYPE)
+        # tier (índice en cfg.tier_dist) -> posición en la escalera
+        self.tier_rank = np.argsort(by_price).astype(np.int8)
+        self.price = np.zeros(int(plans["plan_id"].max()) + 1)
+        self.price[plans["plan_id"].to_numpy()] = prices.to_numpy()
+        self.monthly_code = gd._billing_cycle_code(cfg, "monthly")
+
+        self.retry_offsets = np.array((0,) + tuple(cfg.retry_days), dtype=np.int64)
+        self.attempt_fail_prob = np.array(
+            [cfg.failed_rate] + [cfg.retry_failure_prob] * len(cfg.retry_days)
+        )
+        reasons = list(cfg.cancellation_reason_dist)
+        # si "other" no está en la distribución, cae en el primer motivo
+        self.involuntary_reason = reasons.index(INVOLUNTARY_REASON) if INVOLUNTARY_REASON in reasons else 0
+
+        # estado por customer (sub = -1: sin suscripción activa)
+        self.sub = np.full(n, -1, dtype=np.int64)
+        self.sub_start = np.zeros(n, dtype=np.int64)
+        self.plan = np.zeros(n, dtype=dtypes.PLAN_ID_DTYPE)
+        self.rank = np.zeros(n, dtype=np.int8)           # posición en self.ladder (mensuales)
+        self.cycle = np.zeros(n, dtype=np.int8)          # código en cfg.billing_cycle_dist
+        self.next_bill = np.full(n, NEVER, dtype=np.int64)
+        self.last_payment = np.full(n, -1, dtype=np.int64)  # día del último intento de cobro emitido
+        self.method = gd._sample_codes(rng, cfg.payment_method_dist, n)
+
+        signup = calendar.to_days(customers["signup_date"]).astype(np.int64)
+        first = signup + rng.integers(0, ACTIVATION_DELAY_DAYS, size=n)
+        self.activate = np.where(first <= self.end, first, NEVER)
+
+        self.n_subs = 0
+        self._subscriptions: List[dict] = []
+        self._transactions: List[dict] = []
+
+    # -----------------------------
+    # Eventos
+    # -----------------------------
+    def _activate(self, idx: np.ndarray) -> None:
+        """Abre una suscripción nueva para cada customer de idx, en su fecha de activación."""
+        cfg, rng, n = self.cfg, self.rng, len(idx)
+        start = self.activate[idx]
+        cycle = gd._sample_billing_cycle(cfg, rng, n)
+        is_monthly = cycle == self.monthly_code
+        tier_idx = rng.choice(len(cfg.tier_dist), size=n, p=list(cfg.tier_dist.values()))
+        rank = self.tier_rank[tier_idx]
+
+        self.sub[idx] = self.n_subs + np.arange(n)
+        self.n_subs += n
+        self.sub_start[idx] = start
+        self.cycle[idx] = cycle
+        self.rank[idx] = rank
+        self.plan[idx] = np.where(is_monthly, self.ladder[rank], self.plan_id_pro_year)
+        # mensual: se cobra el 1ro de cada mes desde el primer inicio de mes >= start; anual: en start
+        start_d = start.astype("datetime64[D]")
+        month_start = calendar.month_start(start_d).astype(np.int64)
+        first_monthly = np.where(month_start < start, calendar.next_month_start(start_d).astype(np.int64), start)
+        self.next_bill[idx] = np.where(is_monthly, first_monthly, start)
+        self.activate[idx] = NEVER
+
+    def _change_plans(self, idx: np.ndarray) -> None:
+        """Upgrades / downgrades de suscripciones mensuales, antes de cobrar el período."""
+        idx = idx[self.cycle[idx] == self.monthly_code]
+        u = self.rng.random(len(idx))
+        top = len(self.ladder) - 1
+        rank = self.rank[idx]
+        up = (u < self.cfg.upgrade_rate) & (rank < top)
+        down = (u >= 1 - self.cfg.downgrade_rate) & (rank > 0)
+        rank = rank + up - down
+        self.rank[idx] = rank
+        self.plan[idx] = self.ladder[rank]
+
+    def _close(self, idx: np.ndarray, end: np.ndarray, reason: np.ndarray) -> None:
+        """Cancela las suscripciones de idx y agenda (quizás) una reactivación."""
+        if not len(idx):
+            return
+        self._emit_subscriptions(idx, end, status=1, reason=reason)
+        self.sub[idx] = -1
+        self.next_bill[idx] = NEVER
+
+        cfg, rng = self.cfg, self.rng
+        back = rng.random(len(idx)) < cfg.reactivation_prob
+        gap_months = rng.geometric(1 / cfg.reactivation_months_mean, size=len(idx))
+        day = calendar.add_months(end.astype("datetime64[D]"), gap_months).astype(np.int64)
+        day += rng.integers(0, 28, size=len(idx))
+        self.activate[idx] = np.where(back & (day <= self.end), day, NEVER)
+
+    def _bill(self, idx: np.ndarray) -> np.ndarray:
+        """
+        Cobra el período que empieza en next_bill para cada suscripción de idx, con
+        reintentos: intento k el día next_bill + retry_offsets[k], hasta el primero que
+        sale bien. Los intentos posteriores a cfg.end_date no se emiten. Devuelve las
+        posiciones (en idx) de las suscripciones con todos los intentos fallidos.
+        """
+        rng, n = self.rng, len(idx)
+        n_attempts_max = len(self.retry_offsets)
+        bill = self.next_bill[idx]
+        is_monthly = self.cycle[idx] == self.monthly_code
+        bill_dates = bill.astype("datetime64[D]")
+        next_period = np.where(
+            is_monthly, calendar.next_month_start(bill_dates), calendar.add_year(bill_dates)
+        ).astype(np.int64)
+
+        # fallas consecutivas desde el primer intento
+        fails = rng.random((n, n_attempts_max)) < self.attempt_fail_prob
+        n_failed = np.cumprod(fails, axis=1).sum(axis=1)
+        n_attempts = np.minimum(n_failed + 1, n_attempts_max)
+        # intentos dentro del horizonte (offsets crecientes)
+        in_range = np.searchsorted(self.retry_offsets, self.end - bill, side="right")
+        n_rows = np.minimum(n_attempts, in_range)
+
+        row = np.repeat(np.arange(n), n_rows)
+        k = np.arange(len(row)) - np.repeat(np.cumsum(n_rows) - n_rows, n_rows)
+        failed = k < n_failed[row]
+        payment_day = bill[row] + self.retry_offsets[k]
+        self._emit_transactions(idx[row], payment_day, bill[row], next_period[row] - 1, is_monthly[row], failed)
+        emitted = n_rows > 0
+        self.last_payment[idx[emitted]] = bill[emitted] + self.retry_offsets[n_rows[emitted] - 1]
+
+        # cobrado: pasa al período siguiente; agotado: next_bill queda en el período
+        # impago (la cancelación es en el último reintento); con reintentos pendientes
+        # más allá del horizonte, sigue activa sin más cobros
+        ok = n_failed < n_attempts_max
+        self.next_bill[idx[ok]] = next_period[ok]
+        exhausted = ~ok & (in_range >= n_attempts_max)
+        self.next_bill[idx[~ok & ~exhausted]] = NEVER
+        return np.flatnonzero(exhausted)
+
+    # -----------------------------
+    # Paso mensual
+    # -----------------------------
+    def step(self, month: int) -> None:
+        cfg, rng = self.cfg, self.rng
+        d0 = int(calendar.month_days(np.array([month]))[0].astype(np.int64))
+        d1 = int(calendar.month_days(np.array([month + 1]))[0].astype(np.int64))
+
+        activating = np.flatnonzero(self.activate < d1)
+        if len(activating):
+            self._activate(activating)
+
+        due = np.flatnonzero(self.next_bill < min(d1, self.end + 1))
+        self._change_plans(due)
+
+        # anuales: no renuevan en el aniversario (el primer cobro, en start, no cuenta)
+        renewal = due[(self.cycle[due] != self.monthly_code) & (self.next_bill[due] > self.sub_start[due])]
+        leave = renewal[rng.random(len(renewal)) < cfg.yearly_renewal_churn]
+        self._close(leave, self.next_bill[leave], gd._sample_cancellation_reason(cfg, rng, len(leave)))
+        due = due[self.sub[due] >= 0]
+
+        # cobros; si fallan todos los reintentos, cancelación involuntaria en el último
+        exhausted = due[self._bill(due)]
+        self._close(
+            exhausted, self.next_bill[exhausted] + self.retry_offsets[-1],
+            np.full(len(exhausted), self.involuntary_reason, dtype=np.int8)
+        )
+
+        # mensuales: churn voluntario con hazard mensual (más alto los primeros meses)
+        active = np.flatnonzero((self.sub >= 0) & (self.cycle == self.monthly_code))
+        tenure = month - calendar.month_index(self.sub_start[active].astype("datetime64[D]"))
+        hazard = np.where(
+            tenure < cfg.early_churn_months, cfg.monthly_churn_hazard * cfg.early_churn_multiplier,
+            cfg.monthly_churn_hazard
+        )
+        churn = active[rng.random(len(active)) < hazard]
+        # fecha uniforme en el mes, posterior al inicio y al último intento de cobro (los
+        # reintentos del mes ya se emitieron) y dentro del horizonte; sin días libres, no churnea
+        lo = np.maximum(np.maximum(self.sub_start[churn], self.last_payment[churn]) + 1, d0)
+        hi = min(d1 - 1, self.end)
+        churn_ok = lo <= hi
+        churn, lo = churn[churn_ok], lo[churn_ok]
+        end = lo + np.floor(rng.random(len(churn)) * (hi - lo + 1)).astype(np.int64)
+        self._close(churn, end, gd._sample_cancellation_reason(cfg, rng, len(churn)))
+
+    def run(self) -> None:
+        first = int(np.datetime64(self.cfg.start_date, "M").astype(np.int64))
+        last = int(np.datetime64(self.cfg.end_date, "M").astype(np.int64))
+        for month in range(first, last + 1):
+            self.step(month)
+        active = np.flatnonzero(self.sub >= 0)
+        self._emit_subscriptions(active, None, status=0, reason=np.full(len(active), -1, dtype=np.int8))
+
+    # -----------------------------
+    # Output
+    # -----------------------------
+    def _emit_subscriptions(self, idx: np.ndarray, end, status: int, reason: np.ndarray) -> None:
+        self._subscriptions.append({
+            "subscription_id": self.sub[idx] + 1,
+            "customer_id": self.customer_ids[idx],
+            "plan_id": self.plan[idx],
+            "start_date": self.sub_start[idx],
+            "end_date": np.full(len(idx), NEVER, dtype=np.int64) if end is None else end,
+            "status": np.full(len(idx), status, dtype=np.int8),
+            "billing_cycle": self.cycle[idx],
+            "cancellation_reason": reason.astype(np.int8),
+        })
+
+    def _emit_transactions(
+        self,
+        idx: np.ndarray,
+        payment_day: np.ndarray,
+        period_start: np.ndarray,
+        period_end: np.ndarray,
+        is_monthly: np.ndarray,
+        failed: np.ndarray
+    ) -> None:
+        price = self.price[self.plan[idx]]
+        gross, discount, net = gd._transaction_amounts(
+            self.cfg, self.rng, price, payment_day.astype("datetime64[D]"), is_monthly, failed
+        )
+        self._transactions.append({
+            "payment_date": payment_day,
+            "customer_id": self.customer_ids[idx],
+            "subscription_id": self.sub[idx] + 1,
+            "plan_id": self.plan[idx],
+            "gross_amount": gross,
+            "discount_amount": discount,
+            "net_revenue": net,
+            "payment_method": self.method[idx],
+            "transaction_status": failed.astype(np.int8),
+            "billing_period_start": period_start,
+            "billing_period_end": period_end,
+        })
+
+    def subscriptions(self) -> pd.DataFrame:
+        cols = _concat(self._subscriptions)
+        order = np.argsort(cols["subscription_id"], kind="stable")
+        cols = {c: v[order] for c, v in cols.items()}
+        end = cols["end_date"]
+        return pd.DataFrame({
+            "subscription_id": cols["subscription_id"].astype(dtypes.id_dtype(self.n_subs)),
+            "customer_id": cols["customer_id"],
+            "plan_id": cols["plan_id"],
+            "start_date": _as_dates(cols["start_date"]),
+            "end_date": np.where(end == NEVER, np.datetime64("NaT"), end.astype("datetime64[D]")).astype(dtypes.DATE_DTYPE),
+            "status": dtypes.categorical(cols["status"], gd.SUBSCRIPTION_STATUSES),
+            "billing_cycle": dtypes.categorical(cols["billing_cycle"], self.cfg.billing_cycle_dist),
+            "cancellation_reason": dtypes.categorical(cols["cancellation_reason"], self.cfg.cancellation_reason_dist),
+        })
+
+    def transactions(self) -> pd.DataFrame:
+        cols = _concat(self._transactions)
+        n = len(cols["payment_date"])
+        return pd.DataFrame({
+            "transaction_id": dtypes.ids(1, n),
+            "payment_date": _as_dates(cols["payment_date"]),
+            "customer_id": cols["customer_id"],
+            "subscription_id": cols["subscription_id"].astype(dtypes.id_dtype(self.n_subs)),
+            "plan_id": cols["plan_id"],
+            "gross_amount": cols["gross_amount"],
+            "discount_amount": cols["discount_amount"],
+            "net_revenue": cols["net_revenue"],
+            "payment_method": dtypes.categorical(cols["payment_method"], self.cfg.payment_method_dist),
+            "transaction_status": dtypes.categorical(cols["transaction_status"], gd.TRANSACTION_STATUSES),
+            "billing_period_start": _as_dates(cols["billing_period_start"]),
+            "billing_period_end": _as_dates(cols["billing_period_end"]),
+        })
+
+
+def _concat(chunks: List[dict]) -> dict:
+    """Columnas de los lotes emitidos, concatenadas en orden de emisión."""
+    return {c: np.concatenate([chunk[c] for chunk in chunks]) for c in chunks[0]}
+
+
+def simulate_shard(
+    cfg: gd.Config,
+    plans: pd.DataFrame,
+    shard_index: int,
+    first_customer_id: int,
+    n_customers: int
+) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """
+    Equivalente de generate_shard con el motor de simulación: mismo esquema, IDs
+    locales al shard (arrancan en 1) y sin validaciones (las corre generate_streaming).
+    """
+    rng = gd.make_rng(cfg.seed, gd.SIMULATION_STREAM, shard_index)
+    customers = profiling.measure(
+        "generate_customers", gd.generate_customers,
+        cfg, rng, first_id=first_customer_id, n=n_customers, validate=False
+    )
+    sim = _Simulation(cfg, plans, customers, rng)
+    profiling.measure("simulate", sim.run, rows=0)
+    subscriptions = profiling.measure("generate_subscriptions", sim.subscriptions)
+    transactions = profiling.measure("generate_transactions", sim.transactions)
+    return customers, subscriptions, transactions
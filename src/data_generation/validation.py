@@ -0,0 +1,398 @@
+"""
+Validaciones de las tablas generadas: integridad por fila y distribución sobre totales.
+
+Niveles (Config.validation):
+- off: ninguna validación.
+- sampled: los chequeos por fila corren sobre una muestra aleatoria de hasta
+  cfg.validation_sample_rows filas por tabla (o shard); las referencias (customers de
+  subscriptions, plans, ...) se chequean contra la tabla completa. Las tasas de
+  distribución se estiman sobre la muestra.
+- full: todas las filas (el comportamiento original).
+
+Cada check_* trabaja sobre los arrays de las columnas, sin DataFrames intermedios
+(nada de df[mask] / .copy() / merge): las condiciones por fila se acumulan con AND
+in-place en una única máscara y se reduce una sola vez. La pertenencia de IDs usa
+rango o bitmap en vez de isin (hash), y la unicidad un chequeo de orden estricto
+(los IDs se generan crecientes), con np.unique sólo como fallback.
+
+Devuelven un resumen (Counter) con filas chequeadas y conteos para los chequeos
+de distribución, sumable entre shards. BackgroundValidator corre los chequeos de
+cada shard en un thread mientras el shard se escribe: una falla se reporta en el
+submit o close siguiente, así que los archivos ya escritos pueden quedar con el
+shard inválido (la corrida termina con AssertionError igual).
+"""
+from __future__ import annotations
+
+import time
+from collections import Counter, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import TYPE_CHECKING, Callable, Deque, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.data_generation import dtypes, profiling
+
+if TYPE_CHECKING:
+    from src.data_generation.generate_data import Config
+
+
+LEVELS = ("off", "sampled", "full")
+
+# referencias de hasta este rango de IDs se chequean con un bitmap (1 byte por ID)
+BITMAP_MAX_SPAN = 1 << 26
+
+
+# -----------------------------
+# Primitivas
+# -----------------------------
+def _sample_rows(cfg: Config, n: int) -> Optional[np.ndarray]:
+    """Índices (ordenados) de las filas a chequear; None = todas."""
+    if cfg.validation == "full" or n <= cfg.validation_sample_rows:
+        return None
+    # stream propio: muestrear no consume del Generator de la generación
+    rng = np.random.default_rng([cfg.seed, n])
+    return np.sort(rng.choice(n, size=cfg.validation_sample_rows, replace=False))
+
+
+def _values(df: pd.DataFrame, column: str, rows: Optional[np.ndarray]) -> np.ndarray:
+    values = df[column].to_numpy()
+    return values if rows is None else values[rows]
+
+
+def _series(df: pd.DataFrame, column: str, rows: Optional[np.ndarray]) -> pd.Series:
+    return df[column] if rows is None else df[column].iloc[rows]
+
+
+def _is(series: pd.Series, value: str) -> np.ndarray:
+    return (series == value).to_numpy(dtype=bool)
+
+
+def _unique(ids: np.ndarray) -> bool:
+    if len(ids) < 2 or np.all(ids[1:] > ids[:-1]):
+        return True
+    return len(np.unique(ids)) == len(ids)
+
+
+def _isin(values: np.ndarray, reference: np.ndarray) -> np.ndarray:
+    """values in reference (enteros): rango si reference es contigua, bitmap si es acotada, si no isin."""
+    if len(reference) == 0:
+        return np.zeros(len(values), dtype=bool)
+    lo, hi = int(reference.min()), int(reference.max())
+    if hi - lo + 1 == len(reference) and _unique(reference):
+        return (values >= lo) & (values <= hi)
+    if hi - lo < BITMAP_MAX_SPAN:
+        bitmap = np.zeros(hi - lo + 1, dtype=bool)
+        bitmap[reference - lo] = True
+        inside = (values >= lo) & (values <= hi)
+        return inside & bitmap[np.clip(values - lo, 0, hi - lo)]
+    return np.isin(values, reference)
+
+
+class _RowChecks:
+    """
+    Condiciones por fila acumuladas en una sola máscara (AND in-place). Las condiciones
+    son callables: si algo falla, se reevalúan una por una para reportar cuáles y en
+    cuántas filas; en el camino feliz cada una se evalúa una vez.
+    """
+
+    def __init__(self, table: str, n: int) -> None:
+        self.table = table
+        self.ok = np.ones(n, dtype=bool)
+        self._conditions: List[Tuple[str, Callable[[], np.ndarray]]] = []
+
+    def require(self, name: str, condition: Callable[[], np.ndarray]) -> None:
+        self._conditions.append((name, condition))
+        np.logical_and(self.ok, condition(), out=self.ok)
+
+    def check(self) -> None:
+        if self.ok.all():
+            return
+        failures = []
+        for name, condition in self._conditions:
+            failed = ~np.asarray(condition(), dtype=bool)
+            if failed.any():
+                failures.append(f"{name} ({int(failed.sum())} rows)" if failed.ndim else name)
+        raise AssertionError(f"{self.table} validation failed: {', '.join(failures)}")
+
+
+def _lookup(ids: np.ndarray, reference_ids: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """values de la fila de reference_ids de cada id, por búsqueda binaria (sin merge)."""
+    if len(reference_ids) == 0:
+        return np.empty(len(ids), dtype=values.dtype)
+    if not np.all(reference_ids[1:] > reference_ids[:-1]):
+        order = np.argsort(reference_ids, kind="stable")
+        reference_ids, values = reference_ids[order], values[order]
+    return values[np.clip(np.searchsorted(reference_ids, ids), 0, len(reference_ids) - 1)]
+
+
+def _in_range(dates: np.ndarray, start, end) -> np.ndarray:
+    return (dates >= np.datetime64(start, "D")) & (dates <= np.datetime64(end, "D"))
+
+
+# -----------------------------
+# Tablas
+# -----------------------------
+def check_date_dim(cfg: Config, df: pd.DataFrame) -> None:
+    if cfg.validation == "off":
+        return
+    dates = df["date"].to_numpy()
+    assert dates[0] == np.datetime64(cfg.start_date, "D")
+    assert dates[-1] == np.datetime64(cfg.end_date, "D")
+    assert _unique(dates)
+
+
+def check_plans(cfg: Config, df: pd.DataFrame) -> None:
+    if cfg.validation == "off":
+        return
+    assert df["plan_id"].is_unique
+    assert (df["price"] > 0).all()
+    assert set(df["tier"]).issubset({"basic", "pro", "premium"})
+
+
+def check_customers(cfg: Config, df: pd.DataFrame, check_distribution: bool = True) -> Counter:
+    if cfg.validation == "off":
+        return Counter()
+    rows = _sample_rows(cfg, len(df))
+    ids = _values(df, "customer_id", rows)
+    signup = _values(df, "signup_date", rows)
+
+    checks = _RowChecks("customers", len(ids))
+    checks.require("customer_id unique", lambda: _unique(ids))
+    checks.require("signup_date in range", lambda: _in_range(signup, cfg.start_date, cfg.end_date))
+    checks.check()
+
+    channels = _series(df, "acquisition_channel", rows).value_counts()
+    channels = channels[channels > 0]
+    countries = _series(df, "country", rows).value_counts()
+    assert set(channels.index).issubset(cfg.acquisition_channel_dist)
+    assert set(countries[countries > 0].index).issubset(cfg.country_dist)
+
+    summary = Counter({("acquisition_channel", str(k)): int(v) for k, v in channels.items()})
+    summary["customers"] = len(ids)
+    if check_distribution:
+        check_channel_share(cfg, summary)
+    return summary
+
+
+def check_subscriptions(
+    cfg: Config,
+    df: pd.DataFrame,
+    customers: pd.DataFrame,
+    plans: pd.DataFrame,
+    check_distribution: bool = True
+) -> Counter:
+    if cfg.validation == "off":
+        return Counter()
+    rows = _sample_rows(cfg, len(df))
+    ids = _values(df, "subscription_id", rows)
+    status = _series(df, "status", rows)
+    canceled = _is(status, "canceled")
+    active = _is(status, "active")
+    ended = _series(df, "end_date", rows).notna().to_numpy()
+    has_reason = _series(df, "cancellation_reason", rows).notna().to_numpy()
+
+    checks = _RowChecks("subscriptions", len(ids))
+    checks.require("subscription_id unique", lambda: _unique(ids))
+    checks.require("customer_id in customers", lambda: _isin(
+        _values(df, "customer_id", rows), customers["customer_id"].to_numpy()
+    ))
+    checks.require("plan_id in plans", lambda: _isin(_values(df, "plan_id", rows), plans["plan_id"].to_numpy()))
+    checks.require("start_date in range", lambda: _in_range(
+        _values(df, "start_date", rows), cfg.start_date, cfg.end_date
+    ))
+    # end_date y cancellation_reason sólo (y siempre) en las canceladas
+    checks.require("canceled with end_date and reason", lambda: ~canceled | (ended & has_reason))
+    checks.require("active without end_date or reason", lambda: ~active | ~(ended | has_reason))
+    checks.check()
+
+    summary = Counter(subscriptions=len(ids), canceled=int(canceled.sum()))
+    if check_distribution:
+        check_churn_rate(cfg, summary["canceled"], summary["subscriptions"])
+    return summary
+
+
+def check_cancellations(cfg: Config, changed: pd.DataFrame, since: np.datetime64) -> None:
+    if cfg.validation == "off":
+        return
+    rows = _sample_rows(cfg, len(changed))
+    end = _values(changed, "end_date", rows)
+
+    checks = _RowChecks("cancellations", len(end))
+    checks.require("end_date after start_date", lambda: end > _values(changed, "start_date", rows))
+    checks.require("end_date after since", lambda: end > np.datetime64(since, "D"))
+    checks.check()
+
+
+def check_transactions(
+    cfg: Config,
+    df: pd.DataFrame,
+    subscriptions: pd.DataFrame,
+    plans: pd.DataFrame,
+    check_distribution: bool = True
+) -> Counter:
+    if cfg.validation == "off":
+        return Counter()
+    rows = _sample_rows(cfg, len(df))
+    ids = _values(df, "transaction_id", rows)
+    failed = _is(_series(df, "transaction_status", rows), "failed")
+
+    checks = _RowChecks("transactions", len(ids))
+    checks.require("transaction_id unique", lambda: _unique(ids))
+    checks.require("customer_id not null", lambda: ~pd.isna(_values(df, "customer_id", rows)))
+    checks.require("subscription_id in subscriptions", lambda: _isin(
+        _values(df, "subscription_id", rows), subscriptions["subscription_id"].to_numpy()
+    ))
+    checks.require("plan_id in plans", lambda: _isin(_values(df, "plan_id", rows), plans["plan_id"].to_numpy()))
+    checks.require("payment_date in range", lambda: _in_range(
+        _values(df, "payment_date", rows), cfg.start_date, cfg.end_date
+    ))
+    # sin cobros posteriores a la cancelación
+    checks.require("payment_date <= subscription end_date", lambda: _paid_before_end(df, subscriptions, rows))
+    checks.require("failed with net_revenue 0", lambda: ~failed | (_values(df, "net_revenue", rows) == 0))
+    checks.check()
+
+    summary = Counter(transactions=len(ids), failed=int(failed.sum()))
+    if check_distribution:
+        check_failed_rate(cfg, summary["failed"], summary["transactions"])
+    return summary
+
+
+def _paid_before_end(df: pd.DataFrame, subscriptions: pd.DataFrame, rows: Optional[np.ndarray]) -> np.ndarray:
+    end = _lookup(
+        _values(df, "subscription_id", rows),
+        subscriptions["subscription_id"].to_numpy(),
+        subscriptions["end_date"].to_numpy()
+    )
+    return np.isnat(end) | (_values(df, "payment_date", rows) <= end)
+
+
+def check_costs(cfg: Config, df: pd.DataFrame, monthly_revenue: pd.Series) -> None:
+    if cfg.validation == "off":
+        return
+    rows = _sample_rows(cfg, len(df))
+    dates = _values(df, "date", rows)
+    first_month = np.datetime64(cfg.start_date, "M")
+    last_month = np.datetime64(cfg.end_date, "M")
+
+    checks = _RowChecks("costs", len(dates))
+    checks.require("cost_id unique", lambda: _unique(_values(df, "cost_id", rows)))
+    checks.require("date in range", lambda: _in_range(dates, first_month, last_month))
+    checks.check()
+
+    # Payment fee sanity: ratio 2-3% en promedio (tolerancia); revenue del mes por índice, sin merge
+    payment_fees = _is(_series(df, "cost_type", rows), "payment_fees")
+    revenue = monthly_revenue.reindex(pd.DatetimeIndex(dates[payment_fees])).to_numpy()
+    pf_ratio = (dtypes.dollars(_values(df, "amount", rows)[payment_fees]) / revenue).mean()
+    assert 0.019 <= pf_ratio <= 0.031, f"Payment fee ratio out of bounds: {pf_ratio:.4f}"
+
+
+# -----------------------------
+# Distribución (sobre totales)
+# -----------------------------
+def check_channel_share(cfg: Config, summary: Dict) -> None:
+    # Quick distribution sanity (tolerancias suaves)
+    # Evita casos raros por azar; no hace falta exactitud perfecta.
+    counts = {key[1]: n for key, n in summary.items() if isinstance(key, tuple) and key[0] == "acquisition_channel"}
+    total = sum(counts.values())
+    if not total:
+        return
+    assert max(counts.values()) / total < max(cfg.acquisition_channel_dist.values()) + 0.20, \
+        "Channel distribution looks too skewed; check probabilities."
+
+
+def check_churn_rate(cfg: Config, n_canceled: int, n_subscriptions: int) -> None:
+    # churn rate sanity (tolerancia por aleatoriedad)
+    churn_rate = n_canceled / n_subscriptions
+    assert abs(churn_rate - cfg.churn_prob) <= 0.05, f"Churn rate out of bounds: {churn_rate:.3f}"
+
+
+def check_failed_rate(cfg: Config, n_failed: int, n_transactions: int) -> None:
+    # sanity on failed rate
+    fr = n_failed / n_transactions
+    assert abs(fr - cfg.failed_rate) <= 0.02, f"Failed rate out of bounds: {fr:.3f}"
+
+
+def check_distributions(cfg: Config, summary: Counter) -> None:
+    """Chequeos de distribución sobre el resumen acumulado de todos los shards."""
+    if cfg.validation == "off":
+        return
+    check_channel_share(cfg, summary)
+    # en la simulación churn y failed rate salen de hazards y reintentos, no son targets
+    if cfg.model == "simulation":
+        return
+    if summary["subscriptions"]:
+        check_churn_rate(cfg, summary["canceled"], summary["subscriptions"])
+    if summary["transactions"]:
+        check_failed_rate(cfg, summary["failed"], summary["transactions"])
+
+
+# -----------------------------
+# En paralelo con la escritura
+# -----------------------------
+class BackgroundValidator:
+    """
+    Corre chequeos en un thread mientras el proceso principal escribe (las comparaciones
+    de numpy y la escritura de pyarrow sueltan el GIL). A lo sumo max_pending chequeos
+    en vuelo: si se llena, submit espera al más viejo, así los shards retenidos por
+    chequeos pendientes están acotados. Las fallas se propagan en submit / close.
+
+    Con un Profiler activo, el tiempo de los chequeos queda en la etapa "validate" y el
+    que el proceso principal pasa esperándolos en "validate_wait".
+    """
+
+    def __init__(self, max_pending: int = 2) -> None:
+        self.max_pending = max_pending
+        self.summary: Counter = Counter()
+        self._stages = {
+            stage: {"calls": 0, "seconds": 0.0, "rows": 0, "peak_rss_mb": 0.0}
+            for stage in ("validate", "validate_wait")
+        }
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="validate")
+        self._pending: Deque[Tuple[Future, int]] = deque()
+
+    def __enter__(self) -> "BackgroundValidator":
+        return self
+
+    def __exit__(self, exc_type, *exc) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+
+    @staticmethod
+    def _timed(fn: Callable, *args, **kwargs) -> Tuple[Counter, float]:
+        start = time.perf_counter()
+        summary = fn(*args, **kwargs)
+        return summary or Counter(), time.perf_counter() - start
+
+    def submit(self, rows: int, fn: Callable, *args, **kwargs) -> None:
+        """fn(*args, **kwargs) en el thread; rows = filas que chequea (para el reporte)."""
+        while len(self._pending) >= self.max_pending:
+            self._collect()
+        self._pending.append((self._pool.submit(self._timed, fn, *args, **kwargs), rows))
+
+    def _collect(self) -> None:
+        future, rows = self._pending.popleft()
+        start = time.perf_counter()
+        summary, seconds = future.result()
+        wait = self._stages["validate_wait"]
+        wait["calls"] += 1
+        wait["seconds"] += time.perf_counter() - start
+        self.summary.update(summary)
+        stage = self._stages["validate"]
+        stage["calls"] += 1
+        stage["seconds"] += seconds
+        stage["rows"] += rows
+
+    def close(self) -> Counter:
+        """Espera los chequeos pendientes y devuelve el resumen acumulado."""
+        try:
+            while self._pending:
+                self._collect()
+        finally:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+        profiler = profiling.active()
+        if profiler is not None:
+            profiler.merge({stage: entry for stage, entry in self._stages.items() if entry["calls"]})
+        return self.summary
@@ -0,0 +1,198 @@
+"""
+Carga incremental (append-only) de fact_transactions y fact_costs.
+
+En lugar de regenerar y recargar toda la historia, extiende el dataset desde el último
+watermark (analytics.etl_watermarks, registrado por la carga full de load_postgres):
+
+1. Lee sólo las suscripciones que pueden facturar en la ventana (activas o con
+   end_date posterior al watermark).
+2. Genera cancelaciones de suscripciones activas dentro de la ventana y las aplica con
+   upsert en dim_subscriptions (status, end_date, cancellation_reason).
+3. Genera únicamente los períodos de facturación con pago en (watermark, until], con
+   transaction_id a partir del último cargado.
+4. Agrega las fechas nuevas a dim_date (y sus particiones, si las facts están
+   particionadas) y los costos de los meses cerrados en la ventana,
+   con cost_id a partir del último cargado.
+5. Avanza los watermarks y refresca las tablas de KPIs materializadas: sólo se
+   recalculan los meses tocados por la ventana (ver sql/02_etl/01_refresh_mrr_churn.sql)
+   y se incrementa la generación de carga (invalida los caches de src/analytics/serving.py).
+
+Todo en una transacción; el costo de cada corrida depende del volumen de la ventana
+y de la base activa, no del total de la historia.
+
+Uso (desde la raíz del repo):
+    python -m src.etl.incremental --dsn postgresql://user@localhost/db --until 2024-07-31
+"""
+from __future__ import annotations
+
+import argparse
+import datetime as dt
+import os
+from dataclasses import replace
+
+import numpy as np
+import pandas as pd
+
+from src.data_generation import generate_data as gd
+from src.etl.load_postgres import (
+    SCHEMA, bump_load_generation, connect, copy_dataframe, ensure_partitions, read_dataframe, refresh_kpi_tables
+)
+
+
+SUBSCRIPTION_COLUMNS = [
+    "subscription_id", "customer_id", "plan_id", "start_date", "end_date",
+    "status", "billing_cycle", "cancellation_reason"
+]
+
+
+def read_watermarks(conn) -> dict:
+    rows = conn.execute(
+        f"SELECT table_name, watermark_date, watermark_id FROM {SCHEMA}.etl_watermarks"
+    ).fetchall()
+    watermarks = {table: (date, last_id) for table, date, last_id in rows}
+    assert {"fact_transactions", "fact_costs"} <= set(watermarks), \
+        "Missing ETL watermarks; run a full load (src.etl.load_postgres) first."
+    return watermarks
+
+
+def update_watermark(conn, table: str, date: dt.date, last_id: int) -> None:
+    conn.execute(
+        f"""
+        UPDATE {SCHEMA}.etl_watermarks
+        SET watermark_date = %s, watermark_id = %s, updated_at = now()
+        WHERE table_name = %s
+        """,
+        (date, last_id, table)
+    )
+
+
+def upsert_subscriptions(conn, changed: pd.DataFrame) -> None:
+    """Upsert por subscription_id vía tabla temporal + INSERT ... ON CONFLICT."""
+    conn.execute(
+        f"CREATE TEMP TABLE tmp_subscriptions (LIKE {SCHEMA}.dim_subscriptions) ON COMMIT DROP"
+    )
+    copy_dataframe(conn, "tmp_subscriptions", changed[SUBSCRIPTION_COLUMNS], schema="pg_temp")
+    conn.execute(
+        f"""
+        INSERT INTO {SCHEMA}.dim_subscriptions
+        SELECT * FROM tmp_subscriptions
+        ON CONFLICT (subscription_id) DO UPDATE
+        SET end_date = EXCLUDED.end_date,
+            status = EXCLUDED.status,
+            cancellation_reason = EXCLUDED.cancellation_reason
+        """
+    )
+
+
+def _closed_months_revenue(conn, first_month: pd.Timestamp, until: pd.Timestamp) -> pd.Series:
+    """Net revenue de los meses completos entre first_month y until (ambos incluidos)."""
+    end_exclusive = (until + pd.Timedelta(days=1)).to_period("M").to_timestamp()
+    if first_month >= end_exclusive:
+        return pd.Series(dtype="float64")
+
+    df = read_dataframe(
+        conn,
+        f"""
+        SELECT DATE_TRUNC('month', payment_date)::date AS month, SUM(net_revenue) AS net_revenue
+        FROM {SCHEMA}.fact_transactions
+        WHERE transaction_status = 'completed'
+          AND payment_date >= DATE '{first_month.date().isoformat()}'
+          AND payment_date < DATE '{end_exclusive.date().isoformat()}'
+        GROUP BY 1
+        """,
+        parse_dates=("month",)
+    )
+    return df.set_index("month")["net_revenue"]
+
+
+def run_incremental(conn, cfg: gd.Config) -> dict:
+    """Extiende los datos cargados hasta cfg.end_date. Devuelve filas nuevas/actualizadas por tabla."""
+    with conn.transaction():
+        watermarks = read_watermarks(conn)
+        since, last_transaction_id = watermarks["fact_transactions"]
+        last_cost_month, last_cost_id = watermarks["fact_costs"]
+        until = pd.Timestamp(cfg.end_date)
+        if until <= pd.Timestamp(since):
+            return {}
+
+        since_d = np.datetime64(since, "D")
+        rng = gd.make_rng(cfg.seed, gd.INCREMENTAL_STREAM, int(since_d.astype(np.int64)))
+
+        subscriptions = read_dataframe(
+            conn,
+            f"""
+            SELECT {", ".join(SUBSCRIPTION_COLUMNS)}
+            FROM {SCHEMA}.dim_subscriptions
+            WHERE status = 'active' OR end_date > DATE '{since.isoformat()}'
+            ORDER BY subscription_id
+            """,
+            parse_dates=("start_date", "end_date")
+        )
+        # si ninguna suscripción de la ventana tiene motivo, read_csv infiere float
+        subscriptions["cancellation_reason"] = subscriptions["cancellation_reason"].astype(object)
+        plans = read_dataframe(conn, f"SELECT * FROM {SCHEMA}.dim_plans ORDER BY plan_id")
+
+        changed = gd.generate_cancellations(cfg, subscriptions, since=since_d, rng=rng)
+        subscriptions = subscriptions.set_index("subscription_id")
+        subscriptions.update(changed.set_index("subscription_id")[["end_date", "status", "cancellation_reason"]])
+        subscriptions = subscriptions.reset_index()
+
+        transactions = gd.generate_transactions(
+            cfg, subscriptions=subscriptions, plans=plans, rng=rng,
+            first_id=last_transaction_id + 1, check_distribution=False, since=since_d
+        )
+        date_dim = gd.generate_date_dim(replace(cfg, start_date=str(since + dt.timedelta(days=1))))
+
+        copy_dataframe(conn, "dim_date", date_dim)
+        ensure_partitions(conn)
+        upsert_subscriptions(conn, changed)
+        copy_dataframe(conn, "fact_transactions", transactions)
+        update_watermark(
+            conn, "fact_transactions", until.date(),
+            int(transactions["transaction_id"].max()) if len(transactions) else last_transaction_id
+        )
+
+        # costos: sólo meses cerrados que todavía no tienen costos
+        first_month = pd.Timestamp(last_cost_month) + pd.offsets.MonthBegin(1)
+        monthly_revenue = _closed_months_revenue(conn, first_month, until)
+        costs = pd.DataFrame()
+        if len(monthly_revenue):
+            costs = gd.generate_costs_from_revenue(cfg, monthly_revenue, rng, first_id=last_cost_id + 1)
+            copy_dataframe(conn, "fact_costs", costs)
+            update_watermark(conn, "fact_costs", costs["date"].max().date(), int(costs["cost_id"].max()))
+
+        refresh_kpi_tables(conn)
+        bump_load_generation(conn)
+
+    return {
+        "dim_date": len(date_dim),
+        "dim_subscriptions": len(changed),
+        "fact_transactions": len(transactions),
+        "fact_costs": len(costs),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Append new transactions and costs since the last load.")
+    parser.add_argument("--dsn", default=os.environ.get("DATABASE_URL", ""),
+                        help="libpq connection string (default: $DATABASE_URL / PG* env vars)")
+    parser.add_argument("--until", default=dt.date.today().isoformat(),
+                        help="last date to generate, YYYY-MM-DD (default: today)")
+    parser.add_argument("--config", default=None,
+                        help="JSON generator config used for the full load (seed, distributions, ...)")
+    args = parser.parse_args()
+
+    cfg = replace(gd.load_config(args.config) if args.config else gd.Config(), end_date=args.until)
+    with connect(args.dsn) as conn:
+        counts = run_incremental(conn, cfg)
+
+    if not counts:
+        print(f"Nothing to load: data is already complete up to {args.until}.")
+        return
+    print(f"Loaded up to {args.until}:")
+    for table, n_rows in counts.items():
+        print(f"- {n_rows:,} rows: {SCHEMA}.{table}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,387 @@
+"""
+Carga automatizada a PostgreSQL con COPY FROM STDIN.
+
+Reemplaza la importación manual con pgAdmin (ver sql/02_etl/README.txt):
+
+1. Crea el schema `analytics` desde sql/01_schema/ (o vacía las tablas si ya existen).
+   Con --partitioned, las facts se crean particionadas por mes (sql/01_schema/partitioned/).
+2. Borra los índices de 03_indexes_constraints.sql y las foreign keys, para que la carga
+   no los mantenga fila a fila.
+3. Carga cada tabla con COPY en orden de dependencias (dims -> facts), desde los
+   archivos de data/raw/ o directo desde el generador, sin archivos intermedios.
+   Tras dim_date se crean las particiones de su rango.
+4. Recrea índices y foreign keys (una validación en bloque por FK) y corre ANALYZE.
+5. Registra los watermarks para las cargas incrementales (src/etl/incremental.py).
+6. Reconstruye las tablas de KPIs materializadas (agg_mrr_monthly, agg_churn_monthly,
+   agg_active_subscriptions_daily, el cubo agg_revenue_monthly / agg_costs_monthly y los
+   sketches de distinct counts agg_distinct_sketches).
+   Los triggers de change tracking se deshabilitan durante el COPY: tras una carga full
+   se recalcula todo igual.
+7. Incrementa la generación de carga (etl_load_generation), que invalida los caches de
+   resultados de src/analytics/serving.py.
+
+Todos los pasos corren en una única transacción: si algo falla, la base queda como estaba.
+Tras el commit, VACUUM (que no puede correr dentro de una transacción) marca el visibility
+map de las tablas cargadas.
+
+Uso (desde la raíz del repo):
+    python -m src.etl.load_postgres --dsn postgresql://user@localhost/db
+    python -m src.etl.load_postgres --dsn postgresql://user@localhost/db --from-generator
+    python -m src.etl.load_postgres --dsn postgresql://user@localhost/db --partitioned
+
+Las funciones reciben una conexión psycopg ya abierta, así que se pueden correr contra
+cualquier Postgres local o embebido (ej: pgserver) para pruebas.
+"""
+from __future__ import annotations
+
+import argparse
+import io
+import os
+import re
+from typing import Iterator, List, Optional, Tuple
+
+import pandas as pd
+
+from src.data_generation import dtypes, generate_data as gd
+
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+SCHEMA_DIR = os.path.join(REPO_ROOT, "sql", "01_schema")
+PARTITIONED_SCHEMA_DIR = os.path.join(SCHEMA_DIR, "partitioned")
+ETL_DIR = os.path.join(REPO_ROOT, "sql", "02_etl")
+SCHEMA = "analytics"
+
+# (tabla destino, nombre de la tabla generada) en orden de dependencias: dims -> facts
+TABLES = [
+    ("dim_date", "date_dim"),
+    ("dim_plans", "plans"),
+    ("dim_customers", "customers"),
+    ("dim_subscriptions", "subscriptions"),
+    ("fact_transactions", "transactions"),
+    ("fact_costs", "costs"),
+]
+TARGET_TABLES = {name: table for table, name in TABLES}
+
+BASE_SCHEMA_FILES = ("01_create_schema.sql", "02_create_tables.sql")
+INDEXES_FILE = "03_indexes_constraints.sql"
+
+COPY_BLOCK_BYTES = 1 << 20
+
+
+# -----------------------------
+# SQL helpers
+# -----------------------------
+def run_sql_file(conn, path: str) -> None:
+    with open(path, encoding="utf-8") as f:
+        conn.execute(f.read())
+
+
+def _sql_files(directory: str) -> List[str]:
+    return sorted(os.path.join(directory, f) for f in os.listdir(directory) if f.endswith(".sql"))
+
+
+def _index_names(path: str) -> List[str]:
+    with open(path, encoding="utf-8") as f:
+        return re.findall(r"CREATE\s+(?:UNIQUE\s+)?INDEX\s+(?:IF\s+NOT\s+EXISTS\s+)?(\w+)", f.read(), flags=re.I)
+
+
+def is_partitioned(conn) -> bool:
+    """True si fact_transactions es la tabla particionada de sql/01_schema/partitioned/."""
+    return conn.execute(
+        "SELECT relkind = 'p' FROM pg_class WHERE oid = to_regclass(%s)", (f"{SCHEMA}.fact_transactions",)
+    ).fetchone() == (True,)
+
+
+def _indexes_file(conn) -> str:
+    directory = PARTITIONED_SCHEMA_DIR if is_partitioned(conn) else SCHEMA_DIR
+    return os.path.join(directory, INDEXES_FILE)
+
+
+def prepare_schema(conn, partitioned: bool = False) -> None:
+    """
+    Crea schema y tablas si no existen (facts particionadas si partitioned); si existen,
+    las vacía (la carga es full refresh) y se mantiene la variante ya creada.
+    El resto de sql/01_schema (salvo índices) y sql/02_etl es idempotente y corre siempre:
+    watermarks, tablas de KPIs materializadas, triggers y procedimientos de refresh.
+    """
+    exists = conn.execute("SELECT to_regclass(%s) IS NOT NULL", (f"{SCHEMA}.fact_costs",)).fetchone()[0]
+    if not exists:
+        run_sql_file(conn, os.path.join(SCHEMA_DIR, BASE_SCHEMA_FILES[0]))
+        tables_dir = PARTITIONED_SCHEMA_DIR if partitioned else SCHEMA_DIR
+        run_sql_file(conn, os.path.join(tables_dir, BASE_SCHEMA_FILES[1]))
+    else:
+        assert not partitioned or is_partitioned(conn), \
+            f"{SCHEMA}.fact_transactions is not partitioned; drop the schema to switch layouts."
+        tables = ", ".join(f"{SCHEMA}.{table}" for table, _ in TABLES)
+        conn.execute(f"TRUNCATE {tables}")
+
+    skip = set(BASE_SCHEMA_FILES) | {INDEXES_FILE}
+    for path in _sql_files(SCHEMA_DIR) + _sql_files(ETL_DIR):
+        if os.path.basename(path) not in skip:
+            run_sql_file(conn, path)
+
+
+def set_triggers(conn, enabled: bool) -> None:
+    """Habilita/deshabilita los triggers de usuario (change tracking de KPIs) de las tablas cargadas."""
+    action = "ENABLE" if enabled else "DISABLE"
+    for table, _ in TABLES:
+        conn.execute(f"ALTER TABLE {SCHEMA}.{table} {action} TRIGGER USER")
+
+
+def refresh_kpi_tables(conn, full: bool = False) -> None:
+    """
+    Recalcula los meses dirty de agg_mrr_monthly / agg_churn_monthly / agg_cohort_monthly /
+    agg_distinct_sketches (todos si full). El cubo de revenue/costos lo mantienen los triggers; con full se reconstruye.
+    """
+    if full:
+        conn.execute(f"CALL {SCHEMA}.rebuild_revenue_cube()")
+    conn.execute(f"CALL {SCHEMA}.refresh_mrr_churn(%s)", (full,))
+    conn.execute(f"CALL {SCHEMA}.refresh_cohorts(%s)", (full,))
+    conn.execute(f"CALL {SCHEMA}.refresh_distinct_sketches(%s)", (full,))
+
+
+def bump_load_generation(conn) -> int:
+    """Marca una carga nueva: los caches de resultados con otra generación quedan viejos."""
+    return conn.execute(
+        f"""
+        UPDATE {SCHEMA}.etl_load_generation
+        SET generation = generation + 1, loaded_at = now()
+        RETURNING generation
+        """
+    ).fetchone()[0]
+
+
+def ensure_partitions(conn) -> None:
+    """Crea las particiones de facts que falten para el rango de dim_date (no-op sin particiones)."""
+    if is_partitioned(conn):
+        conn.execute(f"CALL {SCHEMA}.ensure_fact_partitions()")
+
+
+def drop_indexes(conn) -> None:
+    for name in _index_names(_indexes_file(conn)):
+        conn.execute(f"DROP INDEX IF EXISTS {SCHEMA}.{name}")
+
+
+def create_indexes(conn) -> None:
+    run_sql_file(conn, _indexes_file(conn))
+
+
+def drop_foreign_keys(conn) -> List[Tuple[str, str, str]]:
+    """
+    Borra las FKs del schema y devuelve (tabla, constraint, definición) para recrearlas.
+    Las FKs que las particiones heredan del padre (conparentid) caen y vuelven con él.
+    """
+    fks = conn.execute(
+        """
+        SELECT c.conrelid::regclass::text, c.conname, pg_get_constraintdef(c.oid)
+        FROM pg_constraint c
+        JOIN pg_namespace n ON n.oid = c.connamespace
+        WHERE c.contype = 'f' AND n.nspname = %s AND c.conparentid = 0
+        ORDER BY 1, 2
+        """,
+        (SCHEMA,)
+    ).fetchall()
+    for table, name, _ in fks:
+        conn.execute(f"ALTER TABLE {table} DROP CONSTRAINT {name}")
+    return fks
+
+
+def create_foreign_keys(conn, fks: List[Tuple[str, str, str]]) -> None:
+    for table, name, definition in fks:
+        conn.execute(f"ALTER TABLE {table} ADD CONSTRAINT {name} {definition}")
+
+
+def record_watermarks(conn) -> None:
+    """
+    Watermarks tras una carga full: las transacciones están completas hasta el último día
+    de dim_date (fin del rango generado) y los costos hasta su último mes.
+    """
+    conn.execute(
+        f"""
+        INSERT INTO {SCHEMA}.etl_watermarks (table_name, watermark_date, watermark_id)
+        SELECT 'fact_transactions', (SELECT MAX(date) FROM {SCHEMA}.dim_date), COALESCE(MAX(transaction_id), 0)
+        FROM {SCHEMA}.fact_transactions
+        UNION ALL
+        SELECT 'fact_costs', MAX(date), COALESCE(MAX(cost_id), 0)
+        FROM {SCHEMA}.fact_costs
+        ON CONFLICT (table_name) DO UPDATE
+        SET watermark_date = EXCLUDED.watermark_date,
+            watermark_id = EXCLUDED.watermark_id,
+            updated_at = now()
+        """
+    )
+
+
+# -----------------------------
+# COPY
+# -----------------------------
+def copy_csv(
+    conn,
+    table: str,
+    columns: List[str],
+    blocks: Iterator[bytes],
+    header: bool = False,
+    schema: str = SCHEMA
+) -> None:
+    cols = ", ".join(columns)
+    options = "FORMAT csv, HEADER true" if header else "FORMAT csv"
+    with conn.cursor().copy(f"COPY {schema}.{table} ({cols}) FROM STDIN WITH ({options})") as copy:
+        for block in blocks:
+            copy.write(block)
+
+
+def copy_dataframe(conn, table: str, df: pd.DataFrame, schema: str = SCHEMA) -> None:
+    buf = io.StringIO()
+    dtypes.to_output(df).to_csv(buf, index=False, header=False)
+    copy_csv(conn, table, list(df.columns), iter([buf.getvalue().encode("utf-8")]), schema=schema)
+
+
+def read_dataframe(conn, query: str, parse_dates: Tuple[str, ...] = ()) -> pd.DataFrame:
+    """Resultado de query como DataFrame vía COPY TO STDOUT (mucho más rápido que fetchall)."""
+    buf = io.BytesIO()
+    with conn.cursor().copy(f"COPY ({query}) TO STDOUT WITH (FORMAT csv, HEADER true)") as copy:
+        for block in copy:
+            buf.write(block)
+    buf.seek(0)
+    return pd.read_csv(buf, parse_dates=list(parse_dates))
+
+
+def _iter_file_blocks(path: str) -> Iterator[bytes]:
+    with open(path, "rb") as f:
+        while True:
+            block = f.read(COPY_BLOCK_BYTES)
+            if not block:
+                return
+            yield block
+
+
+def copy_file(conn, table: str, path: str) -> None:
+    """COPY de un CSV con header (columnas tomadas del header) o de un dataset parquet/feather."""
+    if path.endswith(".csv"):
+        with open(path, encoding="utf-8") as f:
+            columns = f.readline().strip().split(",")
+        copy_csv(conn, table, columns, _iter_file_blocks(path), header=True)
+        return
+
+    import pyarrow.dataset as ds
+
+    dataset = ds.dataset(path, format=gd.arrow_format(path), partitioning="hive")
+    columns = [c for c in dataset.schema.names if c not in gd.PARTITION_COLUMNS.values()]
+    for batch in dataset.to_batches(columns=columns):
+        copy_dataframe(conn, table, batch.to_pandas())
+
+
+# -----------------------------
+# Loads
+# -----------------------------
+def load_files(conn, data_dir: str) -> dict:
+    """Carga los archivos generados (csv, parquet o feather) de data_dir."""
+    counts = {}
+    for table, name in TABLES:
+        copy_file(conn, table, gd.find_table(data_dir, name))
+        if table == "dim_date":
+            ensure_partitions(conn)
+        counts[table] = conn.execute(f"SELECT COUNT(*) FROM {SCHEMA}.{table}").fetchone()[0]
+    return counts
+
+
+def load_from_generator(conn, cfg: gd.Config) -> dict:
+    """
+    Genera y carga en el mismo proceso: cada shard va directo a COPY sin pasar por disco.
+    Con las FKs deshabilitadas, los shards de customers/subscriptions/transactions se
+    cargan intercalados; las FKs se validan al final.
+    """
+    counts = dict.fromkeys((table for table, _ in TABLES), 0)
+
+    def sink(df: pd.DataFrame, name: str, part: Optional[int]) -> None:
+        copy_dataframe(conn, TARGET_TABLES[name], df)
+        counts[TARGET_TABLES[name]] += len(df)
+
+    plans = gd.generate_plans(cfg)
+    sink(gd.generate_date_dim(cfg), "date_dim", None)
+    ensure_partitions(conn)
+    sink(plans, "plans", None)
+    gd.generate_streaming(cfg, plans=plans, sink=sink)
+    return counts
+
+
+def bulk_load(
+    conn,
+    cfg: Optional[gd.Config] = None,
+    data_dir: Optional[str] = None,
+    partitioned: bool = False
+) -> dict:
+    """
+    Full refresh del schema analytics: desde data_dir o, si cfg está dado, desde el generador.
+    partitioned sólo aplica al crear el schema (ver prepare_schema).
+    Hace commit al final; ante un error hace rollback.
+    """
+    with conn.transaction():
+        prepare_schema(conn, partitioned=partitioned)
+        drop_indexes(conn)
+        fks = drop_foreign_keys(conn)
+        set_triggers(conn, enabled=False)
+
+        if cfg is not None:
+            counts = load_from_generator(conn, cfg)
+        else:
+            counts = load_files(conn, data_dir)
+
+        create_indexes(conn)
+        create_foreign_keys(conn, fks)
+        set_triggers(conn, enabled=True)
+        record_watermarks(conn)
+
+        # estadísticas antes del refresh: sus queries planifican sobre las facts recién cargadas
+        for table, _ in TABLES:
+            conn.execute(f"ANALYZE {SCHEMA}.{table}")
+        refresh_kpi_tables(conn, full=True)
+        bump_load_generation(conn)
+
+    # VACUUM no corre dentro de una transacción; tras el commit sólo marca el visibility map
+    # (index-only scans sobre las facts recién cargadas)
+    for table, _ in TABLES:
+        conn.execute(f"VACUUM {SCHEMA}.{table}")
+    return counts
+
+
+def connect(dsn: str):
+    try:
+        import psycopg
+    except ImportError as exc:
+        raise ImportError("The PostgreSQL loader requires psycopg (pip install 'psycopg[binary]')") from exc
+    return psycopg.connect(dsn, autocommit=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Bulk-load subscription analytics data into PostgreSQL.")
+    parser.add_argument("--dsn", default=os.environ.get("DATABASE_URL", ""),
+                        help="libpq connection string (default: $DATABASE_URL / PG* env vars)")
+    parser.add_argument("--data-dir", default=gd.Config().out_dir,
+                        help="directory with the generated files (default: data/raw)")
+    parser.add_argument("--from-generator", action="store_true",
+                        help="generate in-process (default Config or --config) and load without intermediate files")
+    parser.add_argument("--config", default=None,
+                        help="JSON generator config for --from-generator (see src.data_generation.generate_data)")
+    parser.add_argument("--partitioned", action="store_true",
+                        help="create fact tables partitioned by month (only when the schema does not exist yet)")
+    args = parser.parse_args()
+
+    cfg = None
+    if args.from_generator:
+        cfg = gd.load_config(args.config) if args.config else gd.Config()
+        gd.validate_config(cfg)
+
+    with connect(args.dsn) as conn:
+        counts = bulk_load(
+            conn, cfg=cfg, data_dir=args.data_dir,
+            partitioned=args.partitioned
+        )
+
+    print("Loaded:")
+    for table, n_rows in counts.items():
+        print(f"- {n_rows:,} rows: {SCHEMA}.{table}")
+
+
+if __name__ == "__main__":
+    main()